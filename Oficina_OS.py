@@ -1,41 +1,59 @@
 import sys
-import pandas as pd
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QGroupBox, QLabel, QLineEdit, QTextEdit, QPushButton,
-    QListWidget, QMessageBox, QFileDialog, QSizePolicy, QComboBox,
+    QMessageBox, QFileDialog, QSizePolicy, QComboBox,
     QStyle,  # Importado QStyle para usar ícones padrão do sistema
-    QScrollArea
+    QScrollArea, QProgressDialog, QDialog, QDialogButtonBox, QDateEdit, QCheckBox, QFormLayout, QProgressBar,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QTableView, QHeaderView, QCompleter, QTabWidget, QListView
+)
+from PyQt5.QtGui import (
+    QFont, QPainter, QPageLayout, QPageSize, QTextOption, QPixmap, QDoubleValidator, QIntValidator,
+    QStandardItem, QStandardItemModel
+)
+from PyQt5.QtCore import (
+    Qt, QDate, QDateTime, QRectF, QSizeF, QPointF, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal,
+    QAbstractTableModel, QAbstractListModel, QModelIndex
 )
-from PyQt5.QtGui import QFont, QPainter, QPageLayout, QPageSize, QTextOption, QPixmap, QDoubleValidator, QIntValidator
-from PyQt5.QtCore import Qt, QDateTime, QRectF, QSizeF, QPointF
 import os
-import requests
-import subprocess
-import platform
-import base64
-from PIL import Image  # Importado Pillow para redimensionamento
+import logging
+from collections import OrderedDict
+from decimal import Decimal
 import tempfile  # Importado para criar arquivos temporários
 import atexit  # Para garantir a limpeza de arquivos temporários
 
-# --- IMPORTS PARA JINJA2 E WEASYPRINT ---
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML, CSS
-
-# --- FIM DOS IMPORTS ---
-
-# --- Configurações Globais ---
-ARQUIVO_EXCEL = "Ordens_de_Servico.xlsx"
-ARQUIVO_LOGO = os.path.join("resources", "logo.png")  # Caminho ajustado para pasta resources
-PASTA_OS_CLIENTES = "OS_Clientes"  # Esta pasta ainda é usada para a depuração, mas não para salvar PDFs
-HTML_TEMPLATE_FILE = "os_template.html"
-
-INFO_OFICINA = {
-    "nome": "DEMONSTRAÇÃO OFICINA v6.0 230117 011216",
-    "endereco": "Estrada do barro vermelho 341 - Rocha Miranda - RIO DEJANEIRO-RJ",
-    "cnpj": "CNPJ 48.969.894/0001-59",
-    "telefone": "(21) 99757-0103 / 97125-0490"
+from oficina_core import (
+    COLUNAS_OS, CHAVE_ITENS, ArmazenamentoSQLite, formatar_detalhes_itens, migrar, valor_vazio,
+    calcular_total_item, para_decimal, formatar_numero_os, registro_para_salvar, CAMPOS_OBRIGATORIOS,
+    IndiceCadastros, CHAVE_VERSAO, ConflitoVersao, ArmazenamentoRemoto, FilaRenderizacaoRemota,
+    CacheCEP, ErroConsultaCEP, ResolvedorCEPArquivo, ResolvedorViaCEP, ServicoCEP
+)
+from oficina_core.configuracao import (
+    ARQUIVO_EXCEL, ARQUIVO_BANCO_OS, ARQUIVO_JOURNAL_OS, ARQUIVO_LOGO, PASTA_OS_CLIENTES, HTML_TEMPLATE_FILE,
+    ARQUIVO_CACHE_CEP, ARQUIVO_CEP_OFFLINE, INFO_OFICINA, PASTA_SNAPSHOTS, INTERVALO_SINCRONIZACAO_MS,
+    URL_SERVIDOR_OS, ARQUIVO_PERFIL, ARQUIVO_DIAGNOSTICO
+)
+from oficina_core.diagnostico import configurar_log, iniciar_perfil, medido, medir, metricas
+from oficina_core.formatacao import formatar_dinheiro, formatar_km, mascara_cpf_cnpj, mascara_telefone, padrao_se_vazio
+from oficina_core.pdf import FilaRenderizacao, abrir_arquivo
+from oficina_core.lote_pdf import exportar_lote_pdf
+from oficina_core.exportacao import FORMATOS as FORMATOS_EXPORTACAO, exportar_os
+from oficina_core.relatorios import faturamento, pecas_mais_usadas, tempo_por_situacao
+from oficina_core.snapshots import agendar_snapshot, listar_snapshots
+
+
+# Coluna do cadastro -> chave do campo em entries_cliente / entries_veiculo
+CAMPOS_FORM_CLIENTE = {
+    "Nome_Cliente": "nome", "Endereco_Cliente": "endereço", "Numero_Imovel_Cliente": "número",
+    "Bairro_Cliente": "bairro", "Cidade_Cliente": "cidade", "UF_Cliente": "uf", "CEP_Cliente": "cep",
+    "Telefone_Cliente": "telefone", "CPF_CNPJ_Cliente": "cpf_cnpj",
 }
+CAMPOS_FORM_VEICULO = {
+    "Placa_Veiculo": "placa", "Marca_Veiculo": "marca", "Modelo_Veiculo": "modelo", "Cor_Veiculo": "cor",
+    "Ano_Veiculo": "ano", "Combustivel_Veiculo": "combustível",
+}
+
+log = logging.getLogger("Oficina_OS")
 
 # Lista global para manter referências a arquivos temporários para limpeza
 _temp_files_to_clean = []
@@ -47,15 +65,983 @@ def _cleanup_temp_files():
         try:
             if os.path.exists(temp_file_path):
                 os.remove(temp_file_path)
-                print(f"DEBUG: Arquivo temporário removido: {temp_file_path}", file=sys.stderr)
+                log.debug("Arquivo temporário removido: %s", temp_file_path)
         except Exception as e:
-            print(f"ERRO: Não foi possível remover o arquivo temporário {temp_file_path}: {e}", file=sys.stderr)
+            log.error("Não foi possível remover o arquivo temporário %s: %s", temp_file_path, e)
 
 
 # Registrar a função de limpeza para ser chamada ao final do programa
 atexit.register(_cleanup_temp_files)
 
 
+@medido("ui.carregar_dados")
+def _carregar_dados_os():
+    """Abre o banco SQLite das OSs, migrando o journal ou a planilha antiga na primeira execução.
+
+    Com URL_SERVIDOR_OS configurado, usa o servidor local (oficina_core.servidor), que cuida do
+    banco, da planilha e dos snapshots.
+
+    Retorna ``(armazenamento, cadastros, erro)``: ``cadastros`` é o IndiceCadastros do
+    autocompletar e ``erro`` a mensagem da migração que falhou, ou None.
+    """
+    if URL_SERVIDOR_OS:
+        armazenamento = ArmazenamentoRemoto(URL_SERVIDOR_OS)
+        cadastros = IndiceCadastros.do_armazenamento(armazenamento)
+        log.info("Dados carregados do servidor %s", URL_SERVIDOR_OS)
+        return armazenamento, cadastros, None
+
+    armazenamento = ArmazenamentoSQLite(ARQUIVO_BANCO_OS)
+    erro = None
+    if len(armazenamento) == 0:
+        origem = next((arq for arq in (ARQUIVO_JOURNAL_OS, ARQUIVO_EXCEL) if os.path.exists(arq)), None)
+        if origem:
+            try:
+                total = migrar(origem, armazenamento)
+                log.info("%d OS migradas de %s para %s", total, origem, ARQUIVO_BANCO_OS)
+                if origem == ARQUIVO_JOURNAL_OS:
+                    # Evita migrar o journal de novo; a planilha continua sendo a exportação
+                    os.replace(ARQUIVO_JOURNAL_OS, ARQUIVO_JOURNAL_OS + ".migrado")
+            except Exception as e:
+                erro = f"Erro ao migrar os dados de {origem}: {e}"
+                log.exception("Detalhes do erro ao migrar %s: %s", origem, e)
+    cadastros = IndiceCadastros.do_armazenamento(armazenamento)
+    agendar_snapshot(ARQUIVO_BANCO_OS)  # Cópia diária do banco, em segundo plano
+    log.info("Dados carregados de %s", ARQUIVO_BANCO_OS)
+    return armazenamento, cadastros, erro
+
+
+class _SinaisSincronizacao(QObject):
+    concluido = pyqtSignal(object, object, object)  # nova revisão, registros gravados, números removidos
+    falhou = pyqtSignal(object)  # exceção
+
+
+class _TarefaSincronizacao(QRunnable):
+    """Busca as OSs alteradas por outros terminais desde a última revisão lida."""
+
+    def __init__(self, armazenamento, revisao):
+        super().__init__()
+        self.armazenamento = armazenamento
+        self.revisao = revisao
+        self.sinais = _SinaisSincronizacao()
+
+    def run(self):
+        try:
+            revisao, registros, removidos = self.armazenamento.alteracoes_desde(self.revisao)
+        except Exception as e:
+            self.sinais.falhou.emit(e)
+        else:
+            self.sinais.concluido.emit(revisao, registros, removidos)
+
+
+class _SinaisLeituraLista(QObject):
+    concluido = pyqtSignal(int, object, object)  # geração, página (None para o total), registros ou total
+    falhou = pyqtSignal(int, object, object)  # geração, página (None para o total), exceção
+
+
+class _TarefaLeituraLista(QRunnable):
+    """Lê uma página da listagem de OSs (ou o total, com ``pagina`` None) fora da thread da interface."""
+
+    def __init__(self, geracao, pagina, funcao, *args, **kwargs):
+        super().__init__()
+        self.geracao = geracao
+        self.pagina = pagina
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+        self.sinais = _SinaisLeituraLista()
+
+    def run(self):
+        try:
+            resultado = self.funcao(*self.args, **self.kwargs)
+        except Exception as e:
+            self.sinais.falhou.emit(self.geracao, self.pagina, e)
+        else:
+            self.sinais.concluido.emit(self.geracao, self.pagina, resultado)
+
+
+class _SinaisCarregamento(QObject):
+    concluido = pyqtSignal(object, object, object)  # armazenamento, cadastros, erro da migração (ou None)
+    falhou = pyqtSignal(object)  # exceção
+
+
+class _TarefaCarregamento(QRunnable):
+    """Abre (e, na primeira vez, migra) os dados fora da thread da interface."""
+
+    def __init__(self):
+        super().__init__()
+        self.sinais = _SinaisCarregamento()
+
+    def run(self):
+        try:
+            armazenamento, cadastros, erro = _carregar_dados_os()
+        except Exception as e:
+            self.sinais.falhou.emit(e)
+        else:
+            self.sinais.concluido.emit(armazenamento, cadastros, erro)
+
+
+class _SinaisCEP(QObject):
+    concluido = pyqtSignal(str, object)  # cep, endereço (ou None se não existir)
+    falhou = pyqtSignal(str, object)  # cep, exceção
+
+
+class _TarefaCEP(QRunnable):
+    """Consulta o CEP fora da thread da interface; o resultado volta por sinal."""
+
+    def __init__(self, servico_cep, cep):
+        super().__init__()
+        self.servico_cep = servico_cep
+        self.cep = cep
+        self.sinais = _SinaisCEP()
+
+    def run(self):
+        try:
+            endereco = self.servico_cep.consultar(self.cep)
+        except Exception as e:
+            self.sinais.falhou.emit(self.cep, e)
+        else:
+            self.sinais.concluido.emit(self.cep, endereco)
+
+
+class _SinaisPDF(QObject):
+    concluido = pyqtSignal(object, str)  # future, caminho do PDF
+    falhou = pyqtSignal(object, object)  # future, exceção
+
+
+class _SinaisLotePDF(QObject):
+    progresso = pyqtSignal(int, int)  # concluídos, total
+    concluido = pyqtSignal(object)  # lista de arquivos gerados
+    falhou = pyqtSignal(object)  # exceção
+
+
+class _TarefaLotePDF(QRunnable):
+    """Roda a exportação em lote (que distribui os PDFs entre processos) fora da thread da interface."""
+
+    def __init__(self, armazenamento, pasta_saida, arquivo_mesclado, filtro):
+        super().__init__()
+        self.armazenamento = armazenamento
+        self.pasta_saida = pasta_saida
+        self.arquivo_mesclado = arquivo_mesclado
+        self.filtro = filtro
+        self.sinais = _SinaisLotePDF()
+
+    def run(self):
+        try:
+            arquivos = exportar_lote_pdf(self.armazenamento, self.pasta_saida, self.arquivo_mesclado,
+                                         progresso=self.sinais.progresso.emit, **self.filtro)
+        except Exception as e:
+            self.sinais.falhou.emit(e)
+        else:
+            self.sinais.concluido.emit(arquivos)
+
+
+class DialogoLotePDF(QDialog):
+    """Seleção das OSs para a exportação de PDFs em lote."""
+
+    def __init__(self, situacoes, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Exportar OSs em Lote (PDF)")
+        layout = QFormLayout(self)
+
+        self.check_periodo = QCheckBox("Filtrar por período")
+        self.check_periodo.setChecked(True)
+        layout.addRow(self.check_periodo)
+
+        hoje = QDate.currentDate()
+        self.data_inicio = QDateEdit(QDate(hoje.year(), hoje.month(), 1))
+        self.data_fim = QDateEdit(hoje)
+        for data_edit in (self.data_inicio, self.data_fim):
+            data_edit.setCalendarPopup(True)
+            data_edit.setDisplayFormat("dd/MM/yyyy")
+            self.check_periodo.toggled.connect(data_edit.setEnabled)
+        layout.addRow("De:", self.data_inicio)
+        layout.addRow("Até:", self.data_fim)
+
+        self.combo_situacao = QComboBox()
+        self.combo_situacao.addItems(situacoes)
+        layout.addRow("Situação Atual:", self.combo_situacao)
+
+        self.entry_numeros = QLineEdit()
+        self.entry_numeros.setPlaceholderText("Ex.: 12, 15, 000020 (vazio = todas)")
+        layout.addRow("Números das OS:", self.entry_numeros)
+
+        self.check_mesclar = QCheckBox("Gerar um único PDF com todas as OSs")
+        layout.addRow(self.check_mesclar)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botoes.accepted.connect(self.accept)
+        botoes.rejected.connect(self.reject)
+        layout.addRow(botoes)
+
+    def filtro(self):
+        filtro = {}
+        if self.check_periodo.isChecked():
+            filtro["data_inicio"] = self.data_inicio.date().toString("dd/MM/yyyy")
+            filtro["data_fim"] = self.data_fim.date().toString("dd/MM/yyyy")
+        if self.combo_situacao.currentText():
+            filtro["situacao"] = self.combo_situacao.currentText()
+        numeros = [n.strip() for n in self.entry_numeros.text().split(",") if n.strip()]
+        if numeros:
+            filtro["numeros"] = numeros
+        return filtro
+
+
+class _SinaisExportacao(QObject):
+    progresso = pyqtSignal(int, int)  # exportadas, total
+    concluido = pyqtSignal(object)  # (total, arquivos) ou None se cancelada
+    falhou = pyqtSignal(object)  # exceção
+
+
+class _TarefaExportacao(QRunnable):
+    """Grava a exportação das OSs fora da thread da interface; ``cancelada`` interrompe no próximo lote de linhas."""
+
+    def __init__(self, armazenamento, caminho, itens, filtro):
+        super().__init__()
+        self.armazenamento = armazenamento
+        self.caminho = caminho
+        self.itens = itens
+        self.filtro = filtro
+        self.cancelada = False
+        self.sinais = _SinaisExportacao()
+
+    def run(self):
+        try:
+            resultado = exportar_os(self.armazenamento, self.caminho, itens=self.itens,
+                                    progresso=self.sinais.progresso.emit, cancelado=lambda: self.cancelada,
+                                    **self.filtro)
+        except Exception as e:
+            self.sinais.falhou.emit(e)
+        else:
+            self.sinais.concluido.emit(resultado)
+
+
+class DialogoExportacao(QDialog):
+    """Seleção das OSs exportadas para Excel, CSV ou JSON Lines (ex.: fechamento do mês)."""
+
+    def __init__(self, situacoes, condicoes_pagamento, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Exportar OSs")
+        layout = QFormLayout(self)
+
+        self.check_periodo = QCheckBox("Filtrar por período")
+        self.check_periodo.setChecked(True)
+        layout.addRow(self.check_periodo)
+
+        hoje = QDate.currentDate()
+        inicio_mes_passado = QDate(hoje.year(), hoje.month(), 1).addMonths(-1)
+        self.data_inicio = QDateEdit(inicio_mes_passado)
+        self.data_fim = QDateEdit(inicio_mes_passado.addMonths(1).addDays(-1))
+        for data_edit in (self.data_inicio, self.data_fim):
+            data_edit.setCalendarPopup(True)
+            data_edit.setDisplayFormat("dd/MM/yyyy")
+            self.check_periodo.toggled.connect(data_edit.setEnabled)
+        layout.addRow("De:", self.data_inicio)
+        layout.addRow("Até:", self.data_fim)
+
+        self.combo_situacao = QComboBox()
+        self.combo_situacao.addItems(situacoes)
+        layout.addRow("Situação Atual:", self.combo_situacao)
+
+        self.combo_pagamento = QComboBox()
+        self.combo_pagamento.addItems(condicoes_pagamento)
+        layout.addRow("Condições de Pagamento:", self.combo_pagamento)
+
+        self.check_itens = QCheckBox("Incluir as peças e serviços de cada OS")
+        self.check_itens.setChecked(True)
+        layout.addRow(self.check_itens)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botoes.accepted.connect(self.accept)
+        botoes.rejected.connect(self.reject)
+        layout.addRow(botoes)
+
+    def filtro(self):
+        filtro = {}
+        if self.check_periodo.isChecked():
+            filtro["data_inicio"] = self.data_inicio.date().toString("dd/MM/yyyy")
+            filtro["data_fim"] = self.data_fim.date().toString("dd/MM/yyyy")
+        if self.combo_situacao.currentText():
+            filtro["situacao"] = self.combo_situacao.currentText()
+        if self.combo_pagamento.currentText():
+            filtro["condicoes_pagamento"] = self.combo_pagamento.currentText()
+        return filtro
+
+
+class DialogoPesquisaOS(QDialog):
+    """Busca por cliente, placa, CPF/CNPJ, problemas, serviço executado ou peças, com resultados paginados."""
+
+    POR_PAGINA = 50
+    COLUNAS = (
+        ("Numero_OS", "OS"), ("Data_OS", "Data"), ("Nome_Cliente", "Cliente"), ("Placa_Veiculo", "Placa"),
+        ("Situacao_Atual", "Situação"), ("Problema_Constatado", "Problema Constatado"),
+    )
+
+    os_escolhida = pyqtSignal(str)  # Numero_OS
+
+    def __init__(self, armazenamento, parent=None):
+        super().__init__(parent)
+        self.armazenamento = armazenamento
+        self._pagina = 0
+        self._total = 0
+        self.setWindowTitle("Pesquisar OS")
+        self.resize(900, 500)
+        layout = QVBoxLayout(self)
+
+        self.entry_consulta = QLineEdit()
+        self.entry_consulta.setPlaceholderText("Nome, placa, CPF/CNPJ, problema, serviço ou peça (ex.: embreagem)")
+        layout.addWidget(self.entry_consulta)
+
+        self.tabela = QTableWidget(0, len(self.COLUNAS))
+        self.tabela.setHorizontalHeaderLabels([titulo for _, titulo in self.COLUNAS])
+        self.tabela.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tabela.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tabela.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.tabela.verticalHeader().hide()
+        self.tabela.horizontalHeader().setStretchLastSection(True)
+        self.tabela.itemDoubleClicked.connect(self._abrir)
+        layout.addWidget(self.tabela, 1)
+
+        paginacao_layout = QHBoxLayout()
+        self.label_resultados = QLabel("Digite algo para pesquisar.")
+        paginacao_layout.addWidget(self.label_resultados, 1)
+        self.btn_anterior = QPushButton("< Anterior")
+        self.btn_anterior.clicked.connect(lambda: self._ir_para(self._pagina - 1))
+        paginacao_layout.addWidget(self.btn_anterior)
+        self.btn_proxima = QPushButton("Próxima >")
+        self.btn_proxima.clicked.connect(lambda: self._ir_para(self._pagina + 1))
+        paginacao_layout.addWidget(self.btn_proxima)
+        layout.addLayout(paginacao_layout)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Open | QDialogButtonBox.Close)
+        botoes.accepted.connect(self._abrir)
+        botoes.rejected.connect(self.reject)
+        layout.addWidget(botoes)
+
+        # Pesquisa enquanto digita, mas só depois de uma pausa curta
+        self._espera = QTimer(self)
+        self._espera.setSingleShot(True)
+        self._espera.setInterval(250)
+        self._espera.timeout.connect(lambda: self._ir_para(0))
+        self.entry_consulta.textChanged.connect(self._espera.start)
+        self.entry_consulta.returnPressed.connect(lambda: self._ir_para(0))
+        self._atualizar_paginacao()
+
+    def _ir_para(self, pagina):
+        self._espera.stop()
+        consulta = self.entry_consulta.text().strip()
+        registros, total = [], 0
+        if consulta:
+            try:
+                with medir("ui.pesquisar"):
+                    registros, total = self.armazenamento.buscar(consulta, self.POR_PAGINA,
+                                                                 pagina * self.POR_PAGINA)
+            except Exception as e:
+                QMessageBox.critical(self, "Erro na Pesquisa", f"Não foi possível pesquisar: {e}")
+                log.exception("Detalhes do erro ao pesquisar '%s': %s", consulta, e)
+                return
+        self._pagina, self._total = pagina, total
+
+        self.tabela.setRowCount(len(registros))
+        for linha, registro in enumerate(registros):
+            for coluna, (campo, _) in enumerate(self.COLUNAS):
+                valor = registro.get(campo)
+                self.tabela.setItem(linha, coluna, QTableWidgetItem("" if valor_vazio(valor) else str(valor)))
+        self.tabela.resizeColumnsToContents()
+        if registros:
+            self.tabela.selectRow(0)
+
+        if not consulta:
+            self.label_resultados.setText("Digite algo para pesquisar.")
+        else:
+            paginas = max(1, -(-total // self.POR_PAGINA))
+            self.label_resultados.setText(f"{total} OS encontrada(s) - página {pagina + 1} de {paginas}")
+        self._atualizar_paginacao()
+
+    def _atualizar_paginacao(self):
+        self.btn_anterior.setEnabled(self._pagina > 0)
+        self.btn_proxima.setEnabled((self._pagina + 1) * self.POR_PAGINA < self._total)
+
+    def _abrir(self, *_):
+        linha = self.tabela.currentRow()
+        if linha < 0:
+            return
+        self.os_escolhida.emit(self.tabela.item(linha, 0).text())
+        self.accept()
+
+
+class ModeloListaOS(QAbstractTableModel):
+    """Modelo preguiçoso da listagem de OSs: busca no armazenamento só as páginas que aparecem na tela.
+
+    As páginas lidas ficam num cache LRU pequeno; a ordenação e o filtro são
+    aplicados pelo armazenamento (SQL), nunca carregando todas as OSs. O total
+    e as páginas são lidos no QThreadPool (no modo servidor, cada leitura é uma
+    requisição HTTP): até a página chegar, suas linhas mostram "Carregando...",
+    e a chegada emite ``dataChanged``. Cada filtro ou ordenação abre uma nova
+    geração, e as leituras de gerações anteriores são descartadas.
+    """
+
+    total_alterado = pyqtSignal(int)
+    falhou = pyqtSignal(object)  # exceção
+
+    TAMANHO_PAGINA = 200
+    MAX_PAGINAS = 20
+    COLUNAS = (
+        ("Numero_OS", "OS"), ("Data_OS", "Data"), ("Nome_Cliente", "Cliente"), ("Placa_Veiculo", "Placa"),
+        ("Situacao_Atual", "Situação"), ("Valor_Total_Final", "Total (R$)"),
+    )
+
+    def __init__(self, armazenamento, parent=None):
+        super().__init__(parent)
+        self.armazenamento = armazenamento
+        self._filtro = {}
+        self._ordem = "Data_OS"
+        self._decrescente = True
+        self._total = None
+        self._paginas = OrderedDict()  # número da página -> lista de registros
+        self._geracao = 0
+        self._pedidas = set()  # páginas (e None, o total) com leitura em andamento nesta geração
+        self._leituras = set()  # sinais das tarefas em andamento, mantidos vivos até a resposta
+
+    def _limpar_cache(self):
+        self._geracao += 1
+        self._total = None
+        self._paginas.clear()
+        self._pedidas.clear()
+
+    def recarregar(self):
+        self.beginResetModel()
+        self._limpar_cache()
+        self.endResetModel()
+
+    def definir_filtro(self, **filtro):
+        self._filtro = filtro
+        self.recarregar()
+
+    def _ler(self, numero, funcao, *args, **kwargs):
+        if numero in self._pedidas:
+            return
+        self._pedidas.add(numero)
+        tarefa = _TarefaLeituraLista(self._geracao, numero, funcao, *args, **kwargs)
+        tarefa.sinais.concluido.connect(self._leitura_concluida)
+        tarefa.sinais.falhou.connect(self._leitura_falhou)
+        self._leituras.add(tarefa.sinais)
+        QThreadPool.globalInstance().start(tarefa)
+
+    def _fim_leitura(self, geracao, numero):
+        self._leituras.discard(self.sender())
+        if geracao != self._geracao:
+            return False  # Resposta de um filtro ou ordenação que já foi trocado
+        self._pedidas.discard(numero)
+        return True
+
+    def _leitura_concluida(self, geracao, numero, resultado):
+        if not self._fim_leitura(geracao, numero):
+            return
+        if numero is None:
+            self._definir_total(resultado)
+            return
+        self._paginas[numero] = resultado
+        if len(self._paginas) > self.MAX_PAGINAS:
+            self._paginas.popitem(last=False)
+        primeira = numero * self.TAMANHO_PAGINA
+        ultima = min(primeira + self.TAMANHO_PAGINA, self._total or 0) - 1
+        if ultima >= primeira:
+            self.dataChanged.emit(self.index(primeira, 0), self.index(ultima, len(self.COLUNAS) - 1))
+
+    def _leitura_falhou(self, geracao, numero, erro):
+        if not self._fim_leitura(geracao, numero):
+            return
+        log.error("Erro ao ler a listagem de OSs: %s", erro)
+        if numero is None:
+            self._definir_total(0)
+        else:
+            # Página vazia em vez de repetir a leitura a cada repintura; recarregar() tenta de novo
+            self._paginas[numero] = []
+        self.falhou.emit(erro)
+
+    def _definir_total(self, total):
+        if total > 0:
+            self.beginInsertRows(QModelIndex(), 0, total - 1)
+            self._total = total
+            self.endInsertRows()
+        else:
+            self._total = total
+        self.total_alterado.emit(total)
+
+    def pagina_carregada(self, linha):
+        return linha // self.TAMANHO_PAGINA in self._paginas
+
+    def registro(self, linha):
+        """Registro da linha, ou None se a página ainda não chegou (a leitura é pedida) ou a OS sumiu."""
+        numero = linha // self.TAMANHO_PAGINA
+        pagina = self._paginas.get(numero)
+        if pagina is None:
+            self._ler(numero, self.armazenamento.listar_pagina, self._ordem, self._decrescente,
+                      self.TAMANHO_PAGINA, numero * self.TAMANHO_PAGINA, **self._filtro)
+            return None
+        self._paginas.move_to_end(numero)
+        posicao = linha % self.TAMANHO_PAGINA
+        return pagina[posicao] if posicao < len(pagina) else None
+
+    def total(self):
+        """Total de OSs do filtro, ou None enquanto a contagem não chegou."""
+        return self._total
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._total is None:
+            self._ler(None, self.armazenamento.contar, **self._filtro)
+            return 0
+        return self._total
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUNAS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        campo = self.COLUNAS[index.column()][0]
+        if role == Qt.TextAlignmentRole and campo == "Valor_Total_Final":
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role != Qt.DisplayRole:
+            return None
+        registro = self.registro(index.row())
+        if registro is None:
+            if index.column() == 0 and not self.pagina_carregada(index.row()):
+                return "Carregando..."
+            return None  # Página a caminho, ou a OS sumiu entre a contagem e a leitura da página
+        if campo == "Valor_Total_Final":
+            return formatar_dinheiro(registro.get(campo))
+        return padrao_se_vazio(registro.get(campo))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUNAS[section][1]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        self._ordem = self.COLUNAS[column][0]
+        self._decrescente = order == Qt.DescendingOrder
+        self._limpar_cache()
+        self.endResetModel()
+
+
+class ModeloItensOS(QAbstractListModel):
+    """Itens da OS em edição, com o total mantido a cada alteração.
+
+    O total é um Decimal somado e subtraído item a item: incluir, alterar ou
+    remover um item não percorre a lista nem acumula erro de ponto flutuante.
+    """
+
+    total_alterado = pyqtSignal(object)  # Decimal
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._itens = []
+        self._totais = []  # Decimal de cada item, na mesma ordem de _itens
+        self._total = Decimal("0.00")
+
+    @staticmethod
+    def texto_item(item):
+        return (f"Tipo: {item['tipo']} | Ref: {item['referencia']} - {item['descricao']} | "
+                f"Qtde: {item['quantia']} x R$ {formatar_dinheiro(item['valor'])} | Desc: {item['desc']:.0f}% = "
+                f"R$ {formatar_dinheiro(item['valor_total'])}")
+
+    @property
+    def total(self):
+        return self._total
+
+    def itens(self):
+        return list(self._itens)
+
+    def item(self, linha):
+        return self._itens[linha]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._itens)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.texto_item(self._itens[index.row()])
+        if role == Qt.UserRole:
+            return self._itens[index.row()]
+        return None
+
+    def _somar(self, valor):
+        self._total += valor
+        self.total_alterado.emit(self._total)
+
+    def adicionar(self, item):
+        linha = len(self._itens)
+        self.beginInsertRows(QModelIndex(), linha, linha)
+        self._itens.append(item)
+        self._totais.append(para_decimal(item["valor_total"]))
+        self.endInsertRows()
+        self._somar(self._totais[linha])
+
+    def substituir(self, linha, item):
+        anterior = self._totais[linha]
+        self._itens[linha] = item
+        self._totais[linha] = para_decimal(item["valor_total"])
+        indice = self.index(linha)
+        self.dataChanged.emit(indice, indice)
+        self._somar(self._totais[linha] - anterior)
+
+    def remover(self, linha):
+        self.beginRemoveRows(QModelIndex(), linha, linha)
+        del self._itens[linha]
+        total_item = self._totais.pop(linha)
+        self.endRemoveRows()
+        self._somar(-total_item)
+
+    def definir_itens(self, itens):
+        self.beginResetModel()
+        self._itens = list(itens)
+        self._totais = [para_decimal(item["valor_total"]) for item in self._itens]
+        self._total = sum(self._totais, Decimal("0.00"))
+        self.endResetModel()
+        self.total_alterado.emit(self._total)
+
+
+class JanelaListaOS(QDialog):
+    """Navegação por todas as OSs, com filtros e colunas ordenáveis (clique no cabeçalho)."""
+
+    os_escolhida = pyqtSignal(str)  # Numero_OS
+
+    def __init__(self, armazenamento, situacoes, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Ordens de Serviço")
+        self.resize(1000, 600)
+        layout = QVBoxLayout(self)
+
+        filtros_layout = QHBoxLayout()
+        self.entry_consulta = QLineEdit()
+        self.entry_consulta.setPlaceholderText("Cliente, placa, CPF/CNPJ, problema ou peça")
+        filtros_layout.addWidget(self.entry_consulta, 2)
+        self.combo_situacao = QComboBox()
+        self.combo_situacao.addItems(situacoes)
+        filtros_layout.addWidget(QLabel("Situação:"))
+        filtros_layout.addWidget(self.combo_situacao)
+        self.check_periodo = QCheckBox("Período:")
+        filtros_layout.addWidget(self.check_periodo)
+        hoje = QDate.currentDate()
+        self.data_inicio = QDateEdit(QDate(hoje.year(), hoje.month(), 1))
+        self.data_fim = QDateEdit(hoje)
+        for data_edit in (self.data_inicio, self.data_fim):
+            data_edit.setCalendarPopup(True)
+            data_edit.setDisplayFormat("dd/MM/yyyy")
+            data_edit.setEnabled(False)
+            self.check_periodo.toggled.connect(data_edit.setEnabled)
+            data_edit.dateChanged.connect(self._agendar_filtro)
+            filtros_layout.addWidget(data_edit)
+        layout.addLayout(filtros_layout)
+
+        self.modelo = ModeloListaOS(armazenamento, self)
+        self.modelo.total_alterado.connect(self._atualizar_total)
+        self.modelo.falhou.connect(self._leitura_falhou)
+        self.tabela = QTableView()
+        self.tabela.setModel(self.modelo)
+        self.tabela.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tabela.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.tabela.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # Altura fixa das linhas: a tabela não precisa medir cada linha para desenhar a barra de rolagem
+        self.tabela.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.tabela.verticalHeader().setDefaultSectionSize(22)
+        self.tabela.verticalHeader().hide()
+        self.tabela.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.tabela.setSortingEnabled(True)
+        self.tabela.sortByColumn(1, Qt.DescendingOrder)
+        self.tabela.doubleClicked.connect(self._abrir)
+        layout.addWidget(self.tabela, 1)
+
+        rodape_layout = QHBoxLayout()
+        self.label_total = QLabel()
+        rodape_layout.addWidget(self.label_total, 1)
+        botoes = QDialogButtonBox(QDialogButtonBox.Open | QDialogButtonBox.Close)
+        botoes.accepted.connect(self._abrir)
+        botoes.rejected.connect(self.reject)
+        rodape_layout.addWidget(botoes)
+        layout.addLayout(rodape_layout)
+
+        self._espera = QTimer(self)
+        self._espera.setSingleShot(True)
+        self._espera.setInterval(250)
+        self._espera.timeout.connect(self._aplicar_filtro)
+        self.entry_consulta.textChanged.connect(self._agendar_filtro)
+        self.combo_situacao.currentIndexChanged.connect(self._agendar_filtro)
+        self.check_periodo.toggled.connect(self._agendar_filtro)
+        self._atualizar_total()
+
+    def _agendar_filtro(self, *_):
+        self._espera.start()
+
+    def _aplicar_filtro(self):
+        filtro = {}
+        if self.entry_consulta.text().strip():
+            filtro["consulta"] = self.entry_consulta.text().strip()
+        if self.combo_situacao.currentText():
+            filtro["situacao"] = self.combo_situacao.currentText()
+        if self.check_periodo.isChecked():
+            filtro["data_inicio"] = self.data_inicio.date().toString("dd/MM/yyyy")
+            filtro["data_fim"] = self.data_fim.date().toString("dd/MM/yyyy")
+        self.modelo.definir_filtro(**filtro)
+        self._atualizar_total()
+
+    def _atualizar_total(self, *_):
+        total = self.modelo.total()
+        self.label_total.setText("Contando OSs..." if total is None else f"{total} OS(s)")
+
+    def _leitura_falhou(self, erro):
+        self.label_total.setText(f"Não foi possível ler as OSs: {erro}")
+
+    def recarregar(self):
+        self.modelo.recarregar()
+        self._atualizar_total()
+
+    def _abrir(self, *_):
+        linha = self.tabela.currentIndex().row()
+        registro = self.modelo.registro(linha) if linha >= 0 else None
+        if registro is not None:
+            self.os_escolhida.emit(registro["Numero_OS"])
+
+
+def _preencher_tabela(tabela, titulos, linhas, numericas=()):
+    """Preenche um QTableWidget com linhas de textos; as colunas em ``numericas`` ficam alinhadas à direita."""
+    tabela.setColumnCount(len(titulos))
+    tabela.setHorizontalHeaderLabels(titulos)
+    tabela.setRowCount(len(linhas))
+    for i, linha in enumerate(linhas):
+        for j, valor in enumerate(linha):
+            item = QTableWidgetItem(valor)
+            if j in numericas:
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            tabela.setItem(i, j, item)
+    tabela.resizeColumnsToContents()
+
+
+def _periodo_para_exibir(periodo):
+    """'2025-06-11' -> '11/06/2025', '2025-06' -> '06/2025'."""
+    if not periodo:
+        return "(sem data)"
+    return "/".join(reversed(periodo.split("-")))
+
+
+def _formatar_horas(horas):
+    if horas is None:
+        return "-"
+    if horas >= 48:
+        return f"{horas / 24:.1f} dias".replace(".", ",")
+    return f"{horas:.1f} h".replace(".", ",")
+
+
+class DialogoRelatorios(QDialog):
+    """Faturamento, peças mais usadas e tempo em cada situação, lidos dos resumos do armazenamento."""
+
+    PERIODOS = (("Mês", "mes"), ("Dia", "dia"), ("Ano", "ano"))
+    AGRUPAMENTOS = (("Nenhum", None), ("Condição de pagamento", "pagamento"), ("Responsável", "responsavel"),
+                    ("Situação", "situacao"))
+
+    def __init__(self, armazenamento, situacoes, parent=None):
+        super().__init__(parent)
+        self.armazenamento = armazenamento
+        self.setWindowTitle("Relatórios")
+        self.resize(800, 550)
+        layout = QVBoxLayout(self)
+        abas = QTabWidget()
+        layout.addWidget(abas, 1)
+
+        # --- Faturamento ---
+        aba = QWidget()
+        aba_layout = QVBoxLayout(aba)
+        filtros_layout = QHBoxLayout()
+        self.combo_periodo = QComboBox()
+        for titulo, valor in self.PERIODOS:
+            self.combo_periodo.addItem(titulo, valor)
+        filtros_layout.addWidget(QLabel("Por:"))
+        filtros_layout.addWidget(self.combo_periodo)
+        self.combo_agrupamento = QComboBox()
+        for titulo, valor in self.AGRUPAMENTOS:
+            self.combo_agrupamento.addItem(titulo, valor)
+        filtros_layout.addWidget(QLabel("Agrupar:"))
+        filtros_layout.addWidget(self.combo_agrupamento)
+        self.combo_situacao = QComboBox()
+        self.combo_situacao.addItems(situacoes)
+        filtros_layout.addWidget(QLabel("Situação:"))
+        filtros_layout.addWidget(self.combo_situacao)
+        self.check_periodo = QCheckBox("Período:")
+        filtros_layout.addWidget(self.check_periodo)
+        hoje = QDate.currentDate()
+        self.data_inicio = QDateEdit(QDate(hoje.year(), 1, 1))
+        self.data_fim = QDateEdit(hoje)
+        for data_edit in (self.data_inicio, self.data_fim):
+            data_edit.setCalendarPopup(True)
+            data_edit.setDisplayFormat("dd/MM/yyyy")
+            data_edit.setEnabled(False)
+            self.check_periodo.toggled.connect(data_edit.setEnabled)
+            data_edit.dateChanged.connect(self._atualizar_faturamento)
+            filtros_layout.addWidget(data_edit)
+        filtros_layout.addStretch(1)
+        aba_layout.addLayout(filtros_layout)
+        self.tabela_faturamento = self._criar_tabela()
+        aba_layout.addWidget(self.tabela_faturamento, 1)
+        self.label_faturamento = QLabel()
+        aba_layout.addWidget(self.label_faturamento)
+        abas.addTab(aba, "Faturamento")
+        for combo in (self.combo_periodo, self.combo_agrupamento, self.combo_situacao):
+            combo.currentIndexChanged.connect(self._atualizar_faturamento)
+        self.check_periodo.toggled.connect(self._atualizar_faturamento)
+
+        # --- Peças ---
+        aba = QWidget()
+        aba_layout = QVBoxLayout(aba)
+        filtros_layout = QHBoxLayout()
+        self.combo_tipo = QComboBox()
+        for titulo, valor in (("Peças", "Peça"), ("Serviços", "Serviço"), ("Todos", None)):
+            self.combo_tipo.addItem(titulo, valor)
+        self.combo_tipo.currentIndexChanged.connect(self._atualizar_pecas)
+        filtros_layout.addWidget(QLabel("Mostrar:"))
+        filtros_layout.addWidget(self.combo_tipo)
+        filtros_layout.addStretch(1)
+        aba_layout.addLayout(filtros_layout)
+        self.tabela_pecas = self._criar_tabela()
+        aba_layout.addWidget(self.tabela_pecas, 1)
+        abas.addTab(aba, "Peças e Serviços")
+
+        # --- Situações ---
+        self.tabela_situacoes = self._criar_tabela()
+        abas.addTab(self.tabela_situacoes, "Tempo por Situação")
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Close)
+        botoes.rejected.connect(self.reject)
+        layout.addWidget(botoes)
+        self.recarregar()
+
+    @staticmethod
+    def _criar_tabela():
+        tabela = QTableWidget(0, 0)
+        tabela.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        tabela.setSelectionBehavior(QAbstractItemView.SelectRows)
+        tabela.verticalHeader().hide()
+        tabela.horizontalHeader().setStretchLastSection(True)
+        return tabela
+
+    def _consultar(self, funcao, *args, **kwargs):
+        try:
+            return funcao(self.armazenamento, *args, **kwargs)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro nos Relatórios", f"Não foi possível gerar o relatório: {e}")
+            log.exception("Detalhes do erro ao gerar o relatório %s: %s", funcao.__name__, e)
+            return None
+
+    def recarregar(self):
+        self._atualizar_faturamento()
+        self._atualizar_pecas()
+        self._atualizar_situacoes()
+
+    def _atualizar_faturamento(self, *_):
+        por = self.combo_agrupamento.currentData()
+        filtro = {"situacao": self.combo_situacao.currentText() or None}
+        if self.check_periodo.isChecked():
+            filtro["data_inicio"] = self.data_inicio.date().toString("dd/MM/yyyy")
+            filtro["data_fim"] = self.data_fim.date().toString("dd/MM/yyyy")
+        linhas = self._consultar(faturamento, self.combo_periodo.currentData(), por, **filtro)
+        if linhas is None:
+            return
+        titulos = ["Período"] + ([self.combo_agrupamento.currentText()] if por else []) + ["OSs", "Valor (R$)"]
+        _preencher_tabela(self.tabela_faturamento, titulos, [
+            [_periodo_para_exibir(linha["periodo"])] + ([linha[por] or "(não informado)"] if por else [])
+            + [str(linha["ordens"]), formatar_dinheiro(linha["valor"])]
+            for linha in linhas], numericas=(len(titulos) - 2, len(titulos) - 1))
+        total = sum(linha["valor"] for linha in linhas)
+        self.label_faturamento.setText(f"{sum(linha['ordens'] for linha in linhas)} OS(s), "
+                                       f"total R$ {formatar_dinheiro(total)}")
+
+    def _atualizar_pecas(self, *_):
+        linhas = self._consultar(pecas_mais_usadas, 100, self.combo_tipo.currentData())
+        if linhas is None:
+            return
+        _preencher_tabela(self.tabela_pecas, ["Referência", "Descrição", "Quantidade", "Valor (R$)", "OSs"], [
+            [linha["referencia"], linha["descricao"] or "", str(linha["quantidade"]), formatar_dinheiro(linha["valor"]),
+             str(linha["ordens"])]
+            for linha in linhas], numericas=(2, 3, 4))
+
+    def _atualizar_situacoes(self):
+        linhas = self._consultar(tempo_por_situacao)
+        if linhas is None:
+            return
+        titulos = ["Situação", "OSs nela agora", "Mudanças registradas", "Tempo médio até sair"]
+        _preencher_tabela(self.tabela_situacoes, titulos, [
+            [linha["situacao"] or "(não informada)", str(linha["ordens"]), str(linha["mudancas"]),
+             _formatar_horas(linha["media_horas"])]
+            for linha in linhas], numericas=(1, 2, 3))
+
+
+class DialogoDiagnostico(QDialog):
+    """Tempos das operações medidas desde a abertura (ou desde "Zerar"), com exportação em JSON."""
+
+    TITULOS = ["Operação", "Vezes", "Erros", "Média (ms)", "p50 (ms)", "p95 (ms)", "Máximo (ms)"]
+
+    def __init__(self, armazenamento=None, parent=None):
+        super().__init__(parent)
+        self.armazenamento = armazenamento
+        self.setWindowTitle("Diagnóstico")
+        self.resize(760, 450)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Tempos medidos neste terminal. As faixas completas estão no JSON exportado."))
+        self.tabela = DialogoRelatorios._criar_tabela()
+        layout.addWidget(self.tabela, 1)
+        self.check_detalhes = QCheckBox("Registrar cada operação no log (nível DEBUG)")
+        self.check_detalhes.setChecked(logging.getLogger().isEnabledFor(logging.DEBUG))
+        self.check_detalhes.toggled.connect(
+            lambda ativo: logging.getLogger().setLevel(logging.DEBUG if ativo else logging.INFO))
+        layout.addWidget(self.check_detalhes)
+
+        botoes = QDialogButtonBox(QDialogButtonBox.Close)
+        botoes.addButton("Atualizar", QDialogButtonBox.ActionRole).clicked.connect(self.recarregar)
+        botoes.addButton("Zerar", QDialogButtonBox.ResetRole).clicked.connect(self._zerar)
+        botoes.addButton("Exportar JSON...", QDialogButtonBox.ActionRole).clicked.connect(self._exportar)
+        botoes.rejected.connect(self.reject)
+        layout.addWidget(botoes)
+        self.recarregar()
+
+    @staticmethod
+    def _ms(valor):
+        return "-" if valor is None else f"{valor:.1f}".replace(".", ",")
+
+    def _linhas(self, operacoes, prefixo=""):
+        return [[prefixo + nome, str(dados["contagem"]), str(dados["erros"]), self._ms(dados["media_ms"]),
+                 self._ms(dados["p50_ms"]), self._ms(dados["p95_ms"]), self._ms(dados["maximo_ms"])]
+                for nome, dados in operacoes.items()]
+
+    def recarregar(self):
+        linhas = self._linhas(metricas.instantaneo())
+        if isinstance(self.armazenamento, ArmazenamentoRemoto):
+            try:
+                linhas += self._linhas(self.armazenamento.diagnostico_servidor(), "servidor: ")
+            except Exception as e:
+                log.warning("Não foi possível ler o diagnóstico do servidor: %s", e)
+        _preencher_tabela(self.tabela, self.TITULOS, linhas, numericas=(1, 2, 3, 4, 5, 6))
+
+    def _zerar(self):
+        metricas.zerar()
+        self.recarregar()
+
+    def _exportar(self):
+        caminho, _ = QFileDialog.getSaveFileName(self, "Exportar diagnóstico", ARQUIVO_DIAGNOSTICO, "JSON (*.json)")
+        if not caminho:
+            return
+        try:
+            metricas.exportar_json(caminho)
+        except OSError as e:
+            QMessageBox.critical(self, "Erro ao Exportar", f"Não foi possível gravar {caminho}: {e}")
+            return
+        QMessageBox.information(self, "Diagnóstico Exportado", f"Tempos gravados em:\n{caminho}")
+
+
 class OficinaOSApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -139,6 +1125,8 @@ class OficinaOSApp(QWidget):
             QPushButton#btnDeletar:hover { background-color: #c82333; }
             QPushButton#btnGerarPDF { background-color: #17a2b8; }
             QPushButton#btnGerarPDF:hover { background-color: #138496; }
+            QPushButton#btnLotePDF { background-color: #17a2b8; }
+            QPushButton#btnLotePDF:hover { background-color: #138496; }
             QPushButton#btnSair { background-color: #6f42c1; }
             QPushButton#btnSair:hover { background-color: #563d7c; }
 
@@ -148,7 +1136,7 @@ class OficinaOSApp(QWidget):
                 font-size: 9pt;
                 padding: 3px;
             }
-            QListWidget {
+            QListView {
                 border: 1px solid #c0c0c0;
                 border-radius: 5px;
                 background-color: #ffffff;
@@ -159,131 +1147,149 @@ class OficinaOSApp(QWidget):
 
         try:
             os.makedirs(PASTA_OS_CLIENTES, exist_ok=True)
-            print(f"Pasta '{PASTA_OS_CLIENTES}' verificada/criada com sucesso.")
+            log.debug("Pasta '%s' verificada/criada com sucesso.", PASTA_OS_CLIENTES)
         except Exception as e:
             QMessageBox.critical(self, "Erro de Pasta",
                                  f"Não foi possível criar a pasta '{PASTA_OS_CLIENTES}': {e}\nVerifique as permissões.")
-            print(f"Erro ao criar pasta: {e}", file=sys.stderr)
-
-        self.df_os = self._carregar_dados_os()
-        self.itens_pecas_servicos_cache = []
-
-        self.env = Environment(loader=FileSystemLoader('.'))
-        self.env.filters['format_money'] = self._format_money_filter
-        self.env.filters['km_format'] = self._km_format_filter
-        self.env.filters['default_if_nan'] = self._default_if_nan_filter
+            log.error("Erro ao criar pasta: %s", e)
+
+        # Preenchidos quando o carregamento em segundo plano termina (_dados_carregados)
+        self.armazenamento = None
+        self.cadastros = None  # Clientes e veículos em memória para o autocompletar
+        self.linha_item_em_edicao = None  # Item da lista carregado nos campos para alteração
+        self.numero_os_carregado = None  # None enquanto o formulário for de uma OS nova
+        self.versao_os_carregada = None  # Versao da OS aberta, conferida ao salvar/deletar
+        self.servico_cep = self._criar_servico_cep()
+        self._consultas_cep = set()  # Mantém os sinais vivos até a resposta chegar
+
+        # Os PDFs são renderizados em outro processo; o template usa os filtros de oficina_core.formatacao.
+        # Com servidor, quem renderiza é ele (FilaRenderizacaoRemota, criada quando os dados carregam)
+        self.fila_pdf = None
+        if not URL_SERVIDOR_OS:
+            self.fila_pdf = FilaRenderizacao(max_workers=1, pasta_base=os.getcwd(), template_file=HTML_TEMPLATE_FILE,
+                                             caminho_logo=os.path.abspath(ARQUIVO_LOGO))
+        self._sinais_pdf = _SinaisPDF()
+        self._sinais_pdf.concluido.connect(self._pdf_concluido)
+        self._sinais_pdf.falhou.connect(self._pdf_falhou)
+        self._progresso_pdf = {}  # future -> QProgressDialog
+        self._lotes_pdf = set()  # Sinais das exportações em lote em andamento
+        self._exportacoes = set()  # Sinais das exportações de OSs em andamento
+        self._janela_lista_os = None  # Não modal; reaproveitada e atualizada a cada gravação
+
+        # Alterações feitas por outros terminais no mesmo banco chegam por consulta periódica
+        self._revisao = 0
+        self._sincronizacao = None
+        self._aviso_os_alterada = None  # Número da OS aberta que já gerou o aviso de alteração externa
+        self._timer_sincronizacao = QTimer(self)
+        self._timer_sincronizacao.setInterval(INTERVALO_SINCRONIZACAO_MS)
+        self._timer_sincronizacao.timeout.connect(self._sincronizar)
 
         self._criar_interface()
-        self._gerar_novo_id_os()
 
-    # --- Filtros Jinja2 ---
-    def _format_money_filter(self, value):
-        try:
-            if pd.isna(value) or value is None:
-                value = 0.0
-            val = float(value)
-            return f"{val:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-        except (ValueError, TypeError):
-            return f"{0.00:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-
-    def _km_format_filter(self, value):
-        try:
-            if pd.isna(value) or value is None:
-                value = ""
-            clean_text = ''.join(filter(str.isdigit, str(value)))
-            if clean_text:
-                return f"{int(clean_text):,}".replace(',', '.')
-            return ""
-        except (ValueError, TypeError):
-            return ""
-
-    def _default_if_nan_filter(self, value):
-        if pd.isna(value) or value is None:
-            return ""
-        return str(value)
-
-    # --- Fim dos Filtros Jinja2 ---
-
-    def _carregar_dados_os(self):
-        """Carrega os dados das OSs do arquivo Excel ou cria e inicializa um DataFrame vazio."""
-        if os.path.exists(ARQUIVO_EXCEL):
-            try:
-                converters = {
-                    'Numero_OS': str,
-                    'KM_Atual_Veiculo': lambda x: int(str(x).replace('.', '').replace(',', '')) if str(x).replace('.',
-                                                                                                                  '').replace(
-                        ',', '').isdigit() else pd.NA,
-                    'Total_Itens': lambda x: float(str(x).replace('.', '').replace(',', '.')) if isinstance(x,
-                                                                                                            str) and ',' in x else float(
-                        x) if x is not None else pd.NA,
-                    'Valor_Total_Final': lambda x: float(str(x).replace('.', '').replace(',', '.')) if isinstance(x,
-                                                                                                                  str) and ',' in x else float(
-                        x) if x is not None else pd.NA,
-                    'Deslocamento': lambda x: float(str(x).replace('.', '').replace(',', '.')) if isinstance(x,
-                                                                                                             str) and ',' in x else float(
-                        x) if x is not None else pd.NA,
-                    'Desconto_Geral': lambda x: float(str(x).replace('.', '').replace(',', '.')) if isinstance(x,
-                                                                                                               str) and ',' in x else float(
-                        x) if x is not None else pd.NA,
-                }
-                df = pd.read_excel(ARQUIVO_EXCEL, converters=converters)
-                print(f"Dados carregados de {ARQUIVO_EXCEL}")
-
-                # CORREÇÃO PARA GARANTIR QUE Numero_OS SEJA STRING E STRIPADO AO CARREGAR
-                df['Numero_OS'] = df['Numero_OS'].astype(str).str.strip()
-
-                colunas_esperadas = self._get_expected_columns()
-                for col in colunas_esperadas:
-                    if col not in df.columns:
-                        df[col] = pd.NA
-                return df
-            except Exception as e:
-                QMessageBox.critical(self, "Erro de Leitura",
-                                     f"Erro ao carregar o arquivo Excel: {e}\nUm novo arquivo será criado e o erro será gravado no console.")
-                print(f"Detalhes do erro ao carregar Excel: {e}", file=sys.stderr)
-                return self._criar_dataframe_vazio_e_salvar()
-        else:
-            print(f"Arquivo {ARQUIVO_EXCEL} não encontrado. Criando e inicializando novo DataFrame.")
-            return self._criar_dataframe_vazio_e_salvar()
+        # A janela aparece antes dos dados: o banco (e a migração, na primeira vez) abre em outra thread
+        self._carregamento = _TarefaCarregamento()
+        self._carregamento.sinais.concluido.connect(self._dados_carregados)
+        self._carregamento.sinais.falhou.connect(self._falha_carregamento)
+        QThreadPool.globalInstance().start(self._carregamento)
+        # O processo de PDF é iniciado depois que a janela for desenhada
+        if self.fila_pdf is not None:
+            QTimer.singleShot(0, self.fila_pdf.aquecer)
+
+    def _dados_carregados(self, armazenamento, cadastros, erro):
+        self.armazenamento = armazenamento
+        self.cadastros = cadastros
+        if URL_SERVIDOR_OS:  # Com servidor, os PDFs ficam por conta dele
+            self.fila_pdf = FilaRenderizacaoRemota(self.armazenamento)
+        self._carregamento = None
+        self._revisao = self.armazenamento.revisao_atual()
+        self._timer_sincronizacao.start()
+        self.widget_carregamento.hide()
+        for botao in self._botoes_dados:
+            botao.setEnabled(True)
+        if self.numero_os_carregado is None:
+            self._gerar_novo_id_os()
+        if erro:
+            QMessageBox.critical(self, "Erro de Leitura",
+                                 f"{erro}\nAs OSs antigas não foram migradas e o erro será gravado no console.")
+
+    def _falha_carregamento(self, e):
+        self._carregamento = None
+        self.label_carregamento.setText("Não foi possível abrir os dados.")
+        self.barra_carregamento.hide()
+        if URL_SERVIDOR_OS:
+            QMessageBox.critical(self, "Erro de Conexão", f"Não foi possível acessar o servidor {URL_SERVIDOR_OS}: {e}")
+            log.error("Detalhes do erro ao acessar %s: %s", URL_SERVIDOR_OS, e)
+            return
+        mensagem = f"Não foi possível abrir {ARQUIVO_BANCO_OS}: {e}"
+        snapshots = listar_snapshots(ARQUIVO_BANCO_OS, PASTA_SNAPSHOTS)
+        if snapshots:
+            # O banco nunca é recriado vazio aqui: a recuperação é feita a partir de um snapshot
+            mensagem += (f"\n\nO snapshot mais recente é {snapshots[0]}. Para restaurá-lo, feche o programa em "
+                         f"todos os terminais e execute:\npython -m oficina_core.snapshots --restaurar {snapshots[0]}")
+        QMessageBox.critical(self, "Erro de Leitura", mensagem)
+        log.error("Detalhes do erro ao abrir %s: %s", ARQUIVO_BANCO_OS, e)
+
+    # --- Sincronização entre terminais ---
+    def _sincronizar(self):
+        if self._sincronizacao is not None:
+            return  # A consulta anterior ainda não terminou
+        self._sincronizacao = _TarefaSincronizacao(self.armazenamento, self._revisao)
+        self._sincronizacao.sinais.concluido.connect(self._alteracoes_recebidas)
+        self._sincronizacao.sinais.falhou.connect(self._falha_sincronizacao)
+        QThreadPool.globalInstance().start(self._sincronizacao)
+
+    def _falha_sincronizacao(self, e):
+        self._sincronizacao = None
+        log.warning("Erro ao buscar alterações de outros terminais: %s", e)
+
+    def _alteracoes_recebidas(self, revisao, registros, removidos):
+        self._sincronizacao = None
+        if revisao <= self._revisao:
+            return
+        self._revisao = revisao
+        # Inclui as gravações deste terminal, que reaparecem aqui sem efeito além de uma atualização a mais
+        for registro in registros:
+            self.cadastros.registrar(registro)
+        self._atualizar_lista_os()
+        if self.numero_os_carregado is None:
+            self._gerar_novo_id_os()  # O próximo número pode ter sido usado por outro terminal
+            return
+
+        alterada = next((r for r in registros if r["Numero_OS"] == self.numero_os_carregado), None)
+        mudou = self.numero_os_carregado in removidos or (
+            alterada is not None and alterada[CHAVE_VERSAO] != self.versao_os_carregada)
+        if mudou and self._aviso_os_alterada != self.numero_os_carregado:
+            self._aviso_os_alterada = self.numero_os_carregado
+            situacao = "removida" if alterada is None else "alterada"
+            QMessageBox.information(self, "OS Alterada em Outro Terminal",
+                                    f"A Ordem de Serviço {self.numero_os_carregado} foi {situacao} em outro "
+                                    f"terminal. Ao salvar, será possível recarregá-la ou manter a versão desta tela.")
+
+    def _confirmar_conflito(self, erro, texto_confirmar):
+        """Mostra o conflito de versão. Retorna True se o usuário quer gravar/deletar mesmo assim.
+
+        "Recarregar" descarta o que está na tela e abre a versão atual da OS.
+        """
+        caixa = QMessageBox(QMessageBox.Warning, "OS Alterada em Outro Terminal",
+                            f"{erro}\n\nO que deseja fazer com as alterações desta tela?", parent=self)
+        btn_confirmar = caixa.addButton(texto_confirmar, QMessageBox.DestructiveRole)
+        btn_recarregar = None
+        if erro.versao_atual is not None:
+            btn_recarregar = caixa.addButton("Recarregar OS", QMessageBox.AcceptRole)
+        caixa.addButton("Cancelar", QMessageBox.RejectRole)
+        caixa.exec_()
+        if btn_recarregar is not None and caixa.clickedButton() is btn_recarregar:
+            self._abrir_os_pesquisada(erro.numero_os)
+        return caixa.clickedButton() is btn_confirmar
 
     def _get_expected_columns(self):
-        return [
-            "Numero_OS", "Data_OS", "Hora_OS",
-            "Nome_Cliente", "Endereco_Cliente", "Numero_Imovel_Cliente", "Bairro_Cliente", "Cidade_Cliente",
-            "UF_Cliente", "CEP_Cliente", "Telefone_Cliente", "CPF_CNPJ_Cliente",
-            "Placa_Veiculo", "Marca_Veiculo", "Modelo_Veiculo", "Cor_Veiculo", "Ano_Veiculo", "KM_Atual_Veiculo",
-            "Combustivel_Veiculo", "Box_Veiculo",
-            "Problema_Informado", "Problema_Constatado", "Servico_Executado",
-            "Detalhes_Itens",
-            "Total_Itens",
-            "Deslocamento", "Desconto_Geral", "Valor_Total_Final",
-            "Responsavel", "Situacao_Atual",
-            "Condicoes_Pagamento"
-        ]
-
-    def _criar_dataframe_vazio_e_salvar(self):
-        colunas = self._get_expected_columns()
-        df = pd.DataFrame(columns=colunas)
-        try:
-            df.to_excel(ARQUIVO_EXCEL, index=False)
-            print(f"Archivo Excel vacío '{ARQUIVO_EXCEL}' creado con éxito.")
-        except Exception as e:
-            QMessageBox.critical(self, "Erro de Escritura",
-                                 f"No fue posible crear el archivo Excel vacío: {e}. Verifique los permisos de la carpeta.")
-            print(f"Detalles del error al crear Excel vacío: {e}", file=sys.stderr)
-        return df
+        return list(COLUNAS_OS)
 
     def _gerar_novo_id_os(self):
-        if not self.df_os.empty:
-            numeros_validos = self.df_os['Numero_OS'].astype(str).apply(lambda x: ''.join(filter(str.isdigit, x)))
-            ultimos_numeros = [int(n) for n in numeros_validos if n]
-            if ultimos_numeros:
-                novo_id = max(ultimos_numeros) + 1
-            else:
-                novo_id = 1
-        else:
-            novo_id = 1
-        self.entry_numero_os.setText(str(novo_id).zfill(6))
+        # Apenas exibe o próximo número da sequência; o número definitivo é reservado ao salvar
+        if self.armazenamento is None:
+            return  # Ainda carregando; _dados_carregados preenche o número
+        self.entry_numero_os.setText(self.armazenamento.proximo_numero_os())
         self.entry_numero_os.setReadOnly(True)
 
     def _limpar_campos(self):
@@ -296,11 +1302,12 @@ class OficinaOSApp(QWidget):
         self.combo_situacao_atual.setCurrentIndex(0)
         self.combo_condicoes_pagamento.setCurrentIndex(0)
 
-        self.listbox_itens.clear()
-        self.itens_pecas_servicos_cache = []
+        self.modelo_itens.definir_itens([])
+        self._encerrar_edicao_item()
+        self.numero_os_carregado = None
+        self.versao_os_carregada = None
+        self._aviso_os_alterada = None
 
-        self.label_total_itens.setText("Total Itens: R$ 0,00")
-        self.label_valor_total.setText("Valor Total: R$ 0,00")
         self.label_data.setText(QDateTime.currentDateTime().toString("dd/MM/yyyy hh:mm:ss"))
         self._gerar_novo_id_os()
 
@@ -373,6 +1380,29 @@ class OficinaOSApp(QWidget):
         btn_buscar.clicked.connect(self._buscar_os)
         btn_buscar.setIcon(self.style().standardIcon(QStyle.SP_FileDialogToParent))
         os_info_layout.addWidget(btn_buscar, 1, 2, 1, 2, Qt.AlignLeft)
+
+        btn_pesquisar = QPushButton("Pesquisar OS...")
+        btn_pesquisar.setToolTip("Buscar por cliente, placa, CPF/CNPJ, problema, serviço ou peça")
+        btn_pesquisar.clicked.connect(self._pesquisar_os)
+        btn_pesquisar.setIcon(self.style().standardIcon(QStyle.SP_FileDialogContentsView))
+        os_info_layout.addWidget(btn_pesquisar, 2, 0, 1, 2, Qt.AlignLeft)
+
+        btn_listar = QPushButton("Listar OSs...")
+        btn_listar.clicked.connect(self._abrir_lista_os)
+        btn_listar.setIcon(self.style().standardIcon(QStyle.SP_FileDialogDetailedView))
+        os_info_layout.addWidget(btn_listar, 2, 2, 1, 2, Qt.AlignLeft)
+
+        btn_relatorios = QPushButton("Relatórios...")
+        btn_relatorios.setToolTip("Faturamento, peças mais usadas e tempo em cada situação")
+        btn_relatorios.clicked.connect(self._abrir_relatorios)
+        btn_relatorios.setIcon(self.style().standardIcon(QStyle.SP_FileDialogInfoView))
+        os_info_layout.addWidget(btn_relatorios, 3, 0, 1, 2, Qt.AlignLeft)
+
+        btn_diagnostico = QPushButton("Diagnóstico...")
+        btn_diagnostico.setToolTip("Tempos de abertura, gravação, busca, CEP e PDF medidos neste terminal")
+        btn_diagnostico.clicked.connect(self._abrir_diagnostico)
+        btn_diagnostico.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxInformation))
+        os_info_layout.addWidget(btn_diagnostico, 3, 2, 1, 2, Qt.AlignLeft)
         os_info_layout.setColumnStretch(1, 1)
 
         # --- Layout Horizontal para Dados do Cliente e Dados do Veículo ---
@@ -427,6 +1457,7 @@ class OficinaOSApp(QWidget):
 
         cliente_layout.setColumnStretch(1, 1)
         cliente_layout.setColumnStretch(3, 1)
+        self._criar_autocompletar(self.entries_cliente["cpf_cnpj"], "cliente")
 
         # Grupo Dados do Veículo
         veiculo_group = QGroupBox("Dados do Veículo")
@@ -483,6 +1514,7 @@ class OficinaOSApp(QWidget):
 
         veiculo_layout.setColumnStretch(1, 1)
         veiculo_layout.setColumnStretch(3, 1)
+        self._criar_autocompletar(self.entries_veiculo["placa"], "veiculo")
 
         # --- Grupo Problemas e Serviços - Campos LADO A LADO (3 colunas) ---
         problemas_group = QGroupBox("Problemas e Serviços")
@@ -570,13 +1602,20 @@ class OficinaOSApp(QWidget):
         itens_layout.addWidget(self.entry_item_desc_perc, 0, 11, Qt.AlignLeft)
         itens_layout.setColumnStretch(11, 0)
 
-        btn_add_item = QPushButton("Adicionar Serviço")  # Alterado conforme imagem (Adicionar Serviço)
-        btn_add_item.clicked.connect(self._adicionar_item)
-        btn_add_item.setIcon(self.style().standardIcon(QStyle.SP_DialogApplyButton))
-        itens_layout.addWidget(btn_add_item, 0, 12, 1, 2, Qt.AlignLeft)  # Ocupa 2 colunas para o botão
+        self.btn_add_item = QPushButton("Adicionar Serviço")  # Alterado conforme imagem (Adicionar Serviço)
+        self.btn_add_item.clicked.connect(self._adicionar_item)
+        self.btn_add_item.setIcon(self.style().standardIcon(QStyle.SP_DialogApplyButton))
+        itens_layout.addWidget(self.btn_add_item, 0, 12, 1, 2, Qt.AlignLeft)  # Ocupa 2 colunas para o botão
         itens_layout.setColumnStretch(12, 0)
 
-        self.listbox_itens = QListWidget()
+        self.modelo_itens = ModeloItensOS(self)
+        self.modelo_itens.total_alterado.connect(self._atualizar_totais)
+        self.listbox_itens = QListView()
+        self.listbox_itens.setModel(self.modelo_itens)
+        self.listbox_itens.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.listbox_itens.setUniformItemSizes(True)  # Não mede cada linha: rápido mesmo com centenas de itens
+        self.listbox_itens.setToolTip("Clique duas vezes num item para alterá-lo")
+        self.listbox_itens.doubleClicked.connect(self._editar_item)
         # Ajustar para ocupar a largura total do grid de itens
         itens_layout.addWidget(self.listbox_itens, 1, 0, 1, 14)  # Ajusta colspan para todas as colunas
         itens_layout.setRowStretch(1, 1)
@@ -630,6 +1669,18 @@ class OficinaOSApp(QWidget):
         finais_layout.addWidget(self.label_valor_total, 1, 2, Qt.AlignRight)
         finais_layout.setColumnStretch(2, 1)
 
+        # --- Indicador de carregamento dos dados (some quando o banco estiver aberto) ---
+        self.widget_carregamento = QWidget()
+        carregamento_layout = QHBoxLayout(self.widget_carregamento)
+        carregamento_layout.setContentsMargins(0, 0, 0, 0)
+        self.label_carregamento = QLabel("Carregando ordens de serviço...")
+        carregamento_layout.addWidget(self.label_carregamento)
+        self.barra_carregamento = QProgressBar()
+        self.barra_carregamento.setRange(0, 0)  # Indeterminado
+        self.barra_carregamento.setMaximumHeight(12)
+        carregamento_layout.addWidget(self.barra_carregamento, 1)
+        self.layout().addWidget(self.widget_carregamento)
+
         # --- Seção de Botões de Ação (fixa na parte inferior, fora do scroll) ---
         button_layout = QHBoxLayout()
         self.layout().addLayout(button_layout)
@@ -659,110 +1710,120 @@ class OficinaOSApp(QWidget):
         btn_imprimir.setIcon(self.style().standardIcon(QStyle.SP_FileIcon))
         button_layout.addWidget(btn_imprimir)
 
+        btn_lote_pdf = QPushButton("Exportar Lote (PDF)")
+        btn_lote_pdf.clicked.connect(self._exportar_lote_pdf)
+        btn_lote_pdf.setObjectName("btnLotePDF")
+        btn_lote_pdf.setIcon(self.style().standardIcon(QStyle.SP_DirIcon))
+        button_layout.addWidget(btn_lote_pdf)
+
+        btn_exportar = QPushButton("Exportar OSs...")
+        btn_exportar.clicked.connect(self._exportar_os)
+        btn_exportar.setObjectName("btnExportar")
+        btn_exportar.setIcon(self.style().standardIcon(QStyle.SP_FileDialogDetailedView))
+        button_layout.addWidget(btn_exportar)
+
+        # Botões que dependem do banco ficam desabilitados até o carregamento terminar
+        self._botoes_dados = [btn_buscar, btn_pesquisar, btn_listar, btn_relatorios, btn_salvar, btn_deletar,
+                              btn_imprimir, btn_lote_pdf, btn_exportar]
+        for botao in self._botoes_dados:
+            botao.setEnabled(False)
+
         btn_sair = QPushButton("Sair")
         btn_sair.clicked.connect(self.close)
         btn_sair.setObjectName("btnSair")
         button_layout.addWidget(btn_sair)
 
     def _formatar_quilometragem(self, text):
-        cursor_pos = self.entries_veiculo["km_atual"].cursorPosition()
-        original_text_len = len(text)
-
-        clean_text = ''.join(filter(str.isdigit, text))
-
-        if not clean_text:
-            self.entries_veiculo["km_atual"].setText("")
-            return
-
-        try:
-            formatted_km = f"{int(clean_text):,}".replace(',', '.')
-            self.entries_veiculo["km_atual"].setText(formatted_km)
-
-            new_text_len = len(formatted_km)
-            len_diff = new_text_len - original_text_len
-            self.entries_veiculo["km_atual"].setCursorPosition(cursor_pos + len_diff)
-
-        except ValueError:
-            pass
+        entry = self.entries_veiculo["km_atual"]
+        cursor_pos = entry.cursorPosition()
+        formatted_km = formatar_km(text)
+        entry.setText(formatted_km)
+        if formatted_km:
+            entry.setCursorPosition(cursor_pos + len(formatted_km) - len(text))
 
     def _formatar_telefone_cpf_cnpj(self, entry_widget, field_type):
         current_text = entry_widget.text()
-        clean_text = ''.join(filter(str.isdigit, current_text))
-        formatted_text = ""
         cursor_pos = entry_widget.cursorPosition()
-        len_diff = 0  # Diferença no comprimento para ajustar a posição do cursor
-
         if field_type == "telefone":
-            if len(clean_text) > 11:  # Limita a 11 dígitos
-                clean_text = clean_text[:11]
-
-            if len(clean_text) > 2:
-                formatted_text += f"({clean_text[:2]}) "
-                if len(clean_text) > 7:
-                    formatted_text += f"{clean_text[2:7]}-{clean_text[7:]}"
-                else:
-                    formatted_text += clean_text[2:]
-            else:
-                formatted_text = clean_text
-
-            # Ajusta a posição do cursor
-            if len(current_text) < len(formatted_text):
-                len_diff = len(formatted_text) - len(current_text)
-            elif len(current_text) > len(formatted_text):
-                len_diff = -(len(current_text) - len(formatted_text))  # Diminuiu o texto
-
-        elif field_type == "cpf_cnpj":
-            if len(clean_text) > 14:  # Limita a 14 dígitos
-                clean_text = clean_text[:14]
-
-            if len(clean_text) <= 11:  # CPF
-                if len(clean_text) > 9:
-                    formatted_text = f"{clean_text[:3]}.{clean_text[3:6]}.{clean_text[6:9]}-{clean_text[9:]}"
-                elif len(clean_text) > 6:
-                    formatted_text = f"{clean_text[:3]}.{clean_text[3:6]}.{clean_text[6:]}"
-                elif len(clean_text) > 3:
-                    formatted_text = f"{clean_text[:3]}.{clean_text[3:]}"
-                else:
-                    formatted_text = clean_text
-            else:  # CNPJ
-                if len(clean_text) > 12:
-                    formatted_text = f"{clean_text[:2]}.{clean_text[2:5]}.{clean_text[5:8]}/{clean_text[8:12]}-{clean_text[12:]}"
-                elif len(clean_text) > 8:
-                    formatted_text = f"{clean_text[:2]}.{clean_text[2:5]}.{clean_text[5:8]}/{clean_text[8:]}"
-                elif len(clean_text) > 5:
-                    formatted_text = f"{clean_text[:2]}.{clean_text[2:5]}.{clean_text[5:]}"
-                elif len(clean_text) > 2:
-                    formatted_text = f"{clean_text[:2]}.{clean_text[2:]}"
-                else:
-                    formatted_text = clean_text
-
-            # Ajusta a posição do cursor
-            if len(current_text) < len(formatted_text):
-                len_diff = len(formatted_text) - len(current_text)
-            elif len(current_text) > len(formatted_text):
-                len_diff = -(len(current_text) - len(formatted_text))
+            formatted_text = mascara_telefone(current_text)
+        else:
+            formatted_text = mascara_cpf_cnpj(current_text)
 
         entry_widget.setText(formatted_text)
         # Ajusta a posição do cursor apenas se o texto não for o mesmo
         if current_text != formatted_text:
-            entry_widget.setCursorPosition(cursor_pos + len_diff)
+            entry_widget.setCursorPosition(cursor_pos + len(formatted_text) - len(current_text))
 
     def _formatar_valor_monetario(self):
         sender = self.sender()
-        text = sender.text().strip().replace(',', '.')
         try:
-            value = float(text)
-            formatted_value = f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            sender.setText(formatted_value)
+            sender.setText(formatar_dinheiro(para_decimal(sender.text())))
         except ValueError:
-            sender.setText(f"{0.00:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            sender.setText(formatar_dinheiro(0))
             QMessageBox.warning(self, "Formato Inválido", "Valor monetário inválido. Use apenas números.")
 
+    # --- Autocompletar de clientes (CPF/CNPJ) e veículos (placa) ---
+    def _criar_autocompletar(self, entry, tipo):
+        modelo = QStandardItemModel(self)
+        completer = QCompleter(modelo, self)
+        # O filtro por prefixo é feito pelo IndiceCadastros; o popup mostra todas as sugestões recebidas
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        completer.setCompletionRole(Qt.UserRole)  # Insere a chave no campo; o popup mostra a descrição
+        completer.activated[QModelIndex].connect(
+            lambda index, t=tipo: self._aplicar_cadastro(t, index.data(Qt.UserRole)))
+        entry.setCompleter(completer)
+        entry.textEdited.connect(
+            lambda _, e=entry, t=tipo, m=modelo, c=completer: self._sugerir_cadastros(e, t, m, c))
+
+    def _sugerir_cadastros(self, entry, tipo, modelo, completer):
+        if self.cadastros is None:
+            return
+        # Lê o campo em vez do texto do sinal: a máscara de CPF/CNPJ pode ter reformatado o texto
+        if tipo == "cliente":
+            sugestoes = [(c["chave"], f"{c.get('CPF_CNPJ_Cliente') or c['chave']} - {c.get('Nome_Cliente') or ''}")
+                         for c in self.cadastros.clientes_com_prefixo(entry.text())]
+        else:
+            sugestoes = [(v["chave"], f"{v['chave']} - {v.get('Marca_Veiculo') or ''} {v.get('Modelo_Veiculo') or ''}")
+                         for v in self.cadastros.veiculos_com_prefixo(entry.text())]
+        modelo.clear()
+        for chave, descricao in sugestoes:
+            item = QStandardItem(descricao.strip(" -"))
+            item.setData(chave, Qt.UserRole)
+            modelo.appendRow(item)
+        if sugestoes:
+            completer.complete()
+        else:
+            completer.popup().hide()
+
+    def _preencher_cadastro(self, entries, campos, dados):
+        for coluna, campo in campos.items():
+            valor = "" if valor_vazio(dados.get(coluna)) else str(dados.get(coluna))
+            if isinstance(entries[campo], QComboBox):
+                entries[campo].setCurrentText(valor)
+            else:
+                entries[campo].setText(valor)
+
+    def _aplicar_cadastro(self, tipo, chave):
+        """Preenche o formulário com o cliente ou veículo escolhido, direto do índice em memória."""
+        if tipo == "cliente":
+            cliente = self.cadastros.clientes.obter(chave)
+            if cliente is not None:
+                self._preencher_cadastro(self.entries_cliente, CAMPOS_FORM_CLIENTE, cliente)
+            return
+        veiculo = self.cadastros.veiculos.obter(chave)
+        if veiculo is None:
+            return
+        self._preencher_cadastro(self.entries_veiculo, CAMPOS_FORM_VEICULO, veiculo)
+        # Traz também o último cliente do veículo, se o bloco do cliente ainda estiver vazio
+        cliente = self.cadastros.clientes.obter(veiculo.get("chave_cliente"))
+        if cliente is not None and not self.entries_cliente["nome"].text().strip():
+            self._preencher_cadastro(self.entries_cliente, CAMPOS_FORM_CLIENTE, cliente)
+
     def _adicionar_item(self):
         tipo = self.combo_item_tipo.currentText().strip()  # Novo campo "Tipo"
         referencia = self.entry_item_ref.text().strip()
         descricao = self.entry_item_desc.text().strip()
-        valor_str = self.entry_item_valor.text().strip().replace(',', '.')
+        valor_str = self.entry_item_valor.text().strip()
         qtd_str = self.entry_item_qtd.text().strip()
         desc_perc_str = self.entry_item_desc_perc.text().strip()  # Novo campo Desconto (%)
 
@@ -771,9 +1832,9 @@ class OficinaOSApp(QWidget):
             return
 
         try:
-            valor_unitario = float(valor_str)
+            valor_unitario = para_decimal(valor_str)
             quantidade = int(qtd_str)
-            desconto_percentual = float(desc_perc_str) if desc_perc_str else 0.0  # Converte desconto
+            desconto_percentual = para_decimal(desc_perc_str)  # Converte desconto (vazio = 0)
 
             if valor_unitario <= 0 or quantidade <= 0:
                 QMessageBox.warning(self, "Entrada Inválida", "Valor unitário e quantidade devem ser maiores que zero.")
@@ -786,22 +1847,24 @@ class OficinaOSApp(QWidget):
             QMessageBox.warning(self, "Entrada Inválida", "Valores numéricos inválidos. Use apenas números.")
             return
 
-        valor_total_item_sem_desc = valor_unitario * quantidade
-        valor_total_item = valor_total_item_sem_desc * (1 - (desconto_percentual / 100))
+        # Calculado em Decimal e arredondado ao centavo; o item guarda float, como no banco
+        valor_total_item = calcular_total_item(valor_unitario, quantidade, desconto_percentual)
 
         item_data = {
             "tipo": tipo,  # Adicionado tipo
             "referencia": referencia,
             "descricao": descricao,
             "uni": "un",  # Unidade padrão
-            "valor": valor_unitario,
+            "valor": float(valor_unitario),
             "quantia": quantidade,
-            "desc": desconto_percentual,  # Salva o percentual
-            "valor_total": valor_total_item
+            "desc": float(desconto_percentual),  # Salva o percentual
+            "valor_total": float(valor_total_item)
         }
-        self.itens_pecas_servicos_cache.append(item_data)
-        self.listbox_itens.addItem(
-            f"Tipo: {tipo} | Ref: {referencia} - {descricao} | Qtde: {quantidade} x R${valor_unitario:.2f} | Desc: {desconto_percentual:.0f}% = R${valor_total_item:.2f}")
+        if self.linha_item_em_edicao is not None:
+            self.modelo_itens.substituir(self.linha_item_em_edicao, item_data)
+            self._encerrar_edicao_item()
+        else:
+            self.modelo_itens.adicionar(item_data)
 
         self.combo_item_tipo.setCurrentIndex(0)  # Limpa o tipo
         self.entry_item_ref.clear()
@@ -810,67 +1873,115 @@ class OficinaOSApp(QWidget):
         self.entry_item_qtd.setText("1")  # Reseta para 1
         self.entry_item_desc_perc.setText("0")  # Reseta desconto para 0
 
-        self._atualizar_totais()
+    def _editar_item(self, index):
+        """Carrega o item nos campos; "Atualizar Item" grava a alteração no lugar dele."""
+        item = self.modelo_itens.item(index.row())
+        self.combo_item_tipo.setCurrentText(item["tipo"])
+        self.entry_item_ref.setText(item["referencia"])
+        self.entry_item_desc.setText(item["descricao"])
+        self.entry_item_valor.setText(formatar_dinheiro(item["valor"]))
+        self.entry_item_qtd.setText(str(item["quantia"]))
+        self.entry_item_desc_perc.setText(f"{item['desc']:g}")
+        self.linha_item_em_edicao = index.row()
+        self.btn_add_item.setText("Atualizar Item")
+
+    def _encerrar_edicao_item(self):
+        self.linha_item_em_edicao = None
+        self.btn_add_item.setText("Adicionar Serviço")
 
     def _remover_item(self):
         try:
-            selected_row = self.listbox_itens.currentRow()
+            selected_row = self.listbox_itens.currentIndex().row()
             if selected_row != -1:
-                self.listbox_itens.takeItem(selected_row)
-                del self.itens_pecas_servicos_cache[selected_row]
-                self._atualizar_totais()
+                self.modelo_itens.remover(selected_row)
+                self._encerrar_edicao_item()
             else:
                 QMessageBox.warning(self, "Seleção Inválida", "Por favor, selecione um item para remover.")
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Ocorreu um erro ao remover o item: {e}")
 
-    def _atualizar_totais(self):
-        total_itens = sum(item['valor_total'] for item in self.itens_pecas_servicos_cache)
+    def _atualizar_totais(self, total_itens):
         # Por enquanto, sem deslocamento ou desconto geral que não seja por item
         valor_total_final = total_itens
 
-        self.label_total_itens.setText(
-            f"Total Itens: R$ {total_itens:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-        self.label_valor_total.setText(
-            f"Valor Total: R$ {valor_total_final:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+        self.label_total_itens.setText(f"Total Itens: R$ {formatar_dinheiro(total_itens)}")
+        self.label_valor_total.setText(f"Valor Total: R$ {formatar_dinheiro(valor_total_final)}")
+
+    def _criar_servico_cep(self):
+        resolvedores = []
+        if os.path.exists(ARQUIVO_CEP_OFFLINE):
+            resolvedores.append(ResolvedorCEPArquivo(ARQUIVO_CEP_OFFLINE))
+        resolvedores.append(ResolvedorViaCEP(timeout=5))
+        try:
+            cache = CacheCEP(ARQUIVO_CACHE_CEP)
+        except Exception as e:
+            log.warning("Cache de CEP indisponível, consultas não serão guardadas: %s", e)
+            cache = None
+        return ServicoCEP(resolvedores, cache)
+
+    def _limpar_endereco_cep(self):
+        self.entries_cliente["endereço"].clear()
+        self.entries_cliente["bairro"].clear()
+        self.entries_cliente["cidade"].clear()
+        self.entries_cliente["uf"].clear()
 
     def _autopreencher_cep(self):
         cep = self.entries_cliente["cep"].text().strip()  # Remove o hífen da máscara para buscar
-        print(f"DEBUG: Autopreencher CEP chamado para: '{cep}'", file=sys.stderr)
+        log.debug("Autopreencher CEP chamado para: '%s'", cep)
         if len(cep) == 8 and cep.isdigit():
-            url = f"https://viacep.com.br/ws/{cep}/json/"
+            # CEP já consultado antes: responde na hora, sem rede
             try:
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                data = response.json()
-                print(f"DEBUG: Resposta da ViaCEP: {data}", file=sys.stderr)
-
-                if "erro" not in data:
-                    self.entries_cliente["endereço"].setText(data.get("logradouro", "") or "")
-                    if not self.entries_cliente["número"].text().strip():
-                        self.entries_cliente["número"].clear()
-                    self.entries_cliente["bairro"].setText(data.get("bairro", "") or "")
-                    self.entries_cliente["cidade"].setText(data.get("localidade", "") or "")
-                    self.entries_cliente["uf"].setText(data.get("uf", "") or "")
-                else:
-                    QMessageBox.warning(self, "CEP Inválido", "CEP não encontrado ou inválido.")
-                    self.entries_cliente["endereço"].clear()
-                    self.entries_cliente["bairro"].clear()
-                    self.entries_cliente["cidade"].clear()
-                    self.entries_cliente["uf"].clear()
-            except requests.exceptions.RequestException as e:
-                QMessageBox.critical(self, "Erro de Conexão",
-                                     f"Não foi possível consultar o CEP: {e}\nVerifique sua conexão com a internet.")
-                print(f"Erro de conexão no autopreencher CEP: {e}", file=sys.stderr)
+                endereco = self.servico_cep.consultar_cache(cep)
             except Exception as e:
-                QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro ao autopreencher o CEP: {e}")
-                print(f"Erro inesperado no autopreencher CEP: {e}", file=sys.stderr)
+                log.warning("Erro ao ler o cache de CEP: %s", e)
+                endereco = None
+            if endereco is not None:
+                self._aplicar_endereco_cep(cep, endereco)
+                return
+
+            tarefa = _TarefaCEP(self.servico_cep, cep)
+            tarefa.sinais.concluido.connect(self._resposta_consulta_cep)
+            tarefa.sinais.falhou.connect(self._falha_consulta_cep)
+            self._consultas_cep.add(tarefa.sinais)
+            self.entries_cliente["endereço"].setPlaceholderText("Consultando CEP...")
+            QThreadPool.globalInstance().start(tarefa)
         elif len(cep) > 0 and (len(cep) != 8 or not cep.isdigit()):
             QMessageBox.warning(self, "CEP Inválido", "CEP deve conter 8 dígitos numéricos.")
-            self.entries_cliente["endereço"].clear()
-            self.entries_cliente["bairro"].clear()
-            self.entries_cliente["cidade"].clear()
-            self.entries_cliente["uf"].clear()
+            self._limpar_endereco_cep()
+
+    def _fim_consulta_cep(self, cep):
+        self._consultas_cep.discard(self.sender())
+        self.entries_cliente["endereço"].setPlaceholderText("Digite o endereço...")
+        # Descarta respostas de um CEP que o usuário já trocou
+        return self.entries_cliente["cep"].text().strip() == cep
+
+    def _resposta_consulta_cep(self, cep, endereco):
+        if self._fim_consulta_cep(cep):
+            self._aplicar_endereco_cep(cep, endereco)
+
+    def _aplicar_endereco_cep(self, cep, endereco):
+        log.debug("Endereço do CEP %s: %s", cep, endereco)
+        if endereco is not None:
+            self.entries_cliente["endereço"].setText(endereco.get("logradouro", "") or "")
+            if not self.entries_cliente["número"].text().strip():
+                self.entries_cliente["número"].clear()
+            self.entries_cliente["bairro"].setText(endereco.get("bairro", "") or "")
+            self.entries_cliente["cidade"].setText(endereco.get("localidade", "") or "")
+            self.entries_cliente["uf"].setText(endereco.get("uf", "") or "")
+        else:
+            QMessageBox.warning(self, "CEP Inválido", "CEP não encontrado ou inválido.")
+            self._limpar_endereco_cep()
+
+    def _falha_consulta_cep(self, cep, erro):
+        if not self._fim_consulta_cep(cep):
+            return
+        if isinstance(erro, ErroConsultaCEP):
+            QMessageBox.critical(self, "Erro de Conexão",
+                                 f"Não foi possível consultar o CEP: {erro}\nVerifique sua conexão com a internet.")
+            log.warning("Erro de conexão no autopreencher CEP: %s", erro)
+        else:
+            QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro ao autopreencher o CEP: {erro}")
+            log.error("Erro inesperado no autopreencher CEP: %s", erro)
 
     def _coletar_dados_form(self):
         dados = {
@@ -900,19 +2011,18 @@ class OficinaOSApp(QWidget):
             "Problema_Informado": self.text_problema_informado.toPlainText(),
             "Problema_Constatado": self.text_problema_constatado.toPlainText(),
             "Servico_Executado": self.text_servico_executado.toPlainText(),
-            "Detalhes_Itens": "; ".join([
-                                            f"Tipo: {item['tipo']} | Ref: {item['referencia']} | Desc: {item['descricao']} | Qtd: {item['quantia']} | Val: {item['valor']:.2f} | Desc(%): {item['desc']:.0f} | Total: {item['valor_total']:.2f}"
-                                            for item in self.itens_pecas_servicos_cache]),
-            "Total_Itens": sum(item['valor_total'] for item in self.itens_pecas_servicos_cache),
+            "Detalhes_Itens": formatar_detalhes_itens(self.modelo_itens.itens()),
+            "Total_Itens": float(self.modelo_itens.total),
             "Deslocamento": 0.00,
             "Desconto_Geral": 0.00,
             "Responsavel": self.entries_finais["responsável"].text(),
             "Situacao_Atual": self.combo_situacao_atual.currentText(),
             "Condicoes_Pagamento": self.combo_condicoes_pagamento.currentText()
         }
-        dados["Valor_Total_Final"] = dados["Total_Itens"] + dados["Deslocamento"] - dados["Desconto_Geral"]
+        dados["Valor_Total_Final"] = float(self.modelo_itens.total + para_decimal(dados["Deslocamento"])
+                                           - para_decimal(dados["Desconto_Geral"]))
 
-        dados["Itens_Pecas_Servicos"] = self.itens_pecas_servicos_cache
+        dados[CHAVE_ITENS] = self.modelo_itens.itens()
 
         return dados
 
@@ -921,13 +2031,15 @@ class OficinaOSApp(QWidget):
 
         def get_display_value(key, default_value=""):
             value = dados_os_dict.get(key, default_value)
-            if pd.isna(value) or value is None:
+            if valor_vazio(value):
                 return ""
             return str(value)
 
         self.entry_numero_os.setReadOnly(False)
         self.entry_numero_os.setText(get_display_value("Numero_OS"))
         self.entry_numero_os.setReadOnly(True)
+        self.numero_os_carregado = get_display_value("Numero_OS") or None
+        self.versao_os_carregada = dados_os_dict.get(CHAVE_VERSAO)
 
         self.label_data.setText(f"{get_display_value('Data_OS')} {get_display_value('Hora_OS')}")
 
@@ -948,7 +2060,7 @@ class OficinaOSApp(QWidget):
         self.entries_veiculo["ano"].setText(get_display_value("Ano_Veiculo"))
 
         km_atual_raw = dados_os_dict.get("KM_Atual_Veiculo", "")
-        if pd.isna(km_atual_raw) or km_atual_raw is None:
+        if valor_vazio(km_atual_raw):
             self.entries_veiculo["km_atual"].setText("")
         else:
             self._formatar_quilometragem(str(km_atual_raw))
@@ -971,50 +2083,11 @@ class OficinaOSApp(QWidget):
         self.combo_situacao_atual.setCurrentText(get_display_value("Situacao_Atual"))
         self.combo_condicoes_pagamento.setCurrentText(get_display_value("Condicoes_Pagamento"))
 
-        self.itens_pecas_servicos_cache = []
-        self.listbox_itens.clear()
-
-        # Correção para popular itens_pecas_servicos_cache corretamente
-        # Se os dados.Detalhes_Itens for uma string semi-estruturada, precisamos parsear de volta
-        itens_str = get_display_value("Detalhes_Itens")
-        if itens_str:
-            for item_entry_str in itens_str.split('; '):
-                if item_entry_str.strip():
-                    try:
-                        # Exemplo de parse: "Tipo: Peça | Ref: 1 | Desc: Pastilhas | Qtd: 2 | Val: 50.00 | Desc(%): 0 | Total: 100.00"
-                        parts = {k.strip(): v.strip() for k, v in
-                                 (item.split(': ', 1) for item in item_entry_str.split(' | '))}
-
-                        item_data = {
-                            "tipo": parts.get("Tipo", "N/A"),
-                            "referencia": parts.get("Ref", "N/A"),
-                            "descricao": parts.get("Desc", "N/A"),
-                            "uni": "un",  # Assumindo unidade padrão ao carregar
-                            "valor": float(
-                                parts["Val"].replace('R$', '').replace(',', '').strip()) if "Val" in parts else 0.0,
-                            "quantia": int(parts["Qtd"].strip()) if "Qtd" in parts else 0,
-                            "desc": float(parts["Desc(%)"].replace('%', '').strip()) if "Desc(%)" in parts else 0.0,
-                            "valor_total": float(
-                                parts["Total"].replace('R$', '').replace(',', '').strip()) if "Total" in parts else 0.0,
-                        }
-                        self.itens_pecas_servicos_cache.append(item_data)
-                        self.listbox_itens.addItem(
-                            f"Tipo: {item_data['tipo']} | Ref: {item_data['referencia']} - {item_data['descricao']} | Qtde: {item_data['quantia']} x R${item_data['valor']:.2f} | Desc: {item_data['desc']:.0f}% = R${item_data['valor_total']:.2f}"
-                        )
-                    except Exception as e:
-                        print(f"Erro ao parsear item do Excel durante o carregamento: '{item_entry_str}' - {e}",
-                              file=sys.stderr)
-                        self.listbox_itens.addItem(item_entry_str)  # Adiciona como texto bruto se falhar
-
-        if self.itens_pecas_servicos_cache and self.listbox_itens.count() > 0 and not self.listbox_itens.item(
-                0).text().startswith("Tipo:"):  # Ajusta a verificação
-            QMessageBox.information(self, "Aviso de Itens",
-                                    "Itens carregados. A edição de itens complexos pode exigir a remoção e adição.")
+        # Os itens já vêm tipados do armazenamento (tabela itens_os), sem parse de texto
+        self.modelo_itens.definir_itens(dict(item_data) for item_data in dados_os_dict.get(CHAVE_ITENS) or [])
 
         self.entries_finais["responsável"].setText(get_display_value("Responsavel"))
 
-        self._atualizar_totais()
-
     def _buscar_os(self):
         os_id_busca = self.entry_busca_os.text().strip()
 
@@ -1023,99 +2096,110 @@ class OficinaOSApp(QWidget):
             return
 
         if os_id_busca.isdigit():
-            os_id_busca = str(os_id_busca).zfill(6)
-        print(f"DEBUG: Buscando OS com ID formatado: '{os_id_busca}'", file=sys.stderr)
+            os_id_busca = formatar_numero_os(os_id_busca)
+        log.debug("Buscando OS com ID formatado: '%s'", os_id_busca)
 
-        os_encontrada = self.df_os[self.df_os['Numero_OS'] == os_id_busca]
+        with medir("ui.carregar_os"):
+            dados_os_dict = self.armazenamento.obter(os_id_busca)
+            if dados_os_dict is not None:
+                self._preencher_campos_form(dados_os_dict)
 
-        if not os_encontrada.empty:
-            dados_os_dict = os_encontrada.iloc[0].to_dict()
-            self._preencher_campos_form(dados_os_dict)
+        if dados_os_dict is not None:
             QMessageBox.information(self, "OS Encontrada", f"Ordem de Serviço {os_id_busca} carregada com sucesso!")
             self.entry_busca_os.clear()
         else:
             QMessageBox.warning(self, "OS Não Encontrada",
-                                f"Ordem de Serviço {os_id_busca} não encontrada no arquivo Excel.")
+                                f"Ordem de Serviço {os_id_busca} não encontrada.")
             self._limpar_campos()
 
+    def _pesquisar_os(self):
+        dialogo = DialogoPesquisaOS(self.armazenamento, self)
+        dialogo.os_escolhida.connect(self._abrir_os_pesquisada)
+        dialogo.exec_()
+
+    def _abrir_lista_os(self):
+        if self._janela_lista_os is None:
+            situacoes = [self.combo_situacao_atual.itemText(i) for i in range(self.combo_situacao_atual.count())]
+            self._janela_lista_os = JanelaListaOS(self.armazenamento, situacoes, self)
+            self._janela_lista_os.os_escolhida.connect(self._abrir_os_pesquisada)
+        else:
+            self._janela_lista_os.recarregar()
+        self._janela_lista_os.show()
+        self._janela_lista_os.raise_()
+        self._janela_lista_os.activateWindow()
+
+    def _abrir_relatorios(self):
+        situacoes = [self.combo_situacao_atual.itemText(i) for i in range(self.combo_situacao_atual.count())]
+        DialogoRelatorios(self.armazenamento, situacoes, self).exec_()
+
+    def _abrir_diagnostico(self):
+        DialogoDiagnostico(self.armazenamento, self).exec_()
+
+    def _atualizar_lista_os(self):
+        if self._janela_lista_os is not None and self._janela_lista_os.isVisible():
+            self._janela_lista_os.recarregar()
+
+    def _abrir_os_pesquisada(self, numero_os):
+        with medir("ui.carregar_os"):
+            dados_os_dict = self.armazenamento.obter(numero_os)
+            if dados_os_dict is not None:
+                self._preencher_campos_form(dados_os_dict)
+        if dados_os_dict is None:
+            QMessageBox.warning(self, "OS Não Encontrada", f"Ordem de Serviço {numero_os} não encontrada.")
+
     def _salvar_os(self):
         dados_os_coletados = self._coletar_dados_form()
 
-        if not dados_os_coletados["Nome_Cliente"] or not dados_os_coletados["Placa_Veiculo"]:
+        if any(not dados_os_coletados[campo].strip() for campo in CAMPOS_OBRIGATORIOS):
             QMessageBox.warning(self, "Dados Incompletos",
                                 "Nome do Cliente e Placa do Veículo são obrigatórios para salvar.")
             return
 
-        dados_salvar = dados_os_coletados.copy()
+        # Textos do formulário -> tipos gravados (KM/ano como int, valores como float, Numero_OS com 6 dígitos)
+        dados_salvar = registro_para_salvar(dados_os_coletados)
+        log.debug("Salvando OS com ID formatado: '%s'", dados_salvar['Numero_OS'])
 
-        # CORREÇÃO PARA GARANTIR TIPOS DE DADOS COMPATÍVEIS PARA O PANDAS
-        # Isso é crucial para evitar o FutureWarning de dtype e possíveis problemas de busca.
-        # Converter para o tipo numérico adequado ou pd.NA se vazio.
+        current_os_id = dados_salvar["Numero_OS"]
 
-        # KM_Atual_Veiculo
-        km_limpo = ''.join(filter(str.isdigit, str(dados_salvar['KM_Atual_Veiculo'] or '')))
         try:
-            dados_salvar['KM_Atual_Veiculo'] = int(km_limpo) if km_limpo else pd.NA
-        except ValueError:
-            dados_salvar['KM_Atual_Veiculo'] = pd.NA
-
-        # Ano_Veiculo
-        ano_str = str(dados_salvar['Ano_Veiculo'] or '')
-        try:
-            dados_salvar['Ano_Veiculo'] = int(ano_str) if ano_str.isdigit() else pd.NA
-        except ValueError:
-            dados_salvar['Ano_Veiculo'] = pd.NA
-
-        # Numero_Imovel_Cliente (campo Número)
-        num_imovel_str = str(dados_salvar['Numero_Imovel_Cliente'] or '')
-        try:
-            dados_salvar['Numero_Imovel_Cliente'] = int(num_imovel_str) if num_imovel_str.isdigit() else pd.NA
-        except ValueError:
-            dados_salvar['Numero_Imovel_Cliente'] = pd.NA
-
-        # Conversão de Valor Total de Itens e Valor Total Final (garante float)
-        campos_monetarios = ['Total_Itens', 'Valor_Total_Final', 'Deslocamento', 'Desconto_Geral']
-        for campo in campos_monetarios:
-            valor_str = str(dados_salvar[campo]).replace('.', '').replace(',',
-                                                                          '.')  # Remove pontos de milhar e substitui vírgula por ponto decimal
-            try:
-                dados_salvar[campo] = float(valor_str) if valor_str else pd.NA
-            except ValueError:
-                dados_salvar[campo] = pd.NA  # Define como NA se a conversão falhar
-
-        if dados_salvar["Numero_OS"].isdigit():
-            dados_salvar["Numero_OS"] = str(dados_salvar["Numero_OS"]).zfill(6)
-        print(f"DEBUG: Salvando OS com ID formatado: '{dados_salvar['Numero_OS']}'", file=sys.stderr)
-
-        df_nova_os_linha = pd.DataFrame([dados_salvar])
-
-        for col in self._get_expected_columns():
-            if col not in df_nova_os_linha.columns:
-                df_nova_os_linha[col] = pd.NA
-
-        current_os_id = str(dados_os_coletados['Numero_OS'])
-        os_existente_idx = self.df_os[self.df_os['Numero_OS'].astype(str) == current_os_id].index
-
-        try:
-            if not os_existente_idx.empty:
-                idx = os_existente_idx[0]
-                for col in df_nova_os_linha.columns:
-                    if col not in self.df_os.columns:
-                        self.df_os[col] = pd.NA
-                    self.df_os.at[idx, col] = df_nova_os_linha.at[0, col]
-                QMessageBox.information(self, "OS Atualizada",
-                                        f"Ordem de Serviço {current_os_id} atualizada com sucesso no Excel!")
+            if self.numero_os_carregado is None:
+                # OS nova: o armazenamento reserva o número atomicamente, que pode diferir do exibido
+                # se outro terminal tiver criado uma OS nesse meio tempo
+                with medir("ui.salvar"):
+                    current_os_id = self.armazenamento.criar(dados_salvar)
+                criada = True
+                self.entry_numero_os.setText(current_os_id)
+                self.numero_os_carregado = current_os_id
+                self.versao_os_carregada = 1
             else:
-                self.df_os = pd.concat([self.df_os, df_nova_os_linha], ignore_index=True)
-                QMessageBox.information(self, "OS Salva",
-                                        f"Ordem de Serviço {current_os_id} salva com sucesso no Excel!")
+                versao_esperada = self.versao_os_carregada
+                try:
+                    with medir("ui.salvar"):
+                        criada = self.armazenamento.salvar(dados_salvar, versao_esperada=versao_esperada)
+                except ConflitoVersao as e:
+                    if not self._confirmar_conflito(e, "Sobrescrever"):
+                        return
+                    # Grava por cima da versão do outro terminal (ou recria a OS, se foi removida)
+                    versao_esperada = e.versao_atual
+                    with medir("ui.salvar"):
+                        criada = self.armazenamento.salvar(dados_salvar, versao_esperada=versao_esperada)
+                self.versao_os_carregada = 1 if criada else (versao_esperada or 0) + 1
+                self._aviso_os_alterada = None
+            log.info("Dados salvos em %s", URL_SERVIDOR_OS or ARQUIVO_BANCO_OS)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro ao Salvar", f"Não foi possível salvar os dados: {e}")
+            log.exception("Detalhes do erro ao salvar OS: %s", e)
+            return
 
-            self.df_os.to_excel(ARQUIVO_EXCEL, index=False)
-            print(f"Dados salvos em {ARQUIVO_EXCEL}")
+        # A planilha Excel não é mais regravada a cada OS: é gerada em "Exportar OSs..."
+        with medir("ui.apos_salvar"):
+            self.cadastros.registrar(dados_salvar)
+            self._atualizar_lista_os()
 
-        except Exception as e:
-            QMessageBox.critical(self, "Erro ao Salvar", f"Não foi possível salvar os dados no Excel: {e}")
-            print(f"Detalhes do erro ao salvar Excel: {e}", file=sys.stderr)
+        if criada:
+            QMessageBox.information(self, "OS Salva", f"Ordem de Serviço {current_os_id} salva com sucesso!")
+        else:
+            QMessageBox.information(self, "OS Atualizada", f"Ordem de Serviço {current_os_id} atualizada com sucesso!")
 
     def _deletar_os(self):
         current_os_id = self.entry_numero_os.text().strip()
@@ -1131,46 +2215,58 @@ class OficinaOSApp(QWidget):
                 return
 
         if id_to_delete.isdigit():
-            id_to_delete = str(id_to_delete).zfill(6)
+            id_to_delete = formatar_numero_os(id_to_delete)
 
         reply = QMessageBox.question(self, 'Deletar OS',
                                      f"Tem certeza que deseja deletar a OS {id_to_delete}?",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
 
         if reply == QMessageBox.Yes:
-            os_existente_idx = self.df_os[self.df_os['Numero_OS'].astype(str) == id_to_delete].index
-            if not os_existente_idx.empty:
-                self.df_os = self.df_os.drop(os_existente_idx).reset_index(drop=True)
+            # A versão só é conferida quando a OS a deletar é a que está aberta na tela
+            versao_esperada = self.versao_os_carregada if id_to_delete == self.numero_os_carregado else None
+            try:
                 try:
-                    self.df_os.to_excel(ARQUIVO_EXCEL, index=False)
-                    QMessageBox.information(self, "Deletar OS",
-                                            f"Ordem de Serviço {id_to_delete} deletada com sucesso do Excel!")
-                    self._limpar_campos()
-                except Exception as e:
-                    QMessageBox.critical(self, "Erro ao Deletar", f"Não foi possível deletar a OS do Excel: {e}")
-                    print(f"Detalhes do erro ao deletar Excel: {e}", file=sys.stderr)
+                    deletada = self.armazenamento.deletar(id_to_delete, versao_esperada=versao_esperada)
+                except ConflitoVersao as e:
+                    if e.versao_atual is None:
+                        deletada = False  # Já removida por outro terminal
+                    elif self._confirmar_conflito(e, "Deletar Mesmo Assim"):
+                        deletada = self.armazenamento.deletar(id_to_delete, versao_esperada=e.versao_atual)
+                    else:
+                        return
+            except Exception as e:
+                QMessageBox.critical(self, "Erro ao Deletar", f"Não foi possível deletar a OS: {e}")
+                log.exception("Detalhes do erro ao deletar OS: %s", e)
+                return
+            if deletada:
+                self._atualizar_lista_os()
+                QMessageBox.information(self, "Deletar OS",
+                                        f"Ordem de Serviço {id_to_delete} deletada com sucesso!")
+                self._limpar_campos()
             else:
                 QMessageBox.warning(self, "Deletar OS", f"Ordem de Serviço {id_to_delete} no encontrada para deletar.")
 
+    def closeEvent(self, event):
+        self._timer_sincronizacao.stop()
+        if self.armazenamento is not None:
+            self.armazenamento.fechar()
+        if self.servico_cep.cache is not None:
+            self.servico_cep.cache.fechar()
+        if self.fila_pdf is not None:
+            self.fila_pdf.encerrar(aguardar=False)
+        super().closeEvent(event)
+
     def _imprimir_os_pdf(self):
-        """Gera um archivo PDF usando la plantilla HTML y WeasyPrint."""
+        """Gera o PDF da OS com o template HTML e o WeasyPrint."""
         self._salvar_os()
 
         dados_os = self._coletar_dados_form()
 
         if not dados_os["Numero_OS"] or not dados_os["Nome_Cliente"] or not dados_os["Placa_Veiculo"]:
-            QMessageBox.warning(self, "Datos Mínimos",
-                                "Número de OS, Nombre del Cliente y Placa del Vehículo son obligatorios para imprimir.")
+            QMessageBox.warning(self, "Dados Mínimos",
+                                "Número da OS, Nome do Cliente e Placa do Veículo são obrigatórios para imprimir.")
             return
 
-        # --- CORREÇÃO DEL NOMBRE DEL ARCHIVO PDF: Elimina caracteres inválidos de Windows ---
-        # Garantir que a data e hora estejam limpas e formatadas para o nome do arquivo.
-        formatted_date_for_filename = QDateTime.currentDateTime().toString("yyyy-MM-dd")  # Ex: 2025-06-11
-        formatted_time_for_filename = QDateTime.currentDateTime().toString("hh_mm_ss").replace(':', '_')  # Ex: 13_30_45
-
-        # O Numero_OS já deve estar limpo ao ser carregado/salvo, mas um extra para segurança.
-        safe_os_number = "".join(c for c in dados_os['Numero_OS'] if c.isalnum() or c == '_')
-
         # Usar tempfile para criar um arquivo temporário que será limpo automaticamente
         # 'delete=False' para Windows, porque o subprocesso pode manter o arquivo aberto
         temp_file = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
@@ -1179,92 +2275,201 @@ class OficinaOSApp(QWidget):
 
         # Registrar o arquivo temporário para ser excluído quando o programa sair
         _temp_files_to_clean.append(filename_full_path)
-        # --- FIN DE LA CORREÇÃO ---
 
         # Depuração para verificar o caminho do logo e o nome do arquivo PDF
         logo_absolute_path = os.path.abspath(ARQUIVO_LOGO) if os.path.exists(ARQUIVO_LOGO) else None
-        print(f"DEBUG: Logo path enviado para o template: {logo_absolute_path}", file=sys.stderr)
-        print(f"DEBUG: Nome do archivo PDF gerado (temporário): {filename_full_path}", file=sys.stderr)
+        log.debug("Logo path enviado para o template: %s", logo_absolute_path)
+        log.debug("Nome do arquivo PDF gerado (temporário): %s", filename_full_path)
 
-        # CÓDIGO PARA LER IMAGEM E CODIFICAR EM BASE64
-        logo_base64_data = None
-        if logo_absolute_path and os.path.exists(logo_absolute_path):
-            try:
-                # Abrir a imagem e redimensionar para a largura desejada (ex: 25mm = ~94 pixels a 96 DPI)
-                # WeasyPrint lida com mm, mas o redimensionamento em pixels é mais comum com Pillow.
-                # 25mm a 96 DPI (pixels por polegada) é 25 / 25.4 * 96 = ~94.5 pixels. Vamos usar 100 pixels de largura.
-                target_width_px = 100
-                img = Image.open(logo_absolute_path)
-                original_width, original_height = img.size
-
-                # Calcular nova altura mantendo a proporção
-                new_height_px = int((target_width_px / original_width) * original_height)
-
-                img_resized = img.resize((target_width_px, new_height_px),
-                                         Image.Resampling.LANCZOS)  # Melhor filtro de redimensionamento
-
-                # Salvar a imagem redimensionada em um buffer para codificação Base64
-                import io
-                buf = io.BytesIO()
-                img_resized.save(buf, format="PNG")  # Salvar como PNG para manter qualidade e transparência
-                logo_base64_data = base64.b64encode(buf.getvalue()).decode('utf-8')
-                buf.close()
-
-                print(f"DEBUG: Logo Base64 data (first 50 chars): {logo_base64_data[:50]}...", file=sys.stderr)
-            except Exception as e:
-                print(f"ERROR: No fue posible codificar/redimensionar el logo en Base64: {e}", file=sys.stderr)
-                logo_base64_data = None
-        else:
-            print(f"ALERTA: Archivo de logo no encontrado en: {ARQUIVO_LOGO}", file=sys.stderr)
+        # Logo, template e WeasyPrint rodam num processo separado; o formulário continua livre
+        future = self.fila_pdf.enviar(dict(dados_os), filename_full_path, INFO_OFICINA,
+                                      logo_absolute_path, HTML_TEMPLATE_FILE, os.getcwd())
 
-        try:
-            template = self.env.get_template(HTML_TEMPLATE_FILE)
+        progresso = QProgressDialog(f"Gerando PDF da OS {dados_os['Numero_OS']}...", None, 0, 0, self)
+        progresso.setWindowTitle("Gerando PDF")
+        progresso.setWindowModality(Qt.NonModal)
+        progresso.setMinimumDuration(0)
+        progresso.show()
+        self._progresso_pdf[future] = progresso
 
-            template_data = {
-                'dados': dados_os,
-                'info_oficina': INFO_OFICINA,
-                'logo_base64': logo_base64_data  # Pasa la string Base64 para el template
-            }
+        # O callback roda numa thread do executor; o sinal entrega o resultado na thread da interface
+        future.add_done_callback(self._notificar_pdf)
 
-            html_content = template.render(template_data)
+    def _notificar_pdf(self, future):
+        try:
+            caminho = future.result()
+        except Exception as e:
+            self._sinais_pdf.falhou.emit(future, e)
+        else:
+            self._sinais_pdf.concluido.emit(future, caminho)
+
+    def _fechar_progresso_pdf(self, future):
+        progresso = self._progresso_pdf.pop(future, None)
+        if progresso is not None:
+            progresso.close()
+            progresso.deleteLater()
+
+    def _pdf_concluido(self, future, filename_full_path):
+        self._fechar_progresso_pdf(future)
+        QMessageBox.information(self, "PDF Gerado",
+                                f"Ordem de Serviço salva em:\n{filename_full_path}\n"
+                                "Ela será aberta para visualização.")
+        try:
+            log.debug("Abrindo o PDF: %s", filename_full_path)
+            # O visualizador é iniciado desacoplado: não esperamos ele fechar
+            abrir_arquivo(filename_full_path)
+            log.debug("PDF aberto.")
+        except FileNotFoundError:
+            QMessageBox.warning(self, "Visualizador não encontrado",
+                                "Nenhum programa para abrir PDFs foi encontrado. Instale um visualizador ou "
+                                "verifique o PATH.")
+            log.error("Visualizador de PDF não encontrado em '%s'", sys.platform)
+        except Exception as e:
+            QMessageBox.warning(self, "Erro ao Abrir o PDF",
+                                f"Não foi possível abrir o PDF automaticamente. Abra-o manualmente em: "
+                                f"{filename_full_path}\nErro: {e}")
+            log.error("Erro inesperado ao abrir o PDF: %s", e)
+
+    def _pdf_falhou(self, future, e):
+        self._fechar_progresso_pdf(future)
+        QMessageBox.critical(self, "Erro na Geração do PDF",
+                             f"Ocorreu um erro ao gerar o PDF com o WeasyPrint: {e}\n"
+                             "Verifique o template HTML e a instalação das bibliotecas.")
+        log.error("Detalhes do erro ao gerar o PDF com o WeasyPrint: %s", e)
+        # A remoção do arquivo temporário é garantida pelo atexit.register, mesmo em caso de erro aqui.
+
+
+    def _exportar_lote_pdf(self):
+        situacoes = [self.combo_situacao_atual.itemText(i) for i in range(self.combo_situacao_atual.count())]
+        dialogo = DialogoLotePDF(situacoes, self)
+        if dialogo.exec_() != QDialog.Accepted:
+            return
 
-            HTML(string=html_content, base_url=os.getcwd()).write_pdf(filename_full_path)
+        arquivo_mesclado = None
+        if dialogo.check_mesclar.isChecked():
+            arquivo_mesclado, _ = QFileDialog.getSaveFileName(self, "Salvar PDF único",
+                                                              os.path.join(PASTA_OS_CLIENTES, "Ordens_de_Servico.pdf"),
+                                                              "PDF (*.pdf)")
+            if not arquivo_mesclado:
+                return
 
-            QMessageBox.information(self, "PDF Generado",
-                                    f"Orden de Servicio guardada en:\n{filename_full_path}\nSerá abierta para visualización.")
+        progresso = QProgressDialog("Gerando PDFs das OSs...", None, 0, 0, self)
+        progresso.setWindowTitle("Exportação em Lote")
+        progresso.setWindowModality(Qt.NonModal)
+        progresso.setMinimumDuration(0)
+        progresso.show()
+
+        tarefa = _TarefaLotePDF(self.armazenamento, PASTA_OS_CLIENTES, arquivo_mesclado, dialogo.filtro())
+        sinais = tarefa.sinais
+        self._lotes_pdf.add(sinais)
+
+        def atualizar(concluidos, total):
+            progresso.setMaximum(total)
+            progresso.setValue(concluidos)
+            progresso.setLabelText(f"Gerando PDFs das OSs... {concluidos}/{total}")
+
+        def finalizar():
+            self._lotes_pdf.discard(sinais)
+            progresso.close()
+            progresso.deleteLater()
+
+        def concluido(arquivos):
+            finalizar()
+            if not arquivos:
+                QMessageBox.information(self, "Exportação em Lote", "Nenhuma OS corresponde ao filtro informado.")
+            elif arquivo_mesclado:
+                QMessageBox.information(self, "Exportação em Lote", f"PDF único gerado em:\n{arquivo_mesclado}")
+                try:
+                    abrir_arquivo(arquivo_mesclado)
+                except Exception as e:
+                    log.error("Erro inesperado ao abrir o PDF: %s", e)
+            else:
+                QMessageBox.information(self, "Exportação em Lote",
+                                        f"{len(arquivos)} PDF(s) gerado(s) na pasta:\n{os.path.abspath(PASTA_OS_CLIENTES)}")
+
+        def falhou(e):
+            finalizar()
+            QMessageBox.critical(self, "Erro na Exportação em Lote", f"Não foi possível gerar os PDFs: {e}")
+            log.error("Erro na exportação de PDFs em lote: %s", e)
+
+        sinais.progresso.connect(atualizar)
+        sinais.concluido.connect(concluido)
+        sinais.falhou.connect(falhou)
+        QThreadPool.globalInstance().start(tarefa)
+
+    def _exportar_os(self):
+        dialogo = DialogoExportacao(
+            [self.combo_situacao_atual.itemText(i) for i in range(self.combo_situacao_atual.count())],
+            [self.combo_condicoes_pagamento.itemText(i) for i in range(self.combo_condicoes_pagamento.count())],
+            self)
+        if dialogo.exec_() != QDialog.Accepted:
+            return
+        caminho, filtro_arquivo = QFileDialog.getSaveFileName(
+            self, "Exportar OSs", "Ordens_de_Servico_exportadas.xlsx",
+            "Excel (*.xlsx);;CSV - Excel em português (*.csv);;JSON Lines (*.jsonl)")
+        if not caminho:
+            return
+        if os.path.splitext(caminho)[1].lower() not in FORMATOS_EXPORTACAO:
+            # Sem extensão digitada, vale a do tipo escolhido na janela
+            caminho += filtro_arquivo[filtro_arquivo.rindex("*") + 1:-1]
+
+        progresso = QProgressDialog("Exportando OSs...", "Cancelar", 0, 0, self)
+        progresso.setWindowTitle("Exportar OSs")
+        progresso.setWindowModality(Qt.NonModal)
+        progresso.setMinimumDuration(0)
+        progresso.setAutoClose(False)
+        progresso.show()
+
+        tarefa = _TarefaExportacao(self.armazenamento, caminho, dialogo.check_itens.isChecked(), dialogo.filtro())
+        sinais = tarefa.sinais
+        self._exportacoes.add(sinais)
+
+        def cancelar():
+            tarefa.cancelada = True
+            progresso.setLabelText("Cancelando...")
+
+        def atualizar(exportadas, total):
+            if tarefa.cancelada:
+                return
+            progresso.setMaximum(total)
+            progresso.setValue(exportadas)
+            progresso.setLabelText(f"Exportando OSs... {exportadas}/{total}")
+
+        def finalizar():
+            self._exportacoes.discard(sinais)
+            progresso.close()
+            progresso.deleteLater()
+
+        def concluido(resultado):
+            finalizar()
+            if resultado is None:
+                QMessageBox.information(self, "Exportar OSs", "Exportação cancelada; nenhum arquivo foi alterado.")
+                return
+            total, arquivos = resultado
+            QMessageBox.information(self, "Exportar OSs", f"{total} OS exportada(s) para:\n" + "\n".join(arquivos))
 
-            try:
-                print(f"Intentando abrir el PDF: {filename_full_path}", file=sys.stderr)
-                if platform.system() == "Windows":
-                    subprocess.run(["start", "", filename_full_path], shell=True, check=True)
-                elif platform.system() == "Darwin":
-                    subprocess.run(["open", filename_full_path], check=True)
-                else:
-                    subprocess.run(["xdg-open", filename_full_path], check=True)
-                print("PDF abierto con éxito.", file=sys.stderr)
-            except FileNotFoundError:
-                QMessageBox.warning(self, "Visor no encontrado",
-                                    "No se pudo encontrar un programa para abrir PDFs. Instale un visor o verifique el PATH.")
-                print(f"Error: Visor de PDF no encontrado para '{platform.system()}'", file=sys.stderr)
-            except subprocess.CalledProcessError as e:
-                QMessageBox.warning(self, "Error al abrir PDF",
-                                    f"El comando para abrir el PDF falló (código {e.returncode}). Error: {e.stderr.decode()}")
-                print(f"Error en el subproceso al abrir PDF: {e}", file=sys.stderr)
-            except Exception as e:
-                QMessageBox.warning(self, "Error al abrir PDF",
-                                    f"No se pudo abrir el PDF automáticamente. Por favor, ábralo manualmente desde: {filename_full_path}\nError: {e}")
-                print(f"Error inesperado al intentar abrir PDF: {e}", file=sys.stderr)
+        def falhou(e):
+            finalizar()
+            QMessageBox.critical(self, "Erro ao Exportar", f"Não foi possível exportar as OSs: {e}")
+            log.error("Erro na exportação de OSs para %s: %s", caminho, e)
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error en la Generación del PDF",
-                                 f"Ocurrió un error al generar el PDF con Weasyprint: {e}\nVerifique la plantilla HTML y la configuración de las bibliotecas.")
-            print(f"Error detallado en la generación del PDF con Weasyprint: {e}", file=sys.stderr)
-            # A remoção do arquivo temporário é garantida pelo atexit.register, mesmo em caso de erro aqui.
+        progresso.canceled.connect(cancelar)
+        sinais.progresso.connect(atualizar)
+        sinais.concluido.connect(concluido)
+        sinais.falhou.connect(falhou)
+        QThreadPool.globalInstance().start(tarefa)
 
 
 # --- Ejecución de la Aplicación ---
-if __name__ == "__main__":
+def main():
+    configurar_log()
+    if ARQUIVO_PERFIL:
+        iniciar_perfil(ARQUIVO_PERFIL)
     app = QApplication(sys.argv)
     window = OficinaOSApp()
     window.show()
     sys.exit(app.exec_())
+
+
+if __name__ == "__main__":
+    main()
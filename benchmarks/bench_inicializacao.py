@@ -0,0 +1,145 @@
+"""Mede o tempo de abertura da interface: import do módulo, primeira pintura e dados prontos.
+
+Cada repetição roda num interpretador novo (imports frios), numa pasta
+temporária, para não tocar nos dados reais.
+
+Uso:
+    python benchmarks/bench_inicializacao.py
+    python benchmarks/bench_inicializacao.py --repeticoes 10 --banco Ordens_de_Servico.db
+    python benchmarks/bench_inicializacao.py --linhas 100000   # banco sintético com 100 mil OSs
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_inicializacao.py   # sem tela
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS_PESADOS = ("pandas", "weasyprint", "PIL", "jinja2", "requests")
+
+# Executado no processo filho; imprime uma linha JSON com os tempos em segundos
+_MEDICAO = r"""
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+import Oficina_OS
+t_import = time.perf_counter() - inicio
+pesados_no_import = [m for m in {pesados!r} if m in sys.modules]
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+tempos = {{"import": t_import}}
+
+class Pintura(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "primeira_pintura" not in tempos:
+            tempos["primeira_pintura"] = time.perf_counter() - inicio
+        return False
+
+app = QApplication(sys.argv)
+filtro = Pintura()
+app.installEventFilter(filtro)
+janela = Oficina_OS.OficinaOSApp()
+tempos["janela_criada"] = time.perf_counter() - inicio
+
+def dados_prontos(*_):
+    tempos["dados_prontos"] = time.perf_counter() - inicio
+    QTimer.singleShot(0, janela.close)
+
+if janela.armazenamento is not None:
+    dados_prontos()
+else:
+    janela._carregamento.sinais.concluido.connect(dados_prontos)
+    janela._carregamento.sinais.falhou.connect(dados_prontos)
+janela.show()
+QTimer.singleShot(30000, app.quit)
+app.exec_()
+tempos.setdefault("primeira_pintura", None)
+tempos["pesados_no_import"] = pesados_no_import
+print("RESULTADO " + json.dumps(tempos))
+"""
+
+
+def gerar_banco(caminho, linhas, semente=42):
+    """Banco sintético com ``linhas`` OSs (guardado na pasta temporária e reaproveitado)."""
+    sys.path.insert(0, RAIZ)
+    from oficina_core import ArmazenamentoSQLite
+
+    aleatorio = random.Random(semente)
+    situacoes = ("Em Andamento", "Finalizado", "Aguardando Peças")
+    pecas = ("Pastilha de freio", "Óleo 5W30", "Filtro de ar", "Correia dentada", "Amortecedor")
+
+    def registros():
+        for i in range(1, linhas + 1):
+            valor = round(aleatorio.uniform(50, 5000), 2)
+            yield {
+                "Numero_OS": str(i).zfill(6),
+                "Data_OS": f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/{aleatorio.randint(2015, 2025)}",
+                "Nome_Cliente": f"Cliente {aleatorio.randint(1, linhas // 3 + 1)}",
+                "Placa_Veiculo": f"ABC{aleatorio.randint(1000, 9999)}",
+                "Situacao_Atual": aleatorio.choice(situacoes),
+                "Valor_Total_Final": valor,
+                "Itens_Pecas_Servicos": [{"tipo": "Peça", "referencia": f"R{i % 50}", "descricao": aleatorio.choice(pecas),
+                                          "valor": valor, "quantia": 1, "desc": 0, "valor_total": valor}],
+            }
+
+    armazenamento = ArmazenamentoSQLite(caminho + ".tmp")
+    try:
+        armazenamento.importar(registros())
+    finally:
+        armazenamento.fechar()
+    os.replace(caminho + ".tmp", caminho)
+
+
+def medir(banco=None):
+    pasta = tempfile.mkdtemp(prefix="bench_inicio_")
+    try:
+        if banco:
+            shutil.copy(banco, os.path.join(pasta, "Ordens_de_Servico.db"))
+        codigo = _MEDICAO.format(raiz=RAIZ, pesados=MODULOS_PESADOS)
+        saida = subprocess.run([sys.executable, "-c", codigo], cwd=pasta, capture_output=True, text=True,
+                               timeout=120)
+        for linha in saida.stdout.splitlines():
+            if linha.startswith("RESULTADO "):
+                return json.loads(linha[len("RESULTADO "):])
+        raise RuntimeError(f"Medição falhou:\n{saida.stderr}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do Oficina_OS.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--banco", help="Ordens_de_Servico.db copiado para a pasta de teste")
+    parser.add_argument("--linhas", type=int, help="usa um banco sintético com esse número de OSs")
+    args = parser.parse_args(argv)
+
+    if args.linhas and not args.banco:
+        args.banco = os.path.join(tempfile.gettempdir(), f"bench_inicio_{args.linhas}.db")
+        if not os.path.exists(args.banco):
+            print(f"Gerando {args.banco} com {args.linhas} OSs...", file=sys.stderr)
+            gerar_banco(args.banco, args.linhas)
+
+    resultados = [medir(args.banco) for _ in range(args.repeticoes)]
+    print(f"{'etapa':<18} {'mediana (ms)':>12} {'mín (ms)':>10} {'máx (ms)':>10}")
+    for etapa in ("import", "janela_criada", "primeira_pintura", "dados_prontos"):
+        valores = [r[etapa] * 1000 for r in resultados if r.get(etapa) is not None]
+        if not valores:
+            print(f"{etapa:<18} {'-':>12}")
+            continue
+        print(f"{etapa:<18} {statistics.median(valores):>12.1f} {min(valores):>10.1f} {max(valores):>10.1f}")
+    pesados = sorted(set(m for r in resultados for m in r["pesados_no_import"]))
+    print("Módulos pesados carregados no import:", ", ".join(pesados) if pesados else "nenhum")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
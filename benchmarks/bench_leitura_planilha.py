@@ -0,0 +1,154 @@
+"""Compara a leitura da planilha antiga com conversores por célula e com a conversão vetorizada.
+
+Gera (uma vez, e guarda na pasta temporária) uma planilha sintética no
+formato das versões anteriores, com valores numéricos (como o programa
+gravava) e uma fração de células em texto no formato brasileiro
+("1.234,56", "12.345"), como as editadas à mão no Excel, e mede:
+
+    conversao_*   só a conversão das colunas, sobre o mesmo DataFrame já lido
+    leitura_*     read_excel completo (o openpyxl domina o tempo)
+
+Uso:
+    python benchmarks/bench_leitura_planilha.py
+    python benchmarks/bench_leitura_planilha.py --linhas 20000 --repeticoes 5
+    python benchmarks/bench_leitura_planilha.py --fracao-texto 0.5 --sem-leitura
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from oficina_core.esquema import COLUNAS_OS  # noqa: E402
+from oficina_core.planilha import (COLUNAS_INTEIRAS, COLUNAS_VALOR, TIPOS_LEITURA, ler_excel_os,  # noqa: E402
+                                   normalizar_planilha)
+
+
+# --- Leitura das versões anteriores (referência) ---
+def _km_antigo(x):
+    return int(str(x).replace('.', '').replace(',', '')) if str(x).replace('.', '').replace(',', '').isdigit() \
+        else None
+
+
+def _valor_antigo(x):
+    if isinstance(x, str) and ',' in x:
+        return float(str(x).replace('.', '').replace(',', '.'))
+    return float(x) if x is not None else None
+
+
+CONVERSORES_ANTIGOS = dict({col: _km_antigo for col in COLUNAS_INTEIRAS},
+                           **{col: _valor_antigo for col in COLUNAS_VALOR})
+
+
+def ler_excel_antigo(caminho):
+    import pandas as pd
+
+    df = pd.read_excel(caminho, converters=dict(CONVERSORES_ANTIGOS, Numero_OS=str))
+    df['Numero_OS'] = df['Numero_OS'].astype(str).str.strip()
+    return df
+
+
+def converter_antigo(bruto):
+    df = bruto.copy()
+    for col, conversor in CONVERSORES_ANTIGOS.items():
+        df[col] = df[col].map(conversor)
+    df['Numero_OS'] = df['Numero_OS'].astype(str).str.strip()
+    return df
+
+
+def _dinheiro_br(valor):
+    inteiro, centavos = f"{valor:.2f}".split(".")
+    return f"{int(inteiro):,}".replace(",", ".") + "," + centavos
+
+
+def gerar_planilha(caminho, linhas, fracao_texto, semente=42):
+    import pandas as pd
+
+    aleatorio = random.Random(semente)
+    registros = []
+    for i in range(1, linhas + 1):
+        valor = round(aleatorio.uniform(50, 15000), 2)
+        km = aleatorio.randint(0, 300000)
+        texto = aleatorio.random() < fracao_texto
+        registro = {col: None for col in COLUNAS_OS}
+        registro.update({
+            "Numero_OS": str(i).zfill(6),
+            "Data_OS": f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/2024",
+            "Nome_Cliente": f"Cliente {aleatorio.randint(1, linhas // 3 + 1)}",
+            "Placa_Veiculo": f"ABC{aleatorio.randint(1000, 9999)}",
+            "KM_Atual_Veiculo": f"{km:,}".replace(",", ".") if texto else km,
+            "Total_Itens": _dinheiro_br(valor) if texto else valor,
+            "Valor_Total_Final": _dinheiro_br(valor + 50) if texto else valor + 50,
+            "Deslocamento": "50,00" if texto else 50.0,
+            "Desconto_Geral": "0,00" if texto else 0.0,
+            "Situacao_Atual": aleatorio.choice(["Em Andamento", "Finalizado", "Aguardando Peças"]),
+            "Condicoes_Pagamento": aleatorio.choice(["À vista", "Cartão", "Pix"]),
+            "Combustivel_Veiculo": aleatorio.choice(["Gasolina", "Etanol", "Flex", "Diesel"]),
+        })
+        registros.append(registro)
+    pd.DataFrame.from_records(registros, columns=list(COLUNAS_OS)).to_excel(caminho, index=False)
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--fracao-texto", type=float, default=0.02,
+                        help="fração das linhas com valores digitados como texto (padrão 0.02)")
+    parser.add_argument("--arquivo", help="planilha a usar (gerada se não existir)")
+    parser.add_argument("--sem-leitura", action="store_true", help="mede só a conversão, sem o read_excel completo")
+    args = parser.parse_args(argv)
+
+    caminho = args.arquivo or os.path.join(tempfile.gettempdir(),
+                                           f"bench_planilha_{args.linhas}_{args.fracao_texto:g}.xlsx")
+    if not os.path.exists(caminho):
+        print(f"Gerando {caminho} com {args.linhas} linhas...", file=sys.stderr)
+        gerar_planilha(caminho, args.linhas, args.fracao_texto)
+
+    bruto = pd.read_excel(caminho, dtype=TIPOS_LEITURA)
+    antigo, novo = converter_antigo(bruto), normalizar_planilha(bruto.copy())
+    # As duas conversões têm de concordar antes de comparar os tempos
+    for col in COLUNAS_VALOR:
+        assert ((antigo[col].astype(float) - novo[col]).abs().fillna(0) < 1e-9).all(), col
+    for col in COLUNAS_INTEIRAS:
+        assert (antigo[col].astype("Int64") == novo[col]).fillna(True).all(), col
+
+    resultados = {
+        "conversao_por_celula": medir(lambda: converter_antigo(bruto), args.repeticoes),
+        "conversao_vetorizada": medir(lambda: normalizar_planilha(bruto.copy()), args.repeticoes),
+    }
+    if not args.sem_leitura:
+        resultados["leitura_por_celula"] = medir(lambda: ler_excel_antigo(caminho), args.repeticoes)
+        resultados["leitura_vetorizada"] = medir(lambda: ler_excel_os(caminho), args.repeticoes)
+
+    print(f"{len(bruto)} linhas, mediana de {args.repeticoes} repetições")
+    for nome, segundos in resultados.items():
+        print(f"  {nome:<22} {segundos * 1000:10.1f} ms")
+    print(f"  conversão: {resultados['conversao_por_celula'] / resultados['conversao_vetorizada']:.1f}x mais rápida")
+    if not args.sem_leitura:
+        print(f"  leitura completa: {resultados['leitura_por_celula'] / resultados['leitura_vetorizada']:.2f}x")
+    memoria_antiga = antigo.memory_usage(deep=True).sum() / 2 ** 20
+    memoria_nova = novo.memory_usage(deep=True).sum() / 2 ** 20
+    print(f"  memória do DataFrame: {memoria_antiga:.1f} MiB -> {memoria_nova:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
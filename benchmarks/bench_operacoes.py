@@ -0,0 +1,319 @@
+"""Mede como as operações da tela escalam com o tamanho dos dados e compara com a linha de base.
+
+Para cada tamanho (padrão 1 mil, 10 mil e 100 mil OSs; 1 milhão com
+``--tamanhos 1000000``) gera uma vez a planilha sintética (ver
+``dados_sinteticos``) e, num interpretador novo, sem tela
+(QT_QPA_PLATFORM=offscreen) e numa pasta temporária, mede:
+
+    carregar_migrando   _carregar_dados_os com só a planilha antiga na pasta (migração)
+    carregar            _carregar_dados_os com o banco já migrado
+    janela              OficinaOSApp() até os dados prontos
+    gerar_novo_id       _gerar_novo_id_os
+    buscar              _buscar_os de uma OS sorteada
+    salvar_nova         _salvar_os de uma OS nova
+    salvar_existente    _salvar_os de uma OS carregada e alterada
+    pesquisar           as pesquisas textuais de PESQUISAS (DialogoPesquisaOS), juntas
+    exportar_planilha   exportação da planilha Excel completa (exportar_excel)
+    imprimir_pdf        _imprimir_os_pdf até o PDF gravado (exige o WeasyPrint)
+
+e o pico de memória do processo (RSS) ao fim de cada etapa. O resultado é
+comparado com ``linha_de_base.json``: uma etapa mais lenta que a base além
+da ``--tolerancia`` conta como regressão e o código de saída passa a ser 1.
+``--salvar-base`` grava a medição atual como nova linha de base (só dos
+tamanhos medidos). Compare medições feitas na mesma máquina.
+
+Uso:
+    python benchmarks/bench_operacoes.py
+    python benchmarks/bench_operacoes.py --tamanhos 1000 10000 --repeticoes 20
+    python benchmarks/bench_operacoes.py --tamanhos 1000000 --sem-pdf
+    python benchmarks/bench_operacoes.py --salvar-base
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(AQUI)
+sys.path.insert(0, AQUI)
+
+from dados_sinteticos import gerar_planilha_os  # noqa: E402
+
+ARQUIVO_BASE = os.path.join(AQUI, "linha_de_base.json")
+TAMANHOS_PADRAO = (1000, 10000, 100000)
+ETAPAS = ("carregar_migrando", "carregar", "janela", "gerar_novo_id", "buscar", "salvar_nova", "salvar_existente",
+          "pesquisar", "exportar_planilha", "imprimir_pdf")
+PESQUISAS = ("Silva", "Maria Souza", "Gol", "pastilha", "Madureira", "correia dentada")
+# Diferenças menores que isso são ruído de medição, mesmo que a razão passe da tolerância
+PISO_MS = 1.0
+# Usado quando a pasta do programa não tem o os_template.html da oficina
+TEMPLATE_MINIMO = """<html><body>
+<h1>OS {{ dados.Numero_OS }} - {{ info_oficina.nome }}</h1>
+<p>{{ dados.Nome_Cliente }} | {{ dados.Placa_Veiculo }} | {{ dados.KM_Atual_Veiculo | km_format }} km</p>
+<table>{% for item in dados.Itens_Pecas_Servicos %}
+<tr><td>{{ item.referencia }}</td><td>{{ item.descricao }}</td><td>{{ item.quantia }}</td>
+<td>{{ item.valor_total | format_money }}</td></tr>{% endfor %}</table>
+<p>Total: R$ {{ dados.Valor_Total_Final | format_money }}</p>
+</body></html>
+"""
+
+
+def _pico_memoria_mib():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2 ** 20 if sys.platform == "darwin" else pico / 1024  # bytes no macOS, KiB no Linux
+
+
+# --- Processo filho: roda dentro da pasta temporária que tem a planilha ---
+def medir_no_processo(repeticoes, com_pdf):
+    """Mede as etapas e retorna ``{"tempos": {etapa: [s, ...]}, "pico_mib": {...}, ...}``."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, RAIZ)
+    tempos, pico, observacoes = {}, {"inicio": _pico_memoria_mib()}, []
+    sorteio = random.Random()
+
+    def medir(etapa, funcao, vezes=1, preparar=None):
+        sorteio.seed(etapa)  # A i-ésima repetição usa sempre os mesmos dados, qualquer que seja --repeticoes
+        for _ in range(vezes):
+            if preparar is not None:
+                preparar()
+            inicio = time.perf_counter()
+            funcao()
+            tempos.setdefault(etapa, []).append(time.perf_counter() - inicio)
+        pico[etapa] = _pico_memoria_mib()
+
+    import Oficina_OS
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+
+    # Sem caixas de mensagem, visualizador de PDF nem snapshot diário durante a medição
+    for nome in ("information", "warning", "critical"):
+        setattr(QMessageBox, nome, staticmethod(lambda *args, **kwargs: QMessageBox.Ok))
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+    Oficina_OS.abrir_arquivo = lambda caminho: None
+    Oficina_OS.agendar_snapshot = lambda *args, **kwargs: None
+
+    def carregar():
+        armazenamento, _, erro = Oficina_OS._carregar_dados_os()
+        armazenamento.fechar()
+        if erro:
+            raise RuntimeError(erro)
+
+    medir("carregar_migrando", carregar)
+    medir("carregar", carregar, min(repeticoes, 5))
+
+    app = QApplication([])
+    janela = None
+
+    def abrir_janela():
+        nonlocal janela
+        janela = Oficina_OS.OficinaOSApp()
+        limite = time.perf_counter() + 600
+        while janela.armazenamento is None and time.perf_counter() < limite:
+            app.processEvents()
+            time.sleep(0.0005)
+        if janela.armazenamento is None:
+            raise RuntimeError("A janela não terminou de carregar os dados")
+
+    medir("janela", abrir_janela)
+    total = len(janela.armazenamento)
+
+    medir("gerar_novo_id", janela._gerar_novo_id_os, repeticoes)
+
+    def escolher_os():
+        janela.entry_busca_os.setText(str(sorteio.randint(1, total)))
+
+    medir("buscar", janela._buscar_os, repeticoes, preparar=escolher_os)
+
+    def preencher_nova():
+        janela._limpar_campos()
+        janela.entries_cliente["nome"].setText(f"Cliente Benchmark {sorteio.randint(1, 10 ** 6)}")
+        janela.entries_veiculo["placa"].setText("BEN0C22")
+        for referencia, valor in (("PF-1020", "189,90"), ("MO-H", "110,00")):
+            janela.entry_item_ref.setText(referencia)
+            janela.entry_item_desc.setText("Item de benchmark")
+            janela.entry_item_valor.setText(valor)
+            janela.entry_item_qtd.setText("2")
+            janela._adicionar_item()
+
+    medir("salvar_nova", janela._salvar_os, repeticoes, preparar=preencher_nova)
+
+    def carregar_e_alterar():
+        escolher_os()
+        janela._buscar_os()
+        janela.text_problema_constatado.setText(f"Revisado no benchmark {sorteio.random()}")
+
+    medir("salvar_existente", janela._salvar_os, repeticoes, preparar=carregar_e_alterar)
+
+    dialogo = Oficina_OS.DialogoPesquisaOS(janela.armazenamento, janela)
+
+    def pesquisar_todas():
+        for consulta in PESQUISAS:
+            dialogo.entry_consulta.blockSignals(True)  # Sem a pesquisa automática enquanto digita
+            dialogo.entry_consulta.setText(consulta)
+            dialogo.entry_consulta.blockSignals(False)
+            dialogo._ir_para(0)
+
+    medir("pesquisar", pesquisar_todas, repeticoes)
+
+    from oficina_core.planilha import exportar_excel
+    medir("exportar_planilha", lambda: exportar_excel(janela.armazenamento, "exportacao.xlsx"))
+
+    if com_pdf:
+        def imprimir():
+            janela._imprimir_os_pdf()
+            for future in list(janela._progresso_pdf):
+                future.result(timeout=300)
+            app.processEvents()
+
+        try:
+            janela.fila_pdf.aquecer().result(timeout=300)  # O pool aquece na abertura, fora da medição
+            medir("imprimir_pdf", imprimir, min(repeticoes, 5), preparar=carregar_e_alterar)
+        except Exception as e:
+            tempos.pop("imprimir_pdf", None)
+            observacoes.append(f"imprimir_pdf não medido: {e}")
+
+    janela.close()
+    return {"ordens": total, "tempos": tempos, "pico_mib": pico, "observacoes": observacoes}
+
+
+# --- Processo principal ---
+def planilha_sintetica(linhas):
+    caminho = os.path.join(tempfile.gettempdir(), f"bench_os_{linhas}.xlsx")
+    if not os.path.exists(caminho):
+        print(f"Gerando {caminho} com {linhas} OSs...", file=sys.stderr)
+        inicio = time.perf_counter()
+        gerar_planilha_os(caminho, linhas)
+        print(f"  gerada em {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+    return caminho
+
+
+def medir_tamanho(linhas, repeticoes, com_pdf):
+    pasta = tempfile.mkdtemp(prefix="bench_operacoes_")
+    try:
+        shutil.copy(planilha_sintetica(linhas), os.path.join(pasta, "Ordens_de_Servico.xlsx"))
+        template = os.path.join(RAIZ, "os_template.html")
+        if os.path.exists(template):
+            shutil.copy(template, pasta)
+        else:
+            with open(os.path.join(pasta, "os_template.html"), "w", encoding="utf-8") as f:
+                f.write(TEMPLATE_MINIMO)
+        if os.path.isdir(os.path.join(RAIZ, "resources")):
+            shutil.copytree(os.path.join(RAIZ, "resources"), os.path.join(pasta, "resources"))
+        comando = [sys.executable, os.path.abspath(__file__), "--filho", "--repeticoes", str(repeticoes)]
+        if not com_pdf:
+            comando.append("--sem-pdf")
+        saida = subprocess.run(comando, cwd=pasta, capture_output=True, text=True,
+                               env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+        for linha in saida.stdout.splitlines():
+            if linha.startswith("RESULTADO "):
+                bruto = json.loads(linha[len("RESULTADO "):])
+                break
+        else:
+            raise RuntimeError(f"Medição de {linhas} OSs falhou:\n{saida.stderr[-4000:]}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    if "imprimir_pdf" in bruto["tempos"] and not os.path.exists(template):
+        bruto["observacoes"].append("imprimir_pdf com o template mínimo do benchmark (sem os_template.html)")
+    etapas = {}
+    for etapa, valores in bruto["tempos"].items():
+        etapas[etapa] = {"vezes": len(valores), "mediana_ms": statistics.median(valores) * 1000,
+                         "max_ms": max(valores) * 1000, "pico_mib": bruto["pico_mib"].get(etapa)}
+    return {"ordens": bruto["ordens"], "etapas": etapas, "observacoes": bruto["observacoes"]}
+
+
+def maquina():
+    return {"plataforma": platform.platform(), "python": platform.python_version(), "processador":
+            platform.processor() or platform.machine(), "nucleos": os.cpu_count()}
+
+
+def _numero(valor, largura, casas=1):
+    return f"{valor:{largura}.{casas}f}" if valor is not None else "-".rjust(largura)
+
+
+def comparar(atual, base, tolerancia):
+    """Imprime a tabela de cada tamanho e retorna a lista de regressões ``(tamanho, etapa, razão)``."""
+    regressoes = []
+    for tamanho, medicao in atual.items():
+        anterior = base.get(tamanho, {}).get("etapas", {})
+        print(f"\n{medicao['ordens']} OSs")
+        print(f"  {'etapa':<19} {'base (ms)':>10} {'atual (ms)':>10} {'razão':>7} {'pico (MiB)':>11}")
+        for etapa in ETAPAS:
+            dados = medicao["etapas"].get(etapa)
+            if dados is None:
+                continue
+            base_ms = anterior.get(etapa, {}).get("mediana_ms")
+            razao = dados["mediana_ms"] / base_ms if base_ms else None
+            marca = ""
+            if razao is not None and razao > 1 + tolerancia and dados["mediana_ms"] - base_ms > PISO_MS:
+                regressoes.append((tamanho, etapa, razao))
+                marca = "  <- regressão"
+            print(f"  {etapa:<19} {_numero(base_ms, 10, 2)} {_numero(dados['mediana_ms'], 10, 2)} "
+                  f"{_numero(razao, 7, 2)} {_numero(dados['pico_mib'], 11, 0)}{marca}")
+        for observacao in medicao["observacoes"]:
+            print(f"  obs.: {observacao}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS_PADRAO),
+                        help="números de OSs (padrão 1000 10000 100000)")
+    parser.add_argument("--repeticoes", type=int, default=10, help="repetições das etapas rápidas (padrão 10)")
+    parser.add_argument("--sem-pdf", action="store_true", help="não mede a impressão do PDF")
+    parser.add_argument("--base", default=ARQUIVO_BASE, help="arquivo da linha de base")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="aumento relativo aceito antes de acusar regressão (padrão 0.25)")
+    parser.add_argument("--salvar-base", action="store_true", help="grava esta medição como linha de base")
+    parser.add_argument("--saida", help="grava também esta medição em JSON neste arquivo")
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.filho:
+        print("RESULTADO " + json.dumps(medir_no_processo(args.repeticoes, not args.sem_pdf)))
+        return 0
+
+    atual = {}
+    for linhas in args.tamanhos:
+        print(f"Medindo {linhas} OSs...", file=sys.stderr)
+        atual[str(linhas)] = medir_tamanho(linhas, args.repeticoes, not args.sem_pdf)
+
+    base = {}
+    if os.path.exists(args.base):
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"Linha de base de {base.get('data')} ({base.get('maquina', {}).get('processador')}, "
+              f"Python {base.get('maquina', {}).get('python')})")
+    regressoes = comparar(atual, base.get("tamanhos", {}), args.tolerancia)
+
+    medicao = {"data": time.strftime("%Y-%m-%d"), "maquina": maquina(), "repeticoes": args.repeticoes,
+               "tamanhos": atual}
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(medicao, f, ensure_ascii=False, indent=2)
+    if args.salvar_base:
+        medicao["tamanhos"] = dict(base.get("tamanhos", {}), **atual)
+        with open(args.base, "w", encoding="utf-8") as f:
+            json.dump(medicao, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nLinha de base gravada em {args.base}")
+    if regressoes:
+        print(f"\n{len(regressoes)} etapa(s) mais lentas que a base além de {args.tolerancia:.0%}:")
+        for tamanho, etapa, razao in regressoes:
+            print(f"  {tamanho} OSs, {etapa}: {razao:.2f}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
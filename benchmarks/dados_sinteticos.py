@@ -0,0 +1,122 @@
+"""Ordens de Serviço sintéticas, no formato da planilha Ordens_de_Servico.xlsx das versões anteriores.
+
+As colunas são as de ``COLUNAS_OS`` (as mesmas de ``_get_expected_columns``)
+e ``Detalhes_Itens`` traz de 1 a 8 peças e serviços no texto que o programa
+gravava. A planilha é escrita em modo streaming (openpyxl write-only), então
+gerar 1 milhão de linhas não exige guardar todas em memória. A mesma
+semente gera sempre os mesmos dados.
+"""
+
+import os
+import random
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from oficina_core.esquema import COLUNAS_OS  # noqa: E402
+from oficina_core.itens import formatar_detalhes_itens  # noqa: E402
+
+NOMES = ("José", "Maria", "Ana", "João", "Carlos", "Paulo", "Fernanda", "Lucas", "Juliana", "Marcos", "Patrícia",
+         "Rafael", "Aline", "Bruno", "Camila", "Diego")
+SOBRENOMES = ("Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+              "Costa", "Ribeiro", "Martins", "Carvalho")
+BAIRROS = ("Rocha Miranda", "Madureira", "Irajá", "Penha", "Méier", "Tijuca", "Bangu", "Campo Grande")
+VEICULOS = (("Volkswagen", "Gol"), ("Fiat", "Uno"), ("Chevrolet", "Onix"), ("Ford", "Ka"), ("Hyundai", "HB20"),
+            ("Renault", "Sandero"), ("Toyota", "Corolla"), ("Honda", "Civic"), ("Fiat", "Strada"))
+CORES = ("Prata", "Preto", "Branco", "Vermelho", "Cinza", "Azul")
+COMBUSTIVEIS = ("Gasolina", "Etanol", "Flex", "Diesel", "GNV")
+SITUACOES = ("Orçamento", "Em Andamento", "Aguardando Peças", "Finalizado", "Entregue")
+PAGAMENTOS = ("À vista", "Pix", "Cartão de Débito", "Cartão de Crédito", "Boleto")
+RESPONSAVEIS = ("Carlos", "Roberto", "Anderson", "Márcio")
+PROBLEMAS = ("Barulho ao frear", "Motor falhando", "Luz da injeção acesa", "Ar-condicionado não gela",
+             "Vazamento de óleo", "Revisão dos 40 mil km", "Direção dura", "Bateria descarregando")
+# (tipo, referência, descrição, valor unitário)
+CATALOGO = (
+    ("Peça", "PF-1020", "Pastilha de freio dianteira", 189.90),
+    ("Peça", "DF-330", "Disco de freio", 245.00),
+    ("Peça", "OL-5W30", "Óleo 5W30 sintético (litro)", 52.50),
+    ("Peça", "FO-77", "Filtro de óleo", 38.90),
+    ("Peça", "FA-12", "Filtro de ar", 45.00),
+    ("Peça", "CD-908", "Correia dentada", 210.00),
+    ("Peça", "VL-04", "Vela de ignição", 32.00),
+    ("Peça", "AM-550", "Amortecedor dianteiro", 420.00),
+    ("Peça", "BT-60", "Bateria 60Ah", 560.00),
+    ("Serviço", "ALN", "Alinhamento e balanceamento", 120.00),
+    ("Serviço", "LIMP-INJ", "Limpeza de bicos injetores", 180.00),
+    ("Serviço", "HIG-AC", "Higienização do ar-condicionado", 150.00),
+    ("Mão de obra", "MO-H", "Hora de mão de obra", 110.00),
+)
+
+
+def _itens(aleatorio):
+    itens = []
+    for tipo, referencia, descricao, valor in aleatorio.sample(CATALOGO, aleatorio.randint(1, 8)):
+        quantia = aleatorio.randint(1, 4) if tipo == "Peça" else 1
+        desc = aleatorio.choice((0, 0, 0, 5, 10))
+        itens.append({"tipo": tipo, "referencia": referencia, "descricao": descricao, "uni": "un", "valor": valor,
+                      "quantia": quantia, "desc": desc, "valor_total": round(valor * quantia * (100 - desc) / 100, 2)})
+    return itens
+
+
+def gerar_registros(linhas, semente=42):
+    """Gera ``linhas`` dicts com todas as colunas de ``COLUNAS_OS``, numerados a partir de 000001."""
+    aleatorio = random.Random(semente)
+    clientes = max(linhas // 3, 1)
+    for i in range(1, linhas + 1):
+        cliente = aleatorio.randint(1, clientes)
+        marca, modelo = VEICULOS[cliente % len(VEICULOS)]
+        itens = _itens(aleatorio)
+        total_itens = round(sum(item["valor_total"] for item in itens), 2)
+        deslocamento = aleatorio.choice((0.0, 0.0, 30.0, 50.0))
+        desconto = aleatorio.choice((0.0, 0.0, 0.0, 20.0))
+        yield {
+            "Numero_OS": str(i).zfill(6),
+            "Data_OS": f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/{aleatorio.randint(2015, 2025)}",
+            "Hora_OS": f"{aleatorio.randint(7, 18):02d}:{aleatorio.randint(0, 59):02d}:{aleatorio.randint(0, 59):02d}",
+            "Nome_Cliente": f"{NOMES[cliente % len(NOMES)]} {SOBRENOMES[cliente % len(SOBRENOMES)]} {cliente}",
+            "Endereco_Cliente": f"Rua {SOBRENOMES[(cliente * 7) % len(SOBRENOMES)]}",
+            "Numero_Imovel_Cliente": cliente % 2000 + 1,
+            "Bairro_Cliente": BAIRROS[cliente % len(BAIRROS)],
+            "Cidade_Cliente": "Rio de Janeiro",
+            "UF_Cliente": "RJ",
+            "CEP_Cliente": f"21{cliente % 1000000:06d}",
+            "Telefone_Cliente": f"(21) 9{cliente % 10000:04d}-{(cliente * 31) % 10000:04d}",
+            "CPF_CNPJ_Cliente": f"{cliente % 1000:03d}.{cliente // 1000 % 1000:03d}.{cliente % 997:03d}-"
+                                f"{cliente % 97:02d}",
+            "Placa_Veiculo": f"{chr(65 + cliente % 26)}{chr(65 + cliente // 26 % 26)}{chr(65 + cliente // 676 % 26)}"
+                             f"{cliente % 10}{chr(65 + cliente // 10 % 26)}{cliente % 100:02d}",
+            "Marca_Veiculo": marca,
+            "Modelo_Veiculo": modelo,
+            "Cor_Veiculo": CORES[cliente % len(CORES)],
+            "Ano_Veiculo": 2005 + cliente % 20,
+            "KM_Atual_Veiculo": aleatorio.randint(5000, 300000),
+            "Combustivel_Veiculo": COMBUSTIVEIS[cliente % len(COMBUSTIVEIS)],
+            "Box_Veiculo": f"Box {aleatorio.randint(1, 6)}",
+            "Problema_Informado": aleatorio.choice(PROBLEMAS),
+            "Problema_Constatado": aleatorio.choice(PROBLEMAS),
+            "Servico_Executado": "; ".join(item["descricao"] for item in itens if item["tipo"] != "Peça")
+                                 or "Troca de peças",
+            "Detalhes_Itens": formatar_detalhes_itens(itens),
+            "Total_Itens": total_itens,
+            "Deslocamento": deslocamento,
+            "Desconto_Geral": desconto,
+            "Valor_Total_Final": round(total_itens + deslocamento - desconto, 2),
+            "Responsavel": aleatorio.choice(RESPONSAVEIS),
+            "Situacao_Atual": aleatorio.choice(SITUACOES),
+            "Condicoes_Pagamento": aleatorio.choice(PAGAMENTOS),
+        }
+
+
+def gerar_planilha_os(caminho, linhas, semente=42):
+    """Grava a planilha sintética em ``caminho`` (via arquivo temporário, para não deixar uma pela metade)."""
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    folha = livro.create_sheet("Sheet1")
+    folha.append(list(COLUNAS_OS))
+    for registro in gerar_registros(linhas, semente):
+        folha.append([registro[col] for col in COLUNAS_OS])
+    livro.save(caminho + ".tmp")
+    os.replace(caminho + ".tmp", caminho)
+    return caminho
@@ -0,0 +1,11 @@
+"""Ponto de entrada da Gestão de Ordens de Serviço: ``python main.py``.
+
+A interface (Oficina_OS.py, com o PyQt5) só é importada sob ``__main__``.
+Os processos "spawn" do pool de PDFs (``oficina_core.PoolRenderizacao``)
+reexecutam este arquivo ao iniciar e, assim, não carregam o PyQt5.
+"""
+
+if __name__ == "__main__":
+    from Oficina_OS import main
+
+    main()
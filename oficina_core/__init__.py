@@ -0,0 +1,40 @@
+"""Núcleo da Gestão de Ordens de Serviço (persistência e regras, sem Qt)."""
+
+from .esquema import (
+    COLUNAS_OS, CAMPOS_OBRIGATORIOS, data_iso, formatar_numero_os, normalizar_registro, registro_para_salvar,
+    validar_registro, valor_vazio
+)
+from .itens import (
+    CHAVE_ITENS, CAMPOS_ITEM, normalizar_item, formatar_detalhes_itens, parse_detalhes_itens, calcular_total_item,
+    para_decimal
+)
+from .formatacao import formatar_dinheiro, formatar_km, padrao_se_vazio, mascara_telefone, mascara_cpf_cnpj
+from .busca import IndiceTexto
+from .cadastros import CAMPOS_CLIENTE, CAMPOS_VEICULO, IndiceCadastros
+from .repositorio import RepositorioOS
+from .armazenamento import CHAVE_VERSAO, ConflitoVersao, ArmazenamentoOS, ArmazenamentoJournal, ArmazenamentoSQLite
+from .remoto import ArmazenamentoRemoto, ErroServidor, FilaRenderizacaoRemota
+from .planilha import ler_excel_os, exportar_excel
+from .migracao import migrar
+from .importacao import importar_arquivo
+from .exportacao import exportar_os
+from .cep import (
+    ErroConsultaCEP, ResolvedorCEP, ResolvedorViaCEP, ResolvedorCEPArquivo, CacheCEP, ServicoCEP
+)
+from .pdf import gerar_pdf_os, renderizar_html, FilaRenderizacao, PoolRenderizacao
+
+__all__ = [
+    "COLUNAS_OS", "CAMPOS_OBRIGATORIOS", "data_iso", "formatar_numero_os", "normalizar_registro",
+    "registro_para_salvar", "validar_registro", "valor_vazio",
+    "CHAVE_ITENS", "CAMPOS_ITEM", "normalizar_item", "formatar_detalhes_itens", "parse_detalhes_itens",
+    "calcular_total_item", "para_decimal",
+    "formatar_dinheiro", "formatar_km", "padrao_se_vazio", "mascara_telefone", "mascara_cpf_cnpj",
+    "IndiceTexto", "CAMPOS_CLIENTE", "CAMPOS_VEICULO", "IndiceCadastros",
+    "RepositorioOS",
+    "CHAVE_VERSAO", "ConflitoVersao", "ArmazenamentoOS", "ArmazenamentoJournal", "ArmazenamentoSQLite",
+    "ArmazenamentoRemoto", "ErroServidor", "FilaRenderizacaoRemota",
+    "ler_excel_os", "exportar_excel",
+    "migrar", "importar_arquivo", "exportar_os",
+    "ErroConsultaCEP", "ResolvedorCEP", "ResolvedorViaCEP", "ResolvedorCEPArquivo", "CacheCEP", "ServicoCEP",
+    "gerar_pdf_os", "renderizar_html", "FilaRenderizacao", "PoolRenderizacao",
+]
@@ -0,0 +1,1177 @@
+"""Backends de persistência das Ordens de Serviço.
+
+O armazenamento principal deixou de ser a planilha: cada salvar/deletar grava
+apenas a OS alterada e o ``Ordens_de_Servico.xlsx`` passa a ser uma exportação
+feita quando pedida (ver ``oficina_core.exportacao``).
+"""
+
+import contextlib
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .arquivos import em_pasta_de_rede, sincronizar
+from .diagnostico import medido
+from .esquema import (
+    COLUNAS_OS, TIPOS_SQL, data_iso, formatar_numero_os, normalizar_registro, numero_os_para_int, valor_vazio
+)
+from .busca import alternativas_consulta, termos_parecidos, texto_busca
+from .cadastros import (
+    CAMPOS_CLIENTE, CAMPOS_VEICULO, chave_cliente, chave_veiculo, cliente_de, mesclar_cadastro, veiculo_de
+)
+from .itens import CAMPOS_ITEM, CHAVE_ITENS, normalizar_item, parse_detalhes_itens
+from .relatorios import CHAVES_FATURAMENTO, CHAVES_PECAS, agregar_faturamento, agregar_pecas
+from .repositorio import RepositorioOS
+
+log = logging.getLogger(__name__)
+
+# "desc" é palavra reservada do SQL
+_COLUNAS_ITEM_SQL = [f'"{campo}"' if campo == "desc" else campo for campo in CAMPOS_ITEM]
+
+# Número de versão da OS, devolvido junto com o registro e incrementado a cada gravação
+CHAVE_VERSAO = "Versao"
+
+# Contribuição das OSs aos resumos dos relatórios. As mesmas consultas montam os resumos na migração e
+# os atualizam a cada gravação, com o mesmo arredondamento: subtrair uma OS devolve exatamente o que ela somou
+_SQL_FATURAMENTO = (
+    "SELECT COALESCE(Data_ISO, '') AS dia, COALESCE(Situacao_Atual, '') AS situacao, "
+    "COALESCE(Condicoes_Pagamento, '') AS condicoes_pagamento, COALESCE(Responsavel, '') AS responsavel, "
+    "COUNT(*) AS ordens, SUM(CAST(ROUND(COALESCE(Valor_Total_Final, 0) * 100) AS INTEGER)) AS centavos "
+    "FROM {tabela} {onde} GROUP BY 1, 2, 3, 4")
+_SQL_PECAS_POR_OS = (
+    "SELECT Numero_OS, COALESCE(tipo, '') AS tipo, COALESCE(referencia, '') AS referencia, 1 AS ordens, "
+    "SUM(COALESCE(quantia, 0)) AS quantidade, "
+    "CAST(ROUND(SUM(COALESCE(valor_total, 0)) * 100) AS INTEGER) AS centavos "
+    "FROM {tabela} {onde} GROUP BY 1, 2, 3")
+MEDIDAS_FATURAMENTO = ("ordens", "centavos")
+MEDIDAS_PECAS = ("ordens", "quantidade", "centavos")
+MEDIDAS_SITUACOES = ("intervalos", "segundos")
+
+
+class ConflitoVersao(Exception):
+    """A OS foi alterada ou removida (por outro terminal) depois de ter sido lida."""
+
+    def __init__(self, numero_os, versao_esperada, versao_atual):
+        self.numero_os = numero_os
+        self.versao_esperada = versao_esperada
+        self.versao_atual = versao_atual  # None se a OS foi removida
+        if versao_atual is None:
+            mensagem = f"A OS {numero_os} foi removida por outro terminal."
+        else:
+            mensagem = (f"A OS {numero_os} foi alterada por outro terminal "
+                        f"(versão atual {versao_atual}, esperada {versao_esperada}).")
+        super().__init__(mensagem)
+
+
+def _verificar_versao(numero_os, versao_esperada, versao_atual):
+    if versao_esperada is not None and versao_esperada != versao_atual:
+        raise ConflitoVersao(numero_os, versao_esperada, versao_atual)
+
+
+def _normalizar_filtro(data_inicio=None, data_fim=None, situacao=None, condicoes_pagamento=None, numeros=None):
+    """Converte as datas para ISO e completa números só com dígitos (como na busca por ID)."""
+    if numeros is not None:
+        numeros = [formatar_numero_os(n) if str(n).strip().isdigit() else str(n).strip() for n in numeros]
+    return {
+        "data_inicio": data_iso(data_inicio) if data_inicio else None,
+        "data_fim": data_iso(data_fim) if data_fim else None,
+        "situacao": situacao or None,
+        "condicoes_pagamento": condicoes_pagamento or None,
+        "numeros": numeros,
+    }
+
+
+# Colunas pelas quais a listagem pode ser ordenada e as expressões SQL correspondentes
+# (cada combinação tem um índice, ver _migracao_indices_listagem)
+ORDENACOES = {
+    "Numero_OS": ("Numero_OS",),
+    "Data_OS": ("Data_ISO",),
+    "Nome_Cliente": ("Nome_Cliente COLLATE NOCASE",),
+    "Placa_Veiculo": ("Placa_Veiculo",),
+    "Situacao_Atual": ("Situacao_Atual", "Data_ISO"),
+    "Valor_Total_Final": ("Valor_Total_Final",),
+}
+
+
+def _chave_ordenacao(ordem):
+    if ordem not in ORDENACOES:
+        raise ValueError(f"Ordenação não suportada: {ordem}")
+
+    def chave(registro):
+        valor = data_iso(registro.get("Data_OS")) if ordem == "Data_OS" else registro.get(ordem)
+        if valor_vazio(valor):
+            return (0, "", registro["Numero_OS"])  # Vazios primeiro, como NULL no SQLite
+        return (1, valor.lower() if isinstance(valor, str) else valor, registro["Numero_OS"])
+    return chave
+
+
+def _atende_filtro(registro, data_inicio, data_fim, situacao, condicoes_pagamento, numeros):
+    data = data_iso(registro.get("Data_OS"))
+    if data_inicio and (data is None or data < data_inicio):
+        return False
+    if data_fim and (data is None or data > data_fim):
+        return False
+    if situacao and registro.get("Situacao_Atual") != situacao:
+        return False
+    if condicoes_pagamento and registro.get("Condicoes_Pagamento") != condicoes_pagamento:
+        return False
+    if numeros is not None and registro["Numero_OS"] not in numeros:
+        return False
+    return True
+
+
+class ArmazenamentoOS:
+    """Interface comum dos backends de persistência das OSs."""
+
+    def obter(self, numero_os):
+        """Retorna o registro da OS ou None se não existir."""
+        raise NotImplementedError
+
+    def salvar(self, registro, versao_esperada=None):
+        """Insere ou atualiza a OS. Retorna True se a OS foi criada.
+
+        Com ``versao_esperada`` (o ``Versao`` lido em ``obter``) a gravação só
+        acontece se ninguém alterou a OS nesse meio tempo; senão levanta
+        ``ConflitoVersao``. A OS gravada fica com a versão seguinte.
+        """
+        raise NotImplementedError
+
+    def proximo_numero_os(self):
+        """Número que a próxima OS nova deve receber (apenas consulta, não reserva)."""
+        numeros = [numero_os_para_int(n) for n in self.numeros()]
+        return formatar_numero_os(max([n for n in numeros if n is not None], default=0) + 1)
+
+    def criar(self, registro):
+        """Grava uma OS nova com o próximo número da sequência. Retorna o número atribuído."""
+        registro = dict(registro, Numero_OS=self.proximo_numero_os())
+        self.salvar(registro)
+        return registro["Numero_OS"]
+
+    def deletar(self, numero_os, versao_esperada=None):
+        """Remove a OS. Retorna True se ela existia. ``versao_esperada`` como em ``salvar``."""
+        raise NotImplementedError
+
+    def revisao_atual(self):
+        """Marca da última alteração gravada, para usar depois em ``alteracoes_desde``."""
+        raise NotImplementedError
+
+    def alteracoes_desde(self, revisao):
+        """OSs gravadas e removidas (por qualquer terminal) depois de ``revisao``.
+
+        Retorna ``(nova revisão, registros gravados, números removidos)``.
+        """
+        raise NotImplementedError
+
+    def registros(self):
+        """Itera sobre todas as OSs armazenadas."""
+        raise NotImplementedError
+
+    def numeros(self):
+        """Itera sobre os Numero_OS armazenados."""
+        for registro in self.registros():
+            yield registro["Numero_OS"]
+
+    def filtrar(self, **filtro):
+        """Itera sobre as OSs por período (dd/MM/yyyy, inclusivo), situação, condição de pagamento e/ou números."""
+        filtro = _normalizar_filtro(**filtro)
+        for registro in self.registros():
+            if _atende_filtro(registro, **filtro):
+                yield registro
+
+    def filtrar_lote(self, apos=None, limite=500, **filtro):
+        """Um trecho de ``filtrar``: até ``limite`` OSs a partir da posição ``apos`` (None no início).
+
+        Retorna ``(registros, posição do trecho seguinte)``, com a posição None
+        no último trecho; o servidor entrega ``filtrar`` assim, aos pedaços.
+        """
+        inicio = int(apos or 0)
+        registros = list(itertools.islice(self.filtrar(**filtro), inicio, inicio + limite))
+        return registros, (str(inicio + limite) if len(registros) == limite else None)
+
+    def _filtrar_com_consulta(self, consulta=None, **filtro):
+        if not consulta:
+            return self.filtrar(**filtro)
+        filtro = _normalizar_filtro(**filtro)
+        encontrados, _ = self.buscar(consulta, limite=len(self))
+        return (r for r in encontrados if _atende_filtro(r, **filtro))
+
+    def contar(self, consulta=None, **filtro):
+        """Quantas OSs atendem o filtro de ``filtrar`` e, opcionalmente, a busca textual ``consulta``."""
+        return sum(1 for _ in self._filtrar_com_consulta(consulta, **filtro))
+
+    def listar_pagina(self, ordem="Data_OS", decrescente=True, limite=200, deslocamento=0, consulta=None, **filtro):
+        """Uma página da listagem de OSs, ordenada por uma das colunas de ``ORDENACOES``.
+
+        Os registros da listagem não trazem os itens, só as colunas da OS.
+        """
+        registros = sorted(self._filtrar_com_consulta(consulta, **filtro), key=_chave_ordenacao(ordem),
+                           reverse=decrescente)
+        pagina = registros[deslocamento:deslocamento + limite]
+        for registro in pagina:
+            registro.pop(CHAVE_ITENS, None)
+        return pagina
+
+    def _cadastros(self):
+        clientes, veiculos = {}, {}
+        for registro in self.registros():
+            for cadastro, dados in ((clientes, cliente_de(registro)), (veiculos, veiculo_de(registro))):
+                if dados is not None:
+                    cadastro[dados["chave"]] = mesclar_cadastro(cadastro.get(dados["chave"]), dados)
+        return clientes, veiculos
+
+    def clientes(self):
+        """Cadastro de clientes (um por CPF/CNPJ) com os dados mais recentes das OSs."""
+        return list(self._cadastros()[0].values())
+
+    def veiculos(self):
+        """Cadastro de veículos (um por placa), com o CPF/CNPJ do último cliente em ``chave_cliente``."""
+        return list(self._cadastros()[1].values())
+
+    def obter_cliente(self, cpf_cnpj):
+        return self._cadastros()[0].get(chave_cliente(cpf_cnpj))
+
+    def obter_veiculo(self, placa):
+        return self._cadastros()[1].get(chave_veiculo(placa))
+
+    def resumo_faturamento(self, data_inicio=None, data_fim=None):
+        """Número de OSs e soma dos valores (em centavos) por dia, situação, pagamento e responsável.
+
+        Base dos relatórios (ver ``oficina_core.relatorios``); as datas filtram
+        como em ``filtrar``.
+        """
+        return agregar_faturamento(self.filtrar(data_inicio=data_inicio, data_fim=data_fim))
+
+    def resumo_pecas(self, tipo=None, limite=None):
+        """Quantidade, valor (em centavos) e número de OSs por tipo e referência, da mais usada à menos."""
+        linhas = sorted(agregar_pecas(self.registros(), tipo), key=lambda linha: linha["quantidade"], reverse=True)
+        return linhas[:limite] if limite else linhas
+
+    def resumo_situacoes(self):
+        """OSs em cada situação e, onde houver histórico, quantas saíram dela e em quantos segundos no total."""
+        ordens = {}
+        for registro in self.registros():
+            situacao = registro.get("Situacao_Atual") or ""
+            ordens[situacao] = ordens.get(situacao, 0) + 1
+        return [{"situacao": situacao, "ordens": total, "intervalos": 0, "segundos": 0}
+                for situacao, total in sorted(ordens.items())]
+
+    def buscar_por_placa(self, placa):
+        """Lista as OSs de um veículo; a placa é comparada só por letras e dígitos (``chave_veiculo``)."""
+        placa = chave_veiculo(placa)
+        return [r for r in self.registros() if placa and chave_veiculo(r.get("Placa_Veiculo")) == placa]
+
+    def buscar_por_documento(self, cpf_cnpj):
+        """Lista as OSs de um cliente; o CPF/CNPJ é comparado só pelos dígitos (``chave_cliente``)."""
+        cpf_cnpj = chave_cliente(cpf_cnpj)
+        return [r for r in self.registros() if cpf_cnpj and chave_cliente(r.get("CPF_CNPJ_Cliente")) == cpf_cnpj]
+
+    def buscar(self, consulta, limite=50, deslocamento=0):
+        """Busca textual (ver ``oficina_core.busca``), do número mais recente para o mais antigo.
+
+        Retorna ``(registros da página, total de resultados)``. Cada backend usa o
+        próprio índice (``RepositorioOS`` em memória, FTS5 no SQLite ou o servidor).
+        """
+        raise NotImplementedError
+
+    def importar(self, registros):
+        """Grava vários registros de uma vez (usado na migração da planilha)."""
+        total = 0
+        for registro in registros:
+            self.salvar(registro)
+            total += 1
+        return total
+
+    def importar_lote(self, registros, substituir=False):
+        """Grava um lote de OSs importadas; as sem Numero_OS recebem o próximo número da sequência.
+
+        Sem ``substituir``, uma OS cujo número já existe não é gravada. Retorna,
+        para cada registro, o Numero_OS gravado ou None.
+        """
+        numeros = []
+        for registro in registros:
+            numero = str(registro.get("Numero_OS") or "").strip()
+            if not numero:
+                numeros.append(self.criar(registro))
+            elif not substituir and self.obter(numero) is not None:
+                numeros.append(None)
+            else:
+                self.salvar(dict(registro, Numero_OS=numero))
+                numeros.append(numero)
+        return numeros
+
+    def __len__(self):
+        return sum(1 for _ in self.numeros())
+
+    def fechar(self):
+        pass
+
+
+class ArmazenamentoJournal(ArmazenamentoOS):
+    """Journal append-only em JSON Lines.
+
+    Cada operação vira uma linha no fim do arquivo, então salvar ou deletar
+    custa O(1) independente do número de OSs; a linha vai para o disco
+    (fsync) antes de a operação retornar. Ao abrir, o journal é reproduzido
+    para reconstruir o estado atual em memória, num ``RepositorioOS``
+    indexado por número, placa e CPF/CNPJ.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._registros = RepositorioOS()
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self.novo = not os.path.exists(caminho)
+        if not self.novo:
+            self._reproduzir()
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+
+    def _reproduzir(self):
+        tamanho_valido = 0
+        with open(self.caminho, "rb") as f:
+            for num_linha, linha in enumerate(f, 1):
+                if not linha.endswith(b"\n"):
+                    # Última linha sem quebra: a escrita foi interrompida por uma queda
+                    log.error("Linha %d do journal '%s' incompleta, descartada.", num_linha, self.caminho)
+                    break
+                tamanho_valido += len(linha)
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    entrada = json.loads(linha.decode("utf-8"))
+                except ValueError as e:
+                    # Uma linha corrompida não invalida as anteriores
+                    log.error("Linha %d do journal '%s' ignorada: %s", num_linha, self.caminho, e)
+                    continue
+                if entrada.get("op") == "salvar":
+                    registro = entrada["registro"]
+                    self._registros.gravar(registro)
+                    self._avancar_sequencia(registro["Numero_OS"])
+                elif entrada.get("op") == "deletar":
+                    self._registros.remover(entrada["Numero_OS"])
+        if tamanho_valido < os.path.getsize(self.caminho):
+            # Sem cortar o resto, a próxima linha anexada emendaria no pedaço e se perderia também
+            with open(self.caminho, "r+b") as f:
+                f.truncate(tamanho_valido)
+                sincronizar(f)
+
+    def _anexar(self, entradas):
+        for entrada in entradas:
+            self._arquivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        sincronizar(self._arquivo)
+
+    def _avancar_sequencia(self, numero_os):
+        numero = numero_os_para_int(numero_os)
+        if numero is not None and numero > self._sequencia:
+            self._sequencia = numero
+
+    def obter(self, numero_os):
+        with self._lock:
+            registro = self._registros.obter(str(numero_os).strip())
+        return dict(registro) if registro is not None else None
+
+    def _versao(self, numero_os):
+        registro = self._registros.obter(numero_os)
+        return registro.get(CHAVE_VERSAO, 1) if registro is not None else None
+
+    def salvar(self, registro, versao_esperada=None):
+        registro = normalizar_registro(registro)
+        with self._lock:
+            versao = self._versao(registro["Numero_OS"])
+            _verificar_versao(registro["Numero_OS"], versao_esperada, versao)
+            registro[CHAVE_VERSAO] = (versao or 0) + 1
+            self._anexar([{"op": "salvar", "registro": registro}])
+            criado = self._registros.gravar(registro)
+            self._avancar_sequencia(registro["Numero_OS"])
+        return criado
+
+    def proximo_numero_os(self):
+        return formatar_numero_os(self._sequencia + 1)
+
+    def criar(self, registro):
+        with self._lock:
+            registro = normalizar_registro(dict(registro, Numero_OS=formatar_numero_os(self._sequencia + 1)))
+            registro[CHAVE_VERSAO] = 1
+            self._anexar([{"op": "salvar", "registro": registro}])
+            self._registros.gravar(registro)
+            self._avancar_sequencia(registro["Numero_OS"])
+        return registro["Numero_OS"]
+
+    def deletar(self, numero_os, versao_esperada=None):
+        numero_os = str(numero_os).strip()
+        with self._lock:
+            versao = self._versao(numero_os)
+            _verificar_versao(numero_os, versao_esperada, versao)
+            if versao is None:
+                return False
+            self._anexar([{"op": "deletar", "Numero_OS": numero_os}])
+            self._registros.remover(numero_os)
+        return True
+
+    def registros(self):
+        with self._lock:
+            copia = list(self._registros)
+        for registro in copia:
+            yield dict(registro)
+
+    def numeros(self):
+        with self._lock:
+            return iter(self._registros.numeros())
+
+    def importar(self, registros):
+        normalizados = [normalizar_registro(r) for r in registros]
+        with self._lock:
+            for registro in normalizados:
+                registro[CHAVE_VERSAO] = (self._versao(registro["Numero_OS"]) or 0) + 1
+            self._anexar({"op": "salvar", "registro": r} for r in normalizados)
+            for registro in normalizados:
+                self._registros.gravar(registro)
+                self._avancar_sequencia(registro["Numero_OS"])
+        return len(normalizados)
+
+    def buscar_por_placa(self, placa):
+        with self._lock:
+            return [dict(r) for r in self._registros.por_placa(placa)]
+
+    def buscar_por_documento(self, cpf_cnpj):
+        with self._lock:
+            return [dict(r) for r in self._registros.por_documento(cpf_cnpj)]
+
+    def buscar(self, consulta, limite=50, deslocamento=0):
+        with self._lock:
+            numeros = self._registros.buscar(consulta)
+            pagina = [dict(self._registros.obter(n)) for n in numeros[deslocamento:deslocamento + limite]]
+        return pagina, len(numeros)
+
+    def __len__(self):
+        return len(self._registros)
+
+    def fechar(self):
+        with self._lock:
+            if not self._arquivo.closed:
+                self._arquivo.close()
+
+
+class ArmazenamentoSQLite(ArmazenamentoOS):
+    """Banco SQLite com índices B-tree nas colunas de busca.
+
+    Nada fica carregado em memória: cada operação consulta o banco pelo índice
+    adequado, então buscar uma OS custa o mesmo com 100 ou 100 mil registros.
+    Cada thread usa sua própria conexão.
+
+    Vários terminais podem usar o mesmo arquivo (numa pasta compartilhada): as
+    gravações são serializadas pela trava de escrita do SQLite, cada OS tem um
+    número de versão para detectar alterações concorrentes (ver ``salvar``) e a
+    tabela ``alteracoes_os`` permite a cada terminal buscar só o que mudou.
+
+    Cada gravação só retorna depois de confirmada em disco. Num disco local o
+    banco usa o write-ahead log (WAL) do SQLite: o commit grava apenas as
+    páginas alteradas no ``-wal``, que é reaplicado automaticamente ao abrir
+    se o programa cair antes de o conteúdo voltar ao arquivo principal. Numa
+    pasta de rede o WAL não funciona (exige memória compartilhada entre os
+    processos), e o banco usa o journal de reversão tradicional.
+    """
+
+    TABELA = "ordens_servico"
+    TABELA_ITENS = "itens_os"
+    TABELA_BUSCA = "busca_os"
+    TABELA_CLIENTES = "clientes"
+    TABELA_VEICULOS = "veiculos"
+    TABELA_ALTERACOES = "alteracoes_os"
+    TABELA_RESUMO_FATURAMENTO = "resumo_faturamento"
+    TABELA_RESUMO_PECAS = "resumo_pecas"
+    TABELA_RESUMO_SITUACOES = "resumo_situacoes"
+    TABELA_HISTORICO_SITUACAO = "historico_situacao"
+    # Colunas calculadas a partir do registro e gravadas junto com as de COLUNAS_OS
+    COLUNAS_DERIVADAS = ("Data_ISO", "chave_cliente", "chave_veiculo")
+    CHAVE_SEQUENCIA = "seq_numero_os"
+
+    # Alterações de esquema aplicadas em ordem; PRAGMA user_version guarda quantas já rodaram
+    MIGRACOES = (
+        "_migracao_tabela_itens",
+        "_migracao_sequencia_numero_os",
+        "_migracao_busca_texto",
+        "_migracao_indices_listagem",
+        "_migracao_cadastros",
+        "_migracao_versoes",
+        "_migracao_resumos",
+    )
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.novo = not os.path.exists(caminho)
+        self._local = threading.local()
+        self._conexoes = []
+        self._lock_conexoes = threading.Lock()
+        self._criar_esquema()
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: as transações são abertas explicitamente em _transacao();
+            # timeout: com outro terminal gravando, espera a trava ser liberada em vez de falhar
+            conn = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # FULL: o commit espera o fsync do journal, então uma OS salva sobrevive a uma queda de energia
+            conn.execute("PRAGMA synchronous = FULL")
+            self._local.conn = conn
+            with self._lock_conexoes:
+                self._conexoes.append(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def _transacao(self):
+        # IMMEDIATE reserva a escrita já no início: outro terminal que tente gravar ao mesmo
+        # tempo espera em vez de ler a mesma sequência e falhar ao promover a trava
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def _criar_esquema(self):
+        colunas_sql = []
+        for col in COLUNAS_OS:
+            if col == "Numero_OS":
+                colunas_sql.append("Numero_OS TEXT PRIMARY KEY")
+            elif col == "Placa_Veiculo":
+                colunas_sql.append("Placa_Veiculo TEXT COLLATE NOCASE")
+            else:
+                colunas_sql.append(f"{col} {TIPOS_SQL.get(col, 'TEXT')}")
+        # Data_OS é gravada como dd/MM/yyyy, que não ordena; o índice de data usa a forma ISO
+        colunas_sql.append("Data_ISO TEXT")
+        self._definir_modo_journal()
+        with self._transacao() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.TABELA} ({', '.join(colunas_sql)})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_os_placa ON {self.TABELA} (Placa_Veiculo)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_os_cpf_cnpj ON {self.TABELA} (CPF_CNPJ_Cliente)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_os_data ON {self.TABELA} (Data_ISO)")
+
+        versao = self._conexao().execute("PRAGMA user_version").fetchone()[0]
+        for numero, nome in enumerate(self.MIGRACOES, 1):
+            if numero > versao:
+                with self._transacao() as conn:
+                    getattr(self, nome)(conn)
+                    conn.execute(f"PRAGMA user_version = {numero}")
+                if not self.novo:
+                    log.info("Esquema de %s atualizado para a versão %d (%s).", self.caminho, numero, nome)
+        sql_busca = self._conexao().execute("SELECT sql FROM sqlite_master WHERE name = ?",
+                                            (self.TABELA_BUSCA,)).fetchone()[0]
+        self._fts = "fts5" in sql_busca.lower()
+
+    def _definir_modo_journal(self):
+        modo = "DELETE" if em_pasta_de_rede(self.caminho) else "WAL"
+        try:
+            self._conexao().execute(f"PRAGMA journal_mode = {modo}")
+        except sqlite3.OperationalError as e:
+            # Outro terminal está com o banco aberto; o modo é persistente e fica o que já estava
+            log.warning("Modo de journal de %s mantido: %s", self.caminho, e)
+
+    def _migracao_tabela_itens(self, conn):
+        # Itens deixam de ser texto em Detalhes_Itens e passam para uma tabela filha tipada,
+        # agrupada fisicamente por OS (WITHOUT ROWID) para a leitura de uma OS ser sequencial
+        conn.execute(f"""
+            CREATE TABLE {self.TABELA_ITENS} (
+                Numero_OS TEXT NOT NULL,
+                posicao INTEGER NOT NULL,
+                tipo TEXT,
+                referencia TEXT,
+                descricao TEXT,
+                uni TEXT,
+                valor REAL,
+                quantia INTEGER,
+                "desc" REAL,
+                valor_total REAL,
+                PRIMARY KEY (Numero_OS, posicao)
+            ) WITHOUT ROWID""")
+        conn.execute(f"CREATE INDEX idx_itens_referencia ON {self.TABELA_ITENS} (referencia)")
+        linhas = conn.execute(f"SELECT Numero_OS, Detalhes_Itens FROM {self.TABELA} "
+                              f"WHERE Detalhes_Itens IS NOT NULL AND Detalhes_Itens != ''").fetchall()
+        for numero_os, detalhes in linhas:
+            self._gravar_itens(conn, numero_os, [normalizar_item(i) for i in parse_detalhes_itens(detalhes)])
+        conn.execute(f"UPDATE {self.TABELA} SET Detalhes_Itens = NULL")
+
+    def _migracao_sequencia_numero_os(self, conn):
+        # A varredura de todos os números acontece só aqui; depois a sequência é mantida a cada gravação
+        conn.execute("CREATE TABLE metadados (chave TEXT PRIMARY KEY, valor)")
+        numeros = (numero_os_para_int(n) for (n,) in conn.execute(f"SELECT Numero_OS FROM {self.TABELA}"))
+        maior = max([n for n in numeros if n is not None], default=0)
+        conn.execute("INSERT INTO metadados (chave, valor) VALUES (?, ?)", (self.CHAVE_SEQUENCIA, maior))
+
+    def _migracao_busca_texto(self, conn):
+        # Índice de texto completo (FTS5); sem FTS5 no SQLite, uma tabela comum consultada com LIKE
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE {self.TABELA_BUSCA} USING fts5("
+                         f"Numero_OS, texto, tokenize = 'unicode61 remove_diacritics 2')")
+            conn.execute(f"CREATE VIRTUAL TABLE {self.TABELA_BUSCA}_vocab USING fts5vocab({self.TABELA_BUSCA}, 'col')")
+            self._fts = True
+        except sqlite3.OperationalError:
+            conn.execute(f"CREATE TABLE {self.TABELA_BUSCA} (Numero_OS TEXT PRIMARY KEY, texto TEXT)")
+            self._fts = False
+        for registro in self._consultar(f"SELECT * FROM {self.TABELA}"):
+            self._indexar_busca(conn, registro, existente=False)
+
+    def _migracao_indices_listagem(self, conn):
+        # Índices das colunas ordenáveis na listagem: com o rowid como desempate, a página é lida
+        # direto do índice, sem ordenar a tabela
+        conn.execute(f"CREATE INDEX idx_os_cliente ON {self.TABELA} (Nome_Cliente COLLATE NOCASE)")
+        conn.execute(f"CREATE INDEX idx_os_valor ON {self.TABELA} (Valor_Total_Final)")
+        conn.execute(f"CREATE INDEX idx_os_situacao ON {self.TABELA} (Situacao_Atual, Data_ISO)")
+
+    def _migracao_cadastros(self, conn):
+        # Cadastros para o autocompletar do formulário e as buscas por cliente/veículo, pela chave
+        # (CPF/CNPJ e placa normalizados). A OS continua com as próprias colunas de cliente e veículo,
+        # retrato do que foi atendido na data do serviço: os cadastros somam espaço, não economizam.
+        colunas_cliente = ", ".join(f"{col} {TIPOS_SQL.get(col, 'TEXT')}" for col in CAMPOS_CLIENTE)
+        colunas_veiculo = ", ".join(f"{col} {TIPOS_SQL.get(col, 'TEXT')}" for col in CAMPOS_VEICULO)
+        conn.execute(f"CREATE TABLE {self.TABELA_CLIENTES} (chave TEXT PRIMARY KEY, {colunas_cliente})")
+        conn.execute(f"CREATE TABLE {self.TABELA_VEICULOS} (chave TEXT PRIMARY KEY, {colunas_veiculo}, "
+                     f"chave_cliente TEXT)")
+        conn.execute(f"ALTER TABLE {self.TABELA} ADD COLUMN chave_cliente TEXT")
+        conn.execute(f"ALTER TABLE {self.TABELA} ADD COLUMN chave_veiculo TEXT")
+        conn.execute(f"CREATE INDEX idx_os_chave_cliente ON {self.TABELA} (chave_cliente)")
+        conn.execute(f"CREATE INDEX idx_os_chave_veiculo ON {self.TABELA} (chave_veiculo)")
+        # Em ordem cronológica, para o cadastro ficar com os dados mais recentes
+        clientes, veiculos, chaves = {}, {}, []
+        cur = conn.execute(f"SELECT rowid, {', '.join(CAMPOS_CLIENTE + CAMPOS_VEICULO)} FROM {self.TABELA} "
+                           f"ORDER BY Data_ISO, rowid")
+        for row in cur:
+            row = dict(row)
+            for cadastro, dados in ((clientes, cliente_de(row)), (veiculos, veiculo_de(row))):
+                if dados is not None:
+                    cadastro[dados["chave"]] = mesclar_cadastro(cadastro.get(dados["chave"]), dados)
+            chaves.append((chave_cliente(row["CPF_CNPJ_Cliente"]) or None,
+                           chave_veiculo(row["Placa_Veiculo"]) or None, row["rowid"]))
+        conn.executemany(f"UPDATE {self.TABELA} SET chave_cliente = ?, chave_veiculo = ? WHERE rowid = ?", chaves)
+        for tabela, cadastro in ((self.TABELA_CLIENTES, clientes), (self.TABELA_VEICULOS, veiculos)):
+            for dados in cadastro.values():
+                colunas = list(dados)
+                conn.execute(f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+                             [dados[col] for col in colunas])
+
+    def _migracao_versoes(self, conn):
+        # Versão por OS (concorrência otimista) e registro das alterações, do qual cada terminal lê só
+        # o que mudou desde a última leitura. Cada OS tem no máximo uma linha: a da última alteração.
+        conn.execute(f"ALTER TABLE {self.TABELA} ADD COLUMN {CHAVE_VERSAO} INTEGER NOT NULL DEFAULT 1")
+        conn.execute(f"CREATE TABLE {self.TABELA_ALTERACOES} ("
+                     f"revisao INTEGER PRIMARY KEY AUTOINCREMENT, Numero_OS TEXT NOT NULL UNIQUE)")
+
+    def _migracao_resumos(self, conn):
+        # Resumos dos relatórios (ver oficina_core.relatorios), mantidos a cada gravação para os relatórios
+        # não varrerem o histórico. A varredura de todas as OSs acontece só aqui.
+        conn.execute(f"CREATE TABLE {self.TABELA_RESUMO_FATURAMENTO} ("
+                     f"dia TEXT NOT NULL, situacao TEXT NOT NULL, condicoes_pagamento TEXT NOT NULL, "
+                     f"responsavel TEXT NOT NULL, ordens INTEGER NOT NULL, centavos INTEGER NOT NULL, "
+                     f"PRIMARY KEY (dia, situacao, condicoes_pagamento, responsavel)) WITHOUT ROWID")
+        conn.execute(f"CREATE TABLE {self.TABELA_RESUMO_PECAS} ("
+                     f"tipo TEXT NOT NULL, referencia TEXT NOT NULL, ordens INTEGER NOT NULL, "
+                     f"quantidade INTEGER NOT NULL, centavos INTEGER NOT NULL, "
+                     f"PRIMARY KEY (tipo, referencia)) WITHOUT ROWID")
+        conn.execute(f"CREATE TABLE {self.TABELA_RESUMO_SITUACOES} ("
+                     f"situacao TEXT PRIMARY KEY, intervalos INTEGER NOT NULL, segundos INTEGER NOT NULL)")
+        # Períodos de cada OS em cada situação; fim NULL é a situação atual
+        conn.execute(f"CREATE TABLE {self.TABELA_HISTORICO_SITUACAO} ("
+                     f"Numero_OS TEXT NOT NULL, situacao TEXT NOT NULL, inicio INTEGER NOT NULL, fim INTEGER)")
+        conn.execute(f"CREATE INDEX idx_historico_os ON {self.TABELA_HISTORICO_SITUACAO} (Numero_OS, fim)")
+
+        conn.execute(f"INSERT INTO {self.TABELA_RESUMO_FATURAMENTO} "
+                     f"({', '.join(CHAVES_FATURAMENTO + MEDIDAS_FATURAMENTO)}) "
+                     + _SQL_FATURAMENTO.format(tabela=self.TABELA, onde=""))
+        conn.execute(f"INSERT INTO {self.TABELA_RESUMO_PECAS} ({', '.join(CHAVES_PECAS + MEDIDAS_PECAS)}) "
+                     f"SELECT tipo, referencia, SUM(ordens), SUM(quantidade), SUM(centavos) "
+                     f"FROM ({_SQL_PECAS_POR_OS.format(tabela=self.TABELA_ITENS, onde='')}) GROUP BY 1, 2")
+        # Não se sabe desde quando as OSs existentes estão na situação atual: o histórico começa agora
+        conn.execute(f"INSERT INTO {self.TABELA_HISTORICO_SITUACAO} (Numero_OS, situacao, inicio) "
+                     f"SELECT Numero_OS, COALESCE(Situacao_Atual, ''), ? FROM {self.TABELA}", (int(time.time()),))
+
+    def _registrar_alteracao(self, conn, numero_os):
+        # AUTOINCREMENT: a revisão nunca é reutilizada, mesmo quando a linha anterior da OS é apagada
+        conn.execute(f"DELETE FROM {self.TABELA_ALTERACOES} WHERE Numero_OS = ?", (numero_os,))
+        conn.execute(f"INSERT INTO {self.TABELA_ALTERACOES} (Numero_OS) VALUES (?)", (numero_os,))
+
+    def _gravar_cadastro(self, conn, tabela, dados):
+        row = conn.execute(f"SELECT * FROM {tabela} WHERE chave = ?", (dados["chave"],)).fetchone()
+        dados = mesclar_cadastro({k: row[k] for k in row.keys()} if row is not None else None, dados)
+        colunas = list(dados)
+        conn.execute(f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) "
+                     f"VALUES ({', '.join('?' * len(colunas))})", [dados[col] for col in colunas])
+
+    def _gravar_cadastros(self, conn, registro):
+        cliente, veiculo = cliente_de(registro), veiculo_de(registro)
+        if cliente is not None:
+            self._gravar_cadastro(conn, self.TABELA_CLIENTES, cliente)
+        if veiculo is not None:
+            self._gravar_cadastro(conn, self.TABELA_VEICULOS, veiculo)
+
+    def _somar_resumo(self, conn, tabela, chaves, medidas, linha, sinal):
+        """Soma (sinal 1) ou subtrai (sinal -1) as ``medidas`` de ``linha`` na linha do resumo com a mesma chave."""
+        chave = [linha[col] for col in chaves]
+        onde = " AND ".join(f"{col} = ?" for col in chaves)
+        conn.execute(f"INSERT OR IGNORE INTO {tabela} ({', '.join(chaves + medidas)}) "
+                     f"VALUES ({', '.join('?' * len(chaves + medidas))})", chave + [0] * len(medidas))
+        conn.execute(f"UPDATE {tabela} SET {', '.join(f'{col} = {col} + ?' for col in medidas)} WHERE {onde}",
+                     [sinal * linha[col] for col in medidas] + chave)
+        if sinal < 0:
+            conn.execute(f"DELETE FROM {tabela} WHERE {onde} AND {medidas[0]} <= 0", chave)
+
+    def _somar_resumos(self, conn, numero_os, sinal):
+        """Soma ou subtrai dos resumos de faturamento e de peças a OS como está gravada agora."""
+        for linha in conn.execute(_SQL_FATURAMENTO.format(tabela=self.TABELA, onde="WHERE Numero_OS = ?"),
+                                  (numero_os,)).fetchall():
+            self._somar_resumo(conn, self.TABELA_RESUMO_FATURAMENTO, CHAVES_FATURAMENTO, MEDIDAS_FATURAMENTO,
+                               linha, sinal)
+        for linha in conn.execute(_SQL_PECAS_POR_OS.format(tabela=self.TABELA_ITENS, onde="WHERE Numero_OS = ?"),
+                                  (numero_os,)).fetchall():
+            self._somar_resumo(conn, self.TABELA_RESUMO_PECAS, CHAVES_PECAS, MEDIDAS_PECAS, linha, sinal)
+
+    def _registrar_situacao(self, conn, numero_os, situacao):
+        """Fecha o período da situação anterior (somando-o ao resumo) se a OS mudou de situação."""
+        situacao = situacao if isinstance(situacao, str) else ""
+        agora = int(time.time())
+        aberto = conn.execute(f"SELECT rowid, situacao, inicio FROM {self.TABELA_HISTORICO_SITUACAO} "
+                              f"WHERE Numero_OS = ? AND fim IS NULL", (numero_os,)).fetchone()
+        if aberto is not None:
+            if aberto["situacao"] == situacao:
+                return
+            # Relógios de terminais diferentes podem discordar: um período nunca tem duração negativa
+            fim = max(agora, aberto["inicio"])
+            conn.execute(f"UPDATE {self.TABELA_HISTORICO_SITUACAO} SET fim = ? WHERE rowid = ?",
+                         (fim, aberto["rowid"]))
+            self._somar_resumo(conn, self.TABELA_RESUMO_SITUACOES, ("situacao",), MEDIDAS_SITUACOES,
+                               {"situacao": aberto["situacao"], "intervalos": 1, "segundos": fim - aberto["inicio"]}, 1)
+        conn.execute(f"INSERT INTO {self.TABELA_HISTORICO_SITUACAO} (Numero_OS, situacao, inicio) VALUES (?, ?, ?)",
+                     (numero_os, situacao, agora))
+
+    def _descartar_situacao_aberta(self, conn, numero_os):
+        """Descarta o período em aberto da OS apagada; os já fechados continuam no histórico e no resumo."""
+        conn.execute(f"DELETE FROM {self.TABELA_HISTORICO_SITUACAO} WHERE Numero_OS = ? AND fim IS NULL",
+                     (numero_os,))
+
+    def _remover_busca(self, conn, numero_os):
+        if self._fts:
+            # A coluna Numero_OS é indexada justamente para esta remoção não varrer a tabela
+            conn.execute(f"DELETE FROM {self.TABELA_BUSCA} WHERE {self.TABELA_BUSCA} MATCH ? AND Numero_OS = ?",
+                         ('Numero_OS : "{}"'.format(numero_os.replace('"', '""')), numero_os))
+        else:
+            conn.execute(f"DELETE FROM {self.TABELA_BUSCA} WHERE Numero_OS = ?", (numero_os,))
+
+    def _indexar_busca(self, conn, registro, existente=True):
+        if existente:
+            self._remover_busca(conn, registro["Numero_OS"])
+        conn.execute(f"INSERT INTO {self.TABELA_BUSCA} (Numero_OS, texto) VALUES (?, ?)",
+                     (registro["Numero_OS"], texto_busca(registro)))
+
+    def _ler_sequencia(self, conn):
+        return conn.execute("SELECT valor FROM metadados WHERE chave = ?", (self.CHAVE_SEQUENCIA,)).fetchone()[0]
+
+    def _para_registro(self, row, itens):
+        registro = {col: row[col] for col in COLUNAS_OS}
+        registro[CHAVE_ITENS] = itens
+        try:
+            registro[CHAVE_VERSAO] = row[CHAVE_VERSAO]
+        except IndexError:
+            registro[CHAVE_VERSAO] = 1  # Lido durante uma migração anterior à coluna de versão
+        return registro
+
+    @staticmethod
+    def _valores(registro):
+        """Valores de COLUNAS_OS seguidos dos de COLUNAS_DERIVADAS."""
+        return [registro[col] for col in COLUNAS_OS] + [
+            data_iso(registro["Data_OS"]),
+            chave_cliente(registro["CPF_CNPJ_Cliente"]) or None,
+            chave_veiculo(registro["Placa_Veiculo"]) or None,
+        ]
+
+    def _gravar_itens(self, conn, numero_os, itens):
+        conn.execute(f"DELETE FROM {self.TABELA_ITENS} WHERE Numero_OS = ?", (numero_os,))
+        conn.executemany(
+            f'INSERT INTO {self.TABELA_ITENS} (Numero_OS, posicao, {", ".join(_COLUNAS_ITEM_SQL)}) '
+            f'VALUES (?, ?, {", ".join("?" * len(CAMPOS_ITEM))})',
+            [[numero_os, posicao] + [item[campo] for campo in CAMPOS_ITEM] for posicao, item in enumerate(itens)])
+
+    def _ler_versao(self, conn, numero_os):
+        row = conn.execute(f"SELECT {CHAVE_VERSAO} FROM {self.TABELA} WHERE Numero_OS = ?", (numero_os,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _gravar(self, conn, registro, versao_esperada=None):
+        versao = self._ler_versao(conn, registro["Numero_OS"])
+        _verificar_versao(registro["Numero_OS"], versao_esperada, versao)
+        existe = versao is not None
+        valores = self._valores(registro)
+        if existe:
+            self._somar_resumos(conn, registro["Numero_OS"], -1)
+            atribuicoes = ", ".join(f"{col} = ?" for col in COLUNAS_OS[1:] + self.COLUNAS_DERIVADAS)
+            conn.execute(f"UPDATE {self.TABELA} SET {atribuicoes}, {CHAVE_VERSAO} = {CHAVE_VERSAO} + 1 "
+                         f"WHERE Numero_OS = ?", valores[1:] + [registro["Numero_OS"]])
+        else:
+            marcadores = ", ".join("?" * len(valores))
+            conn.execute(f"INSERT INTO {self.TABELA} ({', '.join(COLUNAS_OS + self.COLUNAS_DERIVADAS)}) "
+                         f"VALUES ({marcadores})", valores)
+            numero = numero_os_para_int(registro["Numero_OS"])
+            if numero is not None:
+                # OSs gravadas com número explícito (migração, importação) avançam a sequência
+                conn.execute("UPDATE metadados SET valor = ? WHERE chave = ? AND valor < ?",
+                             (numero, self.CHAVE_SEQUENCIA, numero))
+        self._gravar_itens(conn, registro["Numero_OS"], registro[CHAVE_ITENS])
+        self._somar_resumos(conn, registro["Numero_OS"], 1)
+        self._registrar_situacao(conn, registro["Numero_OS"], registro["Situacao_Atual"])
+        self._gravar_cadastros(conn, registro)
+        self._indexar_busca(conn, registro, existe)
+        self._registrar_alteracao(conn, registro["Numero_OS"])
+        return not existe
+
+    def _itens_de(self, conn, numeros):
+        """Carrega os itens de várias OSs numa consulta só: {Numero_OS: [itens]}."""
+        itens = {numero: [] for numero in numeros}
+        if not numeros:
+            return itens
+        cur = conn.execute(
+            f'SELECT Numero_OS, {", ".join(_COLUNAS_ITEM_SQL)} FROM {self.TABELA_ITENS} '
+            f'WHERE Numero_OS IN ({", ".join("?" * len(numeros))}) ORDER BY Numero_OS, posicao',
+            list(numeros))
+        for row in cur:
+            itens[row["Numero_OS"]].append({campo: row[campo] for campo in CAMPOS_ITEM})
+        return itens
+
+    @medido("sqlite.obter")
+    def obter(self, numero_os):
+        numero_os = str(numero_os).strip()
+        conn = self._conexao()
+        row = conn.execute(f"SELECT * FROM {self.TABELA} WHERE Numero_OS = ?", (numero_os,)).fetchone()
+        if row is None:
+            return None
+        return self._para_registro(row, self._itens_de(conn, [numero_os])[numero_os])
+
+    @medido("sqlite.salvar")
+    def salvar(self, registro, versao_esperada=None):
+        registro = normalizar_registro(registro)
+        # A versão é conferida e incrementada dentro da transação IMMEDIATE: nenhum outro terminal
+        # consegue gravar entre a verificação e a gravação
+        with self._transacao() as conn:
+            return self._gravar(conn, registro, versao_esperada)
+
+    def proximo_numero_os(self):
+        return formatar_numero_os(self._ler_sequencia(self._conexao()) + 1)
+
+    @medido("sqlite.criar")
+    def criar(self, registro):
+        registro = normalizar_registro(registro)
+        with self._transacao() as conn:
+            # Ler e gravar a sequência na mesma transação IMMEDIATE impede números repetidos entre terminais
+            registro["Numero_OS"] = self._proximo_numero_livre(conn)
+            self._gravar(conn, registro)
+        return registro["Numero_OS"]
+
+    def _proximo_numero_livre(self, conn):
+        numero = self._ler_sequencia(conn) + 1
+        while conn.execute(f"SELECT 1 FROM {self.TABELA} WHERE Numero_OS = ?",
+                           (formatar_numero_os(numero),)).fetchone() is not None:
+            numero += 1
+        return formatar_numero_os(numero)
+
+    @medido("sqlite.deletar")
+    def deletar(self, numero_os, versao_esperada=None):
+        numero_os = str(numero_os).strip()
+        with self._transacao() as conn:
+            versao = self._ler_versao(conn, numero_os)
+            _verificar_versao(numero_os, versao_esperada, versao)
+            if versao is None:
+                return False
+            self._somar_resumos(conn, numero_os, -1)
+            self._descartar_situacao_aberta(conn, numero_os)
+            conn.execute(f"DELETE FROM {self.TABELA} WHERE Numero_OS = ?", (numero_os,))
+            conn.execute(f"DELETE FROM {self.TABELA_ITENS} WHERE Numero_OS = ?", (numero_os,))
+            self._remover_busca(conn, numero_os)
+            self._registrar_alteracao(conn, numero_os)
+        return True
+
+    def revisao_atual(self):
+        sql = f"SELECT COALESCE(MAX(revisao), 0) FROM {self.TABELA_ALTERACOES}"
+        return self._conexao().execute(sql).fetchone()[0]
+
+    def alteracoes_desde(self, revisao):
+        conn = self._conexao()
+        alteradas = conn.execute(f"SELECT revisao, Numero_OS FROM {self.TABELA_ALTERACOES} WHERE revisao > ? "
+                                 f"ORDER BY revisao", (revisao,)).fetchall()
+        if not alteradas:
+            return revisao, [], []
+        numeros = [numero for _, numero in alteradas]
+        # Uma OS gravada de novo depois da consulta acima chega já na versão mais nova; a próxima
+        # chamada a traz outra vez, o que é inofensivo
+        registros = []
+        for inicio in range(0, len(numeros), 500):
+            lote = numeros[inicio:inicio + 500]
+            registros.extend(self._consultar(
+                f"SELECT * FROM {self.TABELA} WHERE Numero_OS IN ({', '.join('?' * len(lote))})", lote))
+        existentes = {r["Numero_OS"] for r in registros}
+        return alteradas[-1][0], registros, [n for n in numeros if n not in existentes]
+
+    def _consultar(self, sql, parametros=()):
+        conn = self._conexao()
+        cur = conn.execute(sql, parametros)
+        while True:
+            linhas = cur.fetchmany(500)
+            if not linhas:
+                break
+            itens = self._itens_de(conn, [row["Numero_OS"] for row in linhas])
+            for row in linhas:
+                yield self._para_registro(row, itens[row["Numero_OS"]])
+
+    def registros(self):
+        return self._consultar(f"SELECT * FROM {self.TABELA} ORDER BY rowid")
+
+    def numeros(self):
+        cur = self._conexao().execute(f"SELECT Numero_OS FROM {self.TABELA} ORDER BY rowid")
+        for (numero,) in cur:
+            yield numero
+
+    def _where_filtro(self, consulta=None, **filtro):
+        """Cláusula WHERE (ou "") e parâmetros do filtro; None se a consulta textual não pode casar."""
+        filtro = _normalizar_filtro(**filtro)
+        condicoes, parametros = [], []
+        if filtro["data_inicio"]:
+            condicoes.append("Data_ISO >= ?")
+            parametros.append(filtro["data_inicio"])
+        if filtro["data_fim"]:
+            condicoes.append("Data_ISO <= ?")
+            parametros.append(filtro["data_fim"])
+        if filtro["situacao"]:
+            condicoes.append("Situacao_Atual = ?")
+            parametros.append(filtro["situacao"])
+        if filtro["condicoes_pagamento"]:
+            condicoes.append("Condicoes_Pagamento = ?")
+            parametros.append(filtro["condicoes_pagamento"])
+        if filtro["numeros"] is not None:
+            condicoes.append(f"Numero_OS IN ({', '.join('?' * len(filtro['numeros']))})")
+            parametros.extend(filtro["numeros"])
+        if consulta:
+            condicao = self._condicao_busca(consulta, aproximada=False)
+            if condicao is None:
+                return None
+            condicoes.append(f"Numero_OS IN (SELECT b.Numero_OS FROM {self.TABELA_BUSCA} AS b WHERE {condicao[0]})")
+            parametros.extend(condicao[1])
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return where, parametros
+
+    def filtrar(self, **filtro):
+        where, parametros = self._where_filtro(**filtro)
+        return self._consultar(f"SELECT * FROM {self.TABELA}{where} ORDER BY Data_ISO, Numero_OS", parametros)
+
+    def filtrar_lote(self, apos=None, limite=500, **filtro):
+        # A posição é a chave (Data_ISO, Numero_OS) da última OS entregue: cada trecho começa pelo índice,
+        # sem o OFFSET que percorreria de novo todas as OSs dos trechos anteriores
+        where, parametros = self._where_filtro(**filtro)
+        if apos:
+            data, numero = json.loads(apos)
+            if data is None:  # Data_ISO nula vem antes de todas as datas
+                condicao, extras = "(Data_ISO IS NOT NULL OR Numero_OS > ?)", [numero]
+            else:
+                condicao, extras = "(Data_ISO > ? OR (Data_ISO = ? AND Numero_OS > ?))", [data, data, numero]
+            where = f"{where} AND {condicao}" if where else f" WHERE {condicao}"
+            parametros = parametros + extras
+        registros = list(self._consultar(f"SELECT * FROM {self.TABELA}{where} ORDER BY Data_ISO, Numero_OS LIMIT ?",
+                                         parametros + [int(limite)]))
+        if len(registros) < limite:
+            return registros, None
+        ultimo = registros[-1]
+        return registros, json.dumps([data_iso(ultimo["Data_OS"]), ultimo["Numero_OS"]])
+
+    def contar(self, consulta=None, **filtro):
+        where_parametros = self._where_filtro(consulta, **filtro)
+        if where_parametros is None:
+            return 0
+        where, parametros = where_parametros
+        return self._conexao().execute(f"SELECT COUNT(*) FROM {self.TABELA}{where}", parametros).fetchone()[0]
+
+    @medido("sqlite.listar_pagina")
+    def listar_pagina(self, ordem="Data_OS", decrescente=True, limite=200, deslocamento=0, consulta=None, **filtro):
+        if ordem not in ORDENACOES:
+            raise ValueError(f"Ordenação não suportada: {ordem}")
+        where_parametros = self._where_filtro(consulta, **filtro)
+        if where_parametros is None:
+            return []
+        where, parametros = where_parametros
+        direcao = "DESC" if decrescente else "ASC"
+        ordenacao = ", ".join(f"{expressao} {direcao}" for expressao in ORDENACOES[ordem] + ("rowid",))
+        conn = self._conexao()
+        # O OFFSET percorre só o índice (rowids); as linhas completas são lidas apenas para a página
+        rowids = [rowid for (rowid,) in conn.execute(
+            f"SELECT rowid FROM {self.TABELA}{where} ORDER BY {ordenacao} LIMIT ? OFFSET ?",
+            parametros + [int(limite), int(deslocamento)])]
+        if not rowids:
+            return []
+        linhas = {row["rowid"]: row for row in conn.execute(
+            f"SELECT rowid, * FROM {self.TABELA} WHERE rowid IN ({', '.join('?' * len(rowids))})", rowids)}
+        return [{col: linhas[rowid][col] for col in COLUNAS_OS} for rowid in rowids if rowid in linhas]
+
+    def buscar_por_placa(self, placa):
+        # Mesma chave do cadastro de veículos, gravada e indexada em chave_veiculo
+        return list(self._consultar(f"SELECT * FROM {self.TABELA} WHERE chave_veiculo = ? ORDER BY Data_ISO",
+                                    (chave_veiculo(placa),)))
+
+    def buscar_por_documento(self, cpf_cnpj):
+        return list(self._consultar(f"SELECT * FROM {self.TABELA} WHERE chave_cliente = ? ORDER BY Data_ISO",
+                                    (chave_cliente(cpf_cnpj),)))
+
+    def _vocabulario(self, inicial):
+        cur = self._conexao().execute(
+            f"SELECT term FROM {self.TABELA_BUSCA}_vocab WHERE col = 'texto' AND term >= ? AND term < ?",
+            (inicial, chr(ord(inicial) + 1)))
+        return [termo for (termo,) in cur]
+
+    def _existe_termo(self, prefixo):
+        return self._conexao().execute(
+            f"SELECT 1 FROM {self.TABELA_BUSCA}_vocab WHERE col = 'texto' AND term >= ? AND term < ? LIMIT 1",
+            (prefixo, prefixo + "\uffff")).fetchone() is not None
+
+    def _condicao_busca(self, consulta, aproximada):
+        """WHERE sobre a tabela de busca (alias b) e seus parâmetros, ou None se nada pode casar."""
+        alternativas = alternativas_consulta(consulta)
+        if not alternativas:
+            return None
+        if not self._fts:
+            # Os termos já estão normalizados na tabela; LIKE casa em qualquer posição
+            grupos = ["(" + " AND ".join("b.texto LIKE ?" for _ in lista) + ")" for lista in alternativas]
+            return " OR ".join(grupos), [f"%{t}%" for lista in alternativas for t in lista]
+        grupos = []
+        for lista in alternativas:
+            partes = []
+            for termo in lista:
+                if not aproximada or self._existe_termo(termo):
+                    partes.append(f'"{termo}"*')
+                    continue
+                parecidos = termos_parecidos(termo, self._vocabulario(termo[0]))
+                if not parecidos:
+                    break
+                partes.append("(" + " OR ".join(f'"{p}"' for p in parecidos) + ")")
+            else:
+                grupos.append("(" + " AND ".join(partes) + ")")
+        if not grupos:
+            return None
+        return f"{self.TABELA_BUSCA} MATCH ?", [f"texto : ({' OR '.join(grupos)})"]
+
+    @medido("sqlite.buscar")
+    def buscar(self, consulta, limite=50, deslocamento=0):
+        total, condicao = 0, None
+        for aproximada in (False, True):
+            condicao = self._condicao_busca(consulta, aproximada)
+            if condicao is None:
+                continue
+            where, parametros = condicao
+            total = self._conexao().execute(
+                f"SELECT COUNT(*) FROM {self.TABELA_BUSCA} AS b WHERE {where}", parametros).fetchone()[0]
+            if total or not self._fts:
+                break
+        if not total:
+            return [], 0
+        registros = list(self._consultar(
+            f"SELECT o.* FROM {self.TABELA_BUSCA} AS b JOIN {self.TABELA} AS o ON o.Numero_OS = b.Numero_OS "
+            f"WHERE {where} ORDER BY CAST(o.Numero_OS AS INTEGER) DESC, o.Numero_OS DESC LIMIT ? OFFSET ?",
+            parametros + [int(limite), int(deslocamento)]))
+        return registros, total
+
+    def clientes(self):
+        return [dict(row) for row in self._conexao().execute(f"SELECT * FROM {self.TABELA_CLIENTES}")]
+
+    def veiculos(self):
+        return [dict(row) for row in self._conexao().execute(f"SELECT * FROM {self.TABELA_VEICULOS}")]
+
+    def obter_cliente(self, cpf_cnpj):
+        row = self._conexao().execute(f"SELECT * FROM {self.TABELA_CLIENTES} WHERE chave = ?",
+                                      (chave_cliente(cpf_cnpj),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def obter_veiculo(self, placa):
+        row = self._conexao().execute(f"SELECT * FROM {self.TABELA_VEICULOS} WHERE chave = ?",
+                                      (chave_veiculo(placa),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def consumo_pecas(self, tipo="Peça", limite=None):
+        """Quantidade e valor consumidos por referência, agregados direto no banco."""
+        sql = (f"SELECT referencia, MAX(descricao) AS descricao, SUM(quantia) AS quantidade, "
+               f"SUM(valor_total) AS valor_total, COUNT(DISTINCT Numero_OS) AS ordens "
+               f"FROM {self.TABELA_ITENS} WHERE tipo = ? GROUP BY referencia ORDER BY quantidade DESC")
+        parametros = [tipo]
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+        return [dict(row) for row in self._conexao().execute(sql, parametros)]
+
+    def resumo_faturamento(self, data_inicio=None, data_fim=None):
+        condicoes, parametros = [], []
+        if data_inicio:
+            condicoes.append("dia >= ?")
+            parametros.append(data_iso(data_inicio))
+        if data_fim:
+            condicoes.append("dia <= ?")
+            parametros.append(data_iso(data_fim))
+        onde = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return [dict(row) for row in self._conexao().execute(
+            f"SELECT * FROM {self.TABELA_RESUMO_FATURAMENTO}{onde}", parametros)]
+
+    def resumo_pecas(self, tipo=None, limite=None):
+        # A descrição vem de um dos itens da referência (pelo índice de referência), só para as linhas retornadas
+        sql = (f"SELECT r.*, (SELECT descricao FROM {self.TABELA_ITENS} i WHERE i.referencia = r.referencia "
+               f"AND COALESCE(i.tipo, '') = r.tipo LIMIT 1) AS descricao FROM {self.TABELA_RESUMO_PECAS} r")
+        parametros = []
+        if tipo:
+            sql += " WHERE r.tipo = ?"
+            parametros.append(tipo)
+        sql += " ORDER BY r.quantidade DESC"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+        return [dict(row) for row in self._conexao().execute(sql, parametros)]
+
+    def resumo_situacoes(self):
+        conn = self._conexao()
+        ordens = dict(conn.execute(f"SELECT situacao, SUM(ordens) FROM {self.TABELA_RESUMO_FATURAMENTO} "
+                                   f"GROUP BY situacao").fetchall())
+        periodos = {row["situacao"]: row for row in conn.execute(f"SELECT * FROM {self.TABELA_RESUMO_SITUACOES}")}
+        return [{"situacao": situacao, "ordens": ordens.get(situacao, 0),
+                 "intervalos": periodos[situacao]["intervalos"] if situacao in periodos else 0,
+                 "segundos": periodos[situacao]["segundos"] if situacao in periodos else 0}
+                for situacao in sorted(set(ordens) | set(periodos))]
+
+    def importar(self, registros):
+        total = 0
+        with self._transacao() as conn:
+            for registro in registros:
+                self._gravar(conn, normalizar_registro(registro))
+                total += 1
+        return total
+
+    @medido("sqlite.importar_lote")
+    def importar_lote(self, registros, substituir=False):
+        # O lote inteiro numa transação: um commit (e um fsync) por lote em vez de um por OS
+        registros = [normalizar_registro(r) for r in registros]
+        numeros = []
+        with self._transacao() as conn:
+            for registro in registros:
+                if not registro["Numero_OS"]:
+                    registro["Numero_OS"] = self._proximo_numero_livre(conn)
+                elif not substituir and self._ler_versao(conn, registro["Numero_OS"]) is not None:
+                    numeros.append(None)
+                    continue
+                self._gravar(conn, registro)
+                numeros.append(registro["Numero_OS"])
+        return numeros
+
+    def __len__(self):
+        return self._conexao().execute(f"SELECT COUNT(*) FROM {self.TABELA}").fetchone()[0]
+
+    def fechar(self):
+        with self._lock_conexoes:
+            for conn in self._conexoes:
+                conn.close()
+            self._conexoes = []
+        self._local = threading.local()
@@ -0,0 +1,53 @@
+"""Escrita de arquivos à prova de queda de energia ou do programa.
+
+Um arquivo é sempre escrito por inteiro num temporário, gravado em disco
+(fsync) e só então trocado pelo definitivo com ``os.replace``, que é
+atômico: quem abrir o arquivo vê a versão antiga ou a nova, nunca uma
+pela metade.
+"""
+
+import ctypes
+import os
+
+_DRIVE_REMOTE = 4  # GetDriveTypeW
+
+
+def sincronizar(arquivo):
+    """Esvazia o buffer do arquivo aberto e espera o disco confirmar a gravação."""
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+
+
+def sincronizar_pasta(pasta):
+    """Grava em disco a entrada de diretório (necessário depois de um rename no Linux/macOS)."""
+    if os.name != "posix":
+        return  # No Windows uma pasta não pode ser aberta para fsync; o NTFS registra o rename no próprio journal
+    fd = os.open(pasta or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def substituir(caminho_tmp, destino):
+    """Troca ``destino`` pelo arquivo ``caminho_tmp``, já completo, de forma atômica e durável."""
+    with open(caminho_tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(caminho_tmp, destino)
+    sincronizar_pasta(os.path.dirname(os.path.abspath(destino)))
+
+
+def em_pasta_de_rede(caminho):
+    """True se o arquivo está num compartilhamento de rede (caminho UNC ou unidade mapeada no Windows)."""
+    caminho = os.path.abspath(caminho)
+    if caminho.startswith(("\\\\", "//")):
+        return True
+    if os.name != "nt":
+        return False  # Montagens de rede no Linux não são detectadas; o padrão local vale para elas
+    unidade = os.path.splitdrive(caminho)[0]
+    if not unidade:
+        return False
+    try:
+        return ctypes.windll.kernel32.GetDriveTypeW(unidade + "\\") == _DRIVE_REMOTE
+    except (AttributeError, OSError):
+        return False
@@ -0,0 +1,141 @@
+"""Busca textual nas OSs: cliente, placa, CPF/CNPJ, problemas, serviço executado e itens.
+
+O texto é normalizado (minúsculas, sem acentos) e quebrado em termos; cada
+termo da consulta casa por prefixo ("embre" encontra "embreagem"). Quando a
+consulta não encontra nada, termos sem correspondência são trocados pelos
+mais parecidos do vocabulário, o que tolera erros de digitação.
+"""
+
+import bisect
+import difflib
+import re
+import unicodedata
+
+from .esquema import valor_vazio
+from .itens import CHAVE_ITENS
+
+CAMPOS_BUSCA = (
+    "Nome_Cliente", "Placa_Veiculo", "CPF_CNPJ_Cliente",
+    "Problema_Informado", "Problema_Constatado", "Servico_Executado",
+)
+
+_SEPARADOR = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar_texto(texto):
+    texto = str(texto).lower()
+    if texto.isascii():
+        return texto
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def termos(texto):
+    if valor_vazio(texto):
+        return []
+    return [t for t in _SEPARADOR.split(normalizar_texto(texto)) if t]
+
+
+def texto_busca(registro):
+    """Termos indexados de uma OS, já normalizados e separados por espaço."""
+    textos = [registro.get(campo) for campo in CAMPOS_BUSCA]
+    for item in registro.get(CHAVE_ITENS) or ():
+        textos.append(item.get("referencia"))
+        textos.append(item.get("descricao"))
+    partes = termos(" ".join(str(t) for t in textos if not valor_vazio(t)))
+    # Placa e documento também sem pontuação: "ABC-1234" e "123.456.789-00" casam com a forma digitada junta
+    for campo in ("Placa_Veiculo", "CPF_CNPJ_Cliente"):
+        compacto = "".join(termos(registro.get(campo)))
+        if compacto and compacto not in partes:
+            partes.append(compacto)
+    return " ".join(partes)
+
+
+def alternativas_consulta(consulta):
+    """Listas de termos que satisfazem a consulta (basta uma casar por inteiro).
+
+    "ABC-1D23" vira [["abc", "1d23"], ["abc1d23"]], para achar a placa gravada
+    com ou sem hífen.
+    """
+    principais = termos(consulta)
+    if not principais:
+        return []
+    alternativas = [principais]
+    if len(principais) > 1 and not str(consulta).strip().count(" "):
+        alternativas.append(["".join(principais)])
+    return alternativas
+
+
+def termos_parecidos(termo, vocabulario, limite=5):
+    """Termos do vocabulário (mesma inicial) mais parecidos com ``termo``."""
+    return difflib.get_close_matches(termo, [v for v in vocabulario if v[:1] == termo[:1]], n=limite, cutoff=0.75)
+
+
+class IndiceTexto:
+    """Índice invertido termo -> {Numero_OS}, atualizado a cada OS gravada ou removida."""
+
+    def __init__(self):
+        self._ocorrencias = {}  # termo -> {Numero_OS}
+        self._termos_de = {}  # Numero_OS -> frozenset de termos
+        self._vocabulario = []  # termos ordenados, para a busca por prefixo
+
+    def indexar(self, registro):
+        numero_os = registro["Numero_OS"]
+        novos = frozenset(texto_busca(registro).split())
+        antigos = self._termos_de.get(numero_os, frozenset())
+        for termo in antigos - novos:
+            self._desassociar(termo, numero_os)
+        for termo in novos - antigos:
+            numeros = self._ocorrencias.get(termo)
+            if numeros is None:
+                numeros = self._ocorrencias[termo] = set()
+                bisect.insort(self._vocabulario, termo)
+            numeros.add(numero_os)
+        self._termos_de[numero_os] = novos
+
+    def remover(self, numero_os):
+        for termo in self._termos_de.pop(numero_os, ()):
+            self._desassociar(termo, numero_os)
+
+    def _desassociar(self, termo, numero_os):
+        numeros = self._ocorrencias[termo]
+        numeros.discard(numero_os)
+        if not numeros:
+            del self._ocorrencias[termo]
+            del self._vocabulario[bisect.bisect_left(self._vocabulario, termo)]
+
+    def _por_prefixo(self, prefixo):
+        encontrados = set()
+        i = bisect.bisect_left(self._vocabulario, prefixo)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(prefixo):
+            encontrados |= self._ocorrencias[self._vocabulario[i]]
+            i += 1
+        return encontrados
+
+    def _parecidos(self, termo):
+        encontrados = set()
+        inicio = bisect.bisect_left(self._vocabulario, termo[0])
+        fim = bisect.bisect_left(self._vocabulario, chr(ord(termo[0]) + 1))
+        for parecido in termos_parecidos(termo, self._vocabulario[inicio:fim]):
+            encontrados |= self._ocorrencias[parecido]
+        return encontrados
+
+    def numeros(self, consulta, aproximada=True):
+        """Conjunto de Numero_OS que atendem a consulta."""
+        alternativas = alternativas_consulta(consulta)
+        resultado = set()
+        for lista in alternativas:
+            resultado |= self._intersecao([self._por_prefixo(t) for t in lista])
+        if resultado or not aproximada:
+            return resultado
+        for lista in alternativas:
+            conjuntos = [self._por_prefixo(t) or self._parecidos(t) for t in lista]
+            resultado |= self._intersecao(conjuntos)
+        return resultado
+
+    @staticmethod
+    def _intersecao(conjuntos):
+        if not conjuntos:
+            return set()
+        conjuntos = sorted(conjuntos, key=len)
+        return set(conjuntos[0]).intersection(*conjuntos[1:])
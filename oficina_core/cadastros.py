@@ -0,0 +1,121 @@
+"""Cadastros de clientes e veículos e o índice de prefixos usado no autocompletar.
+
+Cada cliente é identificado pelo CPF/CNPJ (só dígitos) e cada veículo pela
+placa (só letras e dígitos, maiúsculas). O cadastro guarda os dados mais
+recentes informados em alguma OS e serve ao autocompletar; cada OS mantém a
+sua cópia dos dados de cliente e veículo, como estavam no dia do serviço.
+"""
+
+import bisect
+
+from .esquema import valor_vazio
+
+CAMPOS_CLIENTE = (
+    "Nome_Cliente", "Endereco_Cliente", "Numero_Imovel_Cliente", "Bairro_Cliente", "Cidade_Cliente",
+    "UF_Cliente", "CEP_Cliente", "Telefone_Cliente", "CPF_CNPJ_Cliente",
+)
+
+CAMPOS_VEICULO = (
+    "Placa_Veiculo", "Marca_Veiculo", "Modelo_Veiculo", "Cor_Veiculo", "Ano_Veiculo", "Combustivel_Veiculo",
+)
+
+
+def chave_cliente(cpf_cnpj):
+    return "" if valor_vazio(cpf_cnpj) else "".join(filter(str.isdigit, str(cpf_cnpj)))
+
+
+def chave_veiculo(placa):
+    return "" if valor_vazio(placa) else "".join(filter(str.isalnum, str(placa))).upper()
+
+
+def _preenchido(valor):
+    if isinstance(valor, str):
+        return valor.strip() != ""
+    return not valor_vazio(valor)
+
+
+def mesclar_cadastro(antigo, novo):
+    """Dados novos sobrepõem os antigos, exceto campos deixados em branco na OS nova."""
+    mesclado = dict(antigo) if antigo is not None else {}
+    for campo, valor in novo.items():
+        if campo not in mesclado or _preenchido(valor):
+            mesclado[campo] = valor
+    return mesclado
+
+
+def cliente_de(registro):
+    """Dados do cliente de uma OS (com a chave), ou None se a OS não tem CPF/CNPJ."""
+    chave = chave_cliente(registro.get("CPF_CNPJ_Cliente"))
+    if not chave:
+        return None
+    cliente = {campo: registro.get(campo) for campo in CAMPOS_CLIENTE}
+    cliente["chave"] = chave
+    return cliente
+
+
+def veiculo_de(registro):
+    """Dados do veículo de uma OS (com a chave e o último cliente), ou None se a OS não tem placa."""
+    chave = chave_veiculo(registro.get("Placa_Veiculo"))
+    if not chave:
+        return None
+    veiculo = {campo: registro.get(campo) for campo in CAMPOS_VEICULO}
+    veiculo["chave"] = chave
+    veiculo["chave_cliente"] = chave_cliente(registro.get("CPF_CNPJ_Cliente")) or None
+    return veiculo
+
+
+class IndicePrefixos:
+    """Chaves num array ordenado: a busca por prefixo é uma bisseção mais os k resultados."""
+
+    def __init__(self, cadastros=()):
+        self._dados = {dados["chave"]: dados for dados in cadastros}
+        self._chaves = sorted(self._dados)
+
+    def gravar(self, chave, dados):
+        if chave not in self._dados:
+            bisect.insort(self._chaves, chave)
+        self._dados[chave] = dados
+
+    def remover(self, chave):
+        if self._dados.pop(chave, None) is not None:
+            del self._chaves[bisect.bisect_left(self._chaves, chave)]
+
+    def obter(self, chave):
+        return self._dados.get(chave)
+
+    def com_prefixo(self, prefixo, limite=15):
+        resultado = []
+        i = bisect.bisect_left(self._chaves, prefixo)
+        while i < len(self._chaves) and len(resultado) < limite and self._chaves[i].startswith(prefixo):
+            resultado.append(self._dados[self._chaves[i]])
+            i += 1
+        return resultado
+
+    def __len__(self):
+        return len(self._chaves)
+
+
+class IndiceCadastros:
+    """Clientes e veículos em memória, para o autocompletar não consultar o disco a cada tecla."""
+
+    def __init__(self, clientes=(), veiculos=()):
+        self.clientes = IndicePrefixos(clientes)
+        self.veiculos = IndicePrefixos(veiculos)
+
+    @classmethod
+    def do_armazenamento(cls, armazenamento):
+        return cls(armazenamento.clientes(), armazenamento.veiculos())
+
+    def clientes_com_prefixo(self, cpf_cnpj, limite=15):
+        chave = chave_cliente(cpf_cnpj)
+        return self.clientes.com_prefixo(chave, limite) if chave else []
+
+    def veiculos_com_prefixo(self, placa, limite=15):
+        chave = chave_veiculo(placa)
+        return self.veiculos.com_prefixo(chave, limite) if chave else []
+
+    def registrar(self, registro):
+        """Atualiza o índice com os dados de uma OS recém-gravada."""
+        for indice, dados in ((self.clientes, cliente_de(registro)), (self.veiculos, veiculo_de(registro))):
+            if dados is not None:
+                indice.gravar(dados["chave"], mesclar_cadastro(indice.obter(dados["chave"]), dados))
@@ -0,0 +1,154 @@
+"""Consulta de CEP com cache em disco e resolvedores intercambiáveis."""
+
+import csv
+import json
+import sqlite3
+import threading
+import time
+
+from .diagnostico import medido
+
+CAMPOS_ENDERECO = ("logradouro", "bairro", "localidade", "uf")
+
+
+class ErroConsultaCEP(Exception):
+    """Falha de comunicação ao consultar um CEP (diferente de CEP inexistente)."""
+
+
+def limpar_cep(cep):
+    return ''.join(filter(str.isdigit, str(cep or '')))
+
+
+class ResolvedorCEP:
+    """Origem de endereços. ``consultar`` retorna o dict do endereço ou None se o CEP não existir."""
+
+    def consultar(self, cep):
+        raise NotImplementedError
+
+
+class ResolvedorViaCEP(ResolvedorCEP):
+    URL = "https://viacep.com.br/ws/{cep}/json/"
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+
+    def consultar(self, cep):
+        import requests  # Só na primeira consulta que não estiver no cache
+
+        try:
+            response = requests.get(self.URL.format(cep=cep), timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise ErroConsultaCEP(str(e)) from e
+        if "erro" in data:
+            return None
+        return {campo: data.get(campo, "") or "" for campo in CAMPOS_ENDERECO}
+
+
+class ResolvedorCEPArquivo(ResolvedorCEP):
+    """Base de CEPs local em CSV (cep;logradouro;bairro;localidade;uf), para uso offline.
+
+    CEPs ausentes do arquivo retornam None, o que deixa o próximo resolvedor tentar.
+    """
+
+    def __init__(self, caminho, delimitador=";"):
+        self.caminho = caminho
+        self.delimitador = delimitador
+        self._enderecos = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        enderecos = {}
+        with open(self.caminho, newline="", encoding="utf-8") as f:
+            for linha in csv.DictReader(f, delimiter=self.delimitador):
+                cep = limpar_cep(linha.get("cep"))
+                if cep:
+                    enderecos[cep] = {campo: (linha.get(campo) or "").strip() for campo in CAMPOS_ENDERECO}
+        return enderecos
+
+    def consultar(self, cep):
+        with self._lock:
+            if self._enderecos is None:
+                self._enderecos = self._carregar()
+        return self._enderecos.get(cep)
+
+
+class CacheCEP:
+    """Cache persistente (SQLite) com validade e descarte dos menos usados (LRU)."""
+
+    def __init__(self, caminho, ttl_segundos=90 * 24 * 3600, max_entradas=20000):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache_cep ("
+                               "cep TEXT PRIMARY KEY, endereco TEXT NOT NULL, "
+                               "gravado_em REAL NOT NULL, acessado_em REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_cep_acesso ON cache_cep (acessado_em)")
+
+    def obter(self, cep):
+        agora = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT endereco, gravado_em FROM cache_cep WHERE cep = ?", (cep,)).fetchone()
+            if row is None:
+                return None
+            if agora - row[1] > self.ttl_segundos:
+                with self._conn:
+                    self._conn.execute("DELETE FROM cache_cep WHERE cep = ?", (cep,))
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE cache_cep SET acessado_em = ? WHERE cep = ?", (agora, cep))
+        return json.loads(row[0])
+
+    def gravar(self, cep, endereco):
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO cache_cep (cep, endereco, gravado_em, acessado_em) "
+                               "VALUES (?, ?, ?, ?)", (cep, json.dumps(endereco, ensure_ascii=False), agora, agora))
+            excesso = self._conn.execute("SELECT COUNT(*) FROM cache_cep").fetchone()[0] - self.max_entradas
+            if excesso > 0:
+                self._conn.execute("DELETE FROM cache_cep WHERE cep IN ("
+                                   "SELECT cep FROM cache_cep ORDER BY acessado_em LIMIT ?)", (excesso,))
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ServicoCEP:
+    """Consulta o cache e depois cada resolvedor, na ordem, até um encontrar o CEP."""
+
+    def __init__(self, resolvedores, cache=None):
+        self.resolvedores = list(resolvedores)
+        self.cache = cache
+
+    @medido("cep.cache")
+    def consultar_cache(self, cep):
+        """Consulta só o cache (rápida, pode ser feita na thread da interface)."""
+        if self.cache is None:
+            return None
+        return self.cache.obter(limpar_cep(cep))
+
+    @medido("cep.consultar")
+    def consultar(self, cep):
+        """Retorna o endereço, None se nenhum resolvedor conhece o CEP, ou levanta ErroConsultaCEP."""
+        cep = limpar_cep(cep)
+        endereco = self.consultar_cache(cep)
+        if endereco is not None:
+            return endereco
+        ultimo_erro = None
+        for resolvedor in self.resolvedores:
+            try:
+                endereco = resolvedor.consultar(cep)
+            except ErroConsultaCEP as e:
+                ultimo_erro = e
+                continue
+            if endereco is not None:
+                if self.cache is not None:
+                    self.cache.gravar(cep, endereco)
+                return endereco
+        if ultimo_erro is not None:
+            raise ultimo_erro
+        return None
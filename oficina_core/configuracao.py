@@ -0,0 +1,30 @@
+"""Configurações compartilhadas pela interface e pelas ferramentas de linha de comando."""
+
+import os
+
+# --- Configurações Globais ---
+ARQUIVO_EXCEL = "Ordens_de_Servico.xlsx"  # Planilha das versões anteriores, migrada para o banco
+ARQUIVO_BANCO_OS = "Ordens_de_Servico.db"  # Armazenamento principal (SQLite)
+ARQUIVO_JOURNAL_OS = "Ordens_de_Servico.jsonl"  # Journal das versões anteriores, migrado para o SQLite
+ARQUIVO_LOGO = os.path.join("resources", "logo.png")  # Caminho ajustado para pasta resources
+PASTA_OS_CLIENTES = "OS_Clientes"  # Destino dos PDFs exportados em lote
+PASTA_SNAPSHOTS = "Snapshots"  # Cópias do banco num ponto no tempo (ver oficina_core.snapshots)
+SNAPSHOTS_MANTIDOS = 14
+INTERVALO_SNAPSHOT_HORAS = 24
+PORTA_SERVIDOR = 8765  # Porta padrão do servidor local (python -m oficina_core.servidor)
+# Com um endereço aqui (ou em OFICINA_SERVIDOR), a tela usa o servidor em vez de abrir o banco direto
+URL_SERVIDOR_OS = os.environ.get("OFICINA_SERVIDOR") or None
+# Com um arquivo aqui (ou em OFICINA_PERFIL), a tela roda sob o cProfile e grava o perfil ao sair
+ARQUIVO_PERFIL = os.environ.get("OFICINA_PERFIL") or None
+ARQUIVO_DIAGNOSTICO = "diagnostico.json"  # Nome sugerido ao exportar os tempos do painel Diagnóstico
+INTERVALO_SINCRONIZACAO_MS = 5000  # De quanto em quanto tempo a tela busca as OSs alteradas por outros terminais
+HTML_TEMPLATE_FILE = "os_template.html"
+ARQUIVO_CACHE_CEP = "cep_cache.db"
+ARQUIVO_CEP_OFFLINE = os.path.join("resources", "ceps.csv")  # Opcional: base local consultada antes da ViaCEP
+
+INFO_OFICINA = {
+    "nome": "DEMONSTRAÇÃO OFICINA v6.0 230117 011216",
+    "endereco": "Estrada do barro vermelho 341 - Rocha Miranda - RIO DEJANEIRO-RJ",
+    "cnpj": "CNPJ 48.969.894/0001-59",
+    "telefone": "(21) 99757-0103 / 97125-0490"
+}
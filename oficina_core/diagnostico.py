@@ -0,0 +1,230 @@
+"""Medição de tempos das operações principais, log e perfil opcional com cProfile.
+
+As operações demoradas (abrir os dados, salvar, buscar, consultar CEP,
+renderizar e gravar o PDF) ficam dentro de ``medir("nome")``, que soma a
+duração num histograma por operação. Medir custa duas leituras de relógio e
+um lock; o log de cada medição só é formatado com o nível DEBUG ativo
+(``OFICINA_LOG=DEBUG``).
+
+O painel "Diagnóstico" da interface mostra os histogramas e exporta o JSON
+de ``exportar_json``. Com ``OFICINA_PERFIL=arquivo.prof`` o programa roda sob
+o cProfile e grava as estatísticas ao sair; para ver as mais caras:
+
+    python -m oficina_core.diagnostico arquivo.prof --linhas 30
+
+Para amostrar sem parar o programa (todas as threads), o py-spy funciona
+sem configuração: ``py-spy record -o perfil.svg -- python main.py``.
+"""
+
+import argparse
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Limite superior (ms) de cada faixa do histograma; a última faixa é "acima de 10 s"
+FAIXAS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+FORMATO_LOG = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configurar_log(nivel=None):
+    """Manda o log para o stderr; ``nivel`` (ou OFICINA_LOG) como "DEBUG", "INFO"... padrão INFO."""
+    nivel = (nivel or os.environ.get("OFICINA_LOG") or "INFO").upper()
+    logging.basicConfig(level=getattr(logging, nivel, logging.INFO), format=FORMATO_LOG, stream=sys.stderr)
+
+
+class Histograma:
+    """Contagem de durações por faixa, com soma, mínimo e máximo exatos."""
+
+    def __init__(self):
+        self.faixas = [0] * (len(FAIXAS_MS) + 1)
+        self.contagem = 0
+        self.soma_ms = 0.0
+        self.minimo_ms = None
+        self.maximo_ms = 0.0
+
+    def registrar(self, ms):
+        self.faixas[bisect.bisect_left(FAIXAS_MS, ms)] += 1
+        self.contagem += 1
+        self.soma_ms += ms
+        self.minimo_ms = ms if self.minimo_ms is None else min(self.minimo_ms, ms)
+        self.maximo_ms = max(self.maximo_ms, ms)
+
+    def percentil(self, p):
+        """Limite superior da faixa onde cai o percentil ``p`` (0-100), sem passar do máximo medido."""
+        if not self.contagem:
+            return None
+        alvo = self.contagem * p / 100
+        acumulado = 0
+        for i, quantidade in enumerate(self.faixas):
+            acumulado += quantidade
+            if quantidade and acumulado >= alvo:
+                return min(FAIXAS_MS[i], self.maximo_ms) if i < len(FAIXAS_MS) else self.maximo_ms
+        return self.maximo_ms
+
+    def como_dict(self):
+        return {
+            "contagem": self.contagem,
+            "media_ms": self.soma_ms / self.contagem if self.contagem else None,
+            "minimo_ms": self.minimo_ms,
+            "maximo_ms": self.maximo_ms,
+            "p50_ms": self.percentil(50),
+            "p95_ms": self.percentil(95),
+            "p99_ms": self.percentil(99),
+            "faixas_ms": {(f"<={limite}" if i < len(FAIXAS_MS) else f">{FAIXAS_MS[-1]}"): quantidade
+                          for i, (limite, quantidade) in enumerate(zip(FAIXAS_MS + (None,), self.faixas))
+                          if quantidade},
+        }
+
+
+class _Medicao:
+    __slots__ = ("metricas", "nome", "inicio")
+
+    def __init__(self, metricas, nome):
+        self.metricas = metricas
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        self.metricas.registrar(self.nome, time.perf_counter() - self.inicio, erro=tipo is not None)
+        return False
+
+
+class Metricas:
+    """Histogramas por operação, compartilhados por todas as threads do processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._erros = {}
+        self._local = threading.local()
+        self.desde = time.time()
+
+    def medir(self, nome):
+        """Context manager que registra a duração do bloco em ``nome`` (também quando ele levanta exceção)."""
+        return _Medicao(self, nome)
+
+    def registrar(self, nome, segundos, erro=False):
+        ms = segundos * 1000
+        with self._lock:
+            histograma = self._histogramas.get(nome)
+            if histograma is None:
+                histograma = self._histogramas[nome] = Histograma()
+            histograma.registrar(ms)
+            if erro:
+                self._erros[nome] = self._erros.get(nome, 0) + 1
+        captura = getattr(self._local, "captura", None)
+        if captura is not None:
+            captura.append((nome, segundos, erro))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: %.1f ms%s", nome, ms, " (com erro)" if erro else "")
+
+    def registrar_varios(self, medicoes):
+        """Soma medições feitas em outro processo (ver ``capturar``)."""
+        for nome, segundos, erro in medicoes:
+            self.registrar(nome, segundos, erro)
+
+    @contextlib.contextmanager
+    def capturar(self):
+        """Guarda numa lista as medições feitas nesta thread dentro do bloco, para enviar a outro processo."""
+        anterior = getattr(self._local, "captura", None)
+        self._local.captura = medicoes = []
+        try:
+            yield medicoes
+        finally:
+            self._local.captura = anterior
+
+    def instantaneo(self):
+        """Dict nome -> resumo do histograma (contagem, média, percentis, faixas), mais os erros."""
+        with self._lock:
+            resumo = {nome: dict(histograma.como_dict(), erros=self._erros.get(nome, 0))
+                      for nome, histograma in sorted(self._histogramas.items())}
+        return resumo
+
+    def zerar(self):
+        with self._lock:
+            self._histogramas = {}
+            self._erros = {}
+            self.desde = time.time()
+
+    def exportar_json(self, caminho):
+        """Grava as medições em JSON, com a data de início e a identificação do processo. Retorna o caminho."""
+        dados = {
+            "desde": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.desde)),
+            "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pid": os.getpid(),
+            "python": sys.version.split()[0],
+            "plataforma": sys.platform,
+            "operacoes": self.instantaneo(),
+        }
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        return caminho
+
+
+# Uma instância por processo; os workers de PDF devolvem suas medições ao processo principal
+metricas = Metricas()
+
+
+def medir(nome):
+    """Atalho para ``metricas.medir(nome)``."""
+    return metricas.medir(nome)
+
+
+def medido(nome):
+    """Decorador: cada chamada da função é medida em ``nome``."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with metricas.medir(nome):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
+
+
+def iniciar_perfil(caminho):
+    """Liga o cProfile na thread atual e grava as estatísticas em ``caminho`` quando o processo terminar.
+
+    O cProfile só vê a thread em que foi ligado (a da interface); as threads
+    de carregamento e os processos de PDF aparecem nas medições de ``medir``.
+    """
+    import cProfile
+
+    perfil = cProfile.Profile()
+
+    def gravar():
+        perfil.disable()
+        perfil.dump_stats(caminho)
+        log.info("Perfil gravado em %s", caminho)
+
+    atexit.register(gravar)
+    perfil.enable()
+    log.info("Perfil com cProfile ativo; será gravado em %s", caminho)
+    return perfil
+
+
+def main(argv=None):
+    import pstats
+
+    parser = argparse.ArgumentParser(description="Mostra as funções mais caras de um perfil do cProfile.")
+    parser.add_argument("perfil", help="arquivo gravado com OFICINA_PERFIL")
+    parser.add_argument("--linhas", type=int, default=25)
+    parser.add_argument("--ordem", default="cumulative", help="cumulative, tottime, calls... (padrão cumulative)")
+    args = parser.parse_args(argv)
+    pstats.Stats(args.perfil).strip_dirs().sort_stats(args.ordem).print_stats(args.linhas)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Colunas das Ordens de Serviço e normalização de registros."""
+
+import datetime
+
+COLUNAS_OS = (
+    "Numero_OS", "Data_OS", "Hora_OS",
+    "Nome_Cliente", "Endereco_Cliente", "Numero_Imovel_Cliente", "Bairro_Cliente", "Cidade_Cliente",
+    "UF_Cliente", "CEP_Cliente", "Telefone_Cliente", "CPF_CNPJ_Cliente",
+    "Placa_Veiculo", "Marca_Veiculo", "Modelo_Veiculo", "Cor_Veiculo", "Ano_Veiculo", "KM_Atual_Veiculo",
+    "Combustivel_Veiculo", "Box_Veiculo",
+    "Problema_Informado", "Problema_Constatado", "Servico_Executado",
+    "Detalhes_Itens",
+    "Total_Itens",
+    "Deslocamento", "Desconto_Geral", "Valor_Total_Final",
+    "Responsavel", "Situacao_Atual",
+    "Condicoes_Pagamento",
+)
+
+# Campos sem os quais o formulário não salva a OS
+CAMPOS_OBRIGATORIOS = ("Nome_Cliente", "Placa_Veiculo")
+CAMPOS_NUMERICOS = ("KM_Atual_Veiculo", "Ano_Veiculo", "Numero_Imovel_Cliente",
+                    "Total_Itens", "Deslocamento", "Desconto_Geral", "Valor_Total_Final")
+
+# Afinidade de tipo das colunas no SQLite (as demais são TEXT)
+TIPOS_SQL = {
+    "Ano_Veiculo": "INTEGER",
+    "KM_Atual_Veiculo": "INTEGER",
+    "Total_Itens": "REAL",
+    "Deslocamento": "REAL",
+    "Desconto_Geral": "REAL",
+    "Valor_Total_Final": "REAL",
+}
+
+
+def valor_vazio(valor):
+    """True para None, NaN, NaT e pd.NA (sem precisar importar o pandas)."""
+    if valor is None:
+        return True
+    try:
+        return bool(valor != valor)
+    except TypeError:
+        # pd.NA não pode ser convertido para bool
+        return True
+
+
+def _valor_python(valor):
+    if valor_vazio(valor):
+        return None
+    if isinstance(valor, (str, bool, int, float)):
+        return valor
+    if hasattr(valor, "item"):  # escalares do numpy
+        return valor.item()
+    return str(valor)
+
+
+def data_iso(data_os):
+    """Converte 'dd/MM/yyyy' para 'yyyy-MM-dd' (ordenável); None se não reconhecer."""
+    if not isinstance(data_os, str):
+        return None
+    data_os = data_os.strip()
+    if len(data_os) >= 10 and data_os[4] == "-" and data_os[7] == "-":
+        # Datas convertidas pelo próprio Excel chegam como '2025-06-11 00:00:00'
+        return data_os[:10]
+    partes = data_os.split("/")
+    if len(partes) != 3 or not all(p.isdigit() for p in partes):
+        return None
+    dia, mes, ano = partes
+    return f"{ano.zfill(4)}-{mes.zfill(2)}-{dia.zfill(2)}"
+
+
+def numero_os_para_int(numero_os):
+    """Parte numérica do Numero_OS (ignora outros caracteres); None se não houver dígitos."""
+    digitos = ''.join(filter(str.isdigit, str(numero_os or '')))
+    return int(digitos) if digitos else None
+
+
+def formatar_numero_os(numero):
+    return str(numero).zfill(6)
+
+
+def registro_para_salvar(dados):
+    """Cópia de ``dados`` (textos do formulário) com os tipos gravados.
+
+    KM, ano e número do imóvel viram int; os valores, float; um Numero_OS só
+    com dígitos ganha os zeros à esquerda. Campos vazios ou inválidos ficam None.
+    """
+    from .itens import para_decimal
+
+    registro = dict(dados)
+    km = ''.join(filter(str.isdigit, str(registro.get('KM_Atual_Veiculo') or '')))
+    registro['KM_Atual_Veiculo'] = int(km) if km else None
+    for campo in ('Ano_Veiculo', 'Numero_Imovel_Cliente'):
+        texto = str(registro.get(campo) or '')
+        registro[campo] = int(texto) if texto.isdigit() else None
+    # Os totais já chegam como número; só um texto digitado ("1.234,56") precisa de conversão
+    for campo in ('Total_Itens', 'Valor_Total_Final', 'Deslocamento', 'Desconto_Geral'):
+        try:
+            registro[campo] = float(para_decimal(registro.get(campo)))
+        except ValueError:
+            registro[campo] = None
+    numero = str(registro.get('Numero_OS') or '')
+    if numero.isdigit():
+        registro['Numero_OS'] = formatar_numero_os(numero)
+    return registro
+
+
+def normalizar_registro(dados):
+    """Retorna um dict só com as colunas da OS e valores serializáveis em JSON.
+
+    Os itens ficam como lista em ``Itens_Pecas_Servicos``; Detalhes_Itens só é
+    lido quando o registro vem de uma planilha antiga, sem a lista.
+    """
+    from .itens import CHAVE_ITENS, normalizar_item, parse_detalhes_itens
+
+    registro = {col: _valor_python(dados.get(col)) for col in COLUNAS_OS}
+    numero = registro["Numero_OS"]
+    registro["Numero_OS"] = str(numero).strip() if numero is not None else ""
+
+    itens = dados.get(CHAVE_ITENS)
+    if not isinstance(itens, (list, tuple)):
+        itens = parse_detalhes_itens(registro["Detalhes_Itens"])
+    registro[CHAVE_ITENS] = [normalizar_item(item) for item in itens]
+    # Detalhes_Itens é derivado dos itens e só é gerado na exportação da planilha
+    registro["Detalhes_Itens"] = None
+    return registro
+
+
+def validar_registro(dados):
+    """``(registro_para_salvar(dados), problemas)``; a lista de problemas vem vazia se o registro é válido.
+
+    As regras são as do formulário (nome do cliente e placa obrigatórios),
+    mais as de dados digitados fora dele: um número ou data preenchido que
+    não pôde ser convertido é apontado em vez de ser gravado vazio.
+    """
+    registro = registro_para_salvar(dados)
+    problemas = [f"{campo} não preenchido" for campo in CAMPOS_OBRIGATORIOS
+                 if not str(registro.get(campo) or '').strip()]
+    for campo in CAMPOS_NUMERICOS:
+        valor = dados.get(campo)
+        if registro[campo] is None and not valor_vazio(valor) and str(valor).strip():
+            problemas.append(f"{campo} inválido: {valor}")
+    data = dados.get("Data_OS")
+    if not valor_vazio(data) and str(data).strip() and not _data_existe(data_iso(data)):
+        problemas.append(f"Data_OS inválida: {data}")
+    return registro, problemas
+
+
+def _data_existe(iso):
+    try:
+        datetime.date(*(int(parte) for parte in iso.split("-")))
+    except (AttributeError, ValueError):
+        return False
+    return True
@@ -0,0 +1,235 @@
+"""Exportação das OSs (e dos seus itens) para CSV, JSON Lines ou Excel, em fluxo contínuo.
+
+Uso:
+    python -m oficina_core.exportacao fechamento_outubro.xlsx --de 01/10/2025 --ate 31/10/2025 --itens
+    python -m oficina_core.exportacao finalizadas.csv --situacao Finalizado --colunas Numero_OS,Valor_Total_Final
+
+As OSs são lidas do armazenamento aos poucos (``filtrar``) e escritas à
+medida que chegam: no Excel, pelo modo write-only do openpyxl, que grava as
+linhas num arquivo temporário em vez de montá-las em memória. A memória usada
+é a mesma para 100 ou 100 mil OSs. O arquivo é escrito num temporário que só
+substitui o destino no final (ver ``oficina_core.arquivos``).
+
+Os itens vão para a aba "Itens" no Excel, para ARQUIVO_itens.csv no CSV e,
+no JSON Lines, dentro de cada OS.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from .armazenamento import ArmazenamentoSQLite
+from .arquivos import substituir
+from .configuracao import ARQUIVO_BANCO_OS
+from .diagnostico import medir
+from .esquema import COLUNAS_OS
+from .itens import CAMPOS_ITEM, CHAVE_ITENS, formatar_detalhes_itens
+
+FORMATOS = {".csv": "csv", ".jsonl": "jsonl", ".xlsx": "xlsx"}
+COLUNAS_ITENS = ("Numero_OS", "Data_OS") + CAMPOS_ITEM
+INTERVALO_PROGRESSO = 500  # OSs entre uma chamada de progresso e outra
+
+
+def formato_do_arquivo(caminho):
+    """"csv", "jsonl" ou "xlsx", pela extensão; ValueError para as demais."""
+    formato = FORMATOS.get(os.path.splitext(caminho)[1].lower())
+    if formato is None:
+        raise ValueError(f"Formato de exportação não suportado: {caminho} (use .csv, .jsonl ou .xlsx)")
+    return formato
+
+
+def caminho_itens_csv(caminho):
+    raiz, ext = os.path.splitext(caminho)
+    return f"{raiz}_itens{ext}"
+
+
+def _temporario(caminho):
+    raiz, ext = os.path.splitext(caminho)
+    return f"{raiz}.tmp{ext}"
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _valor_csv(valor):
+    # Vírgula decimal e ";" como separador: o CSV abre direto no Excel em português
+    if valor is None:
+        return ""
+    if isinstance(valor, float):
+        return repr(valor).replace(".", ",")
+    return valor
+
+
+class _DestinoCSV:
+    def __init__(self, caminho, colunas, itens):
+        self._arquivos = []
+        self._os = self._abrir(caminho, colunas)
+        self._itens = self._abrir(caminho_itens_csv(caminho), COLUNAS_ITENS) if itens else None
+
+    def _abrir(self, caminho, colunas):
+        arquivo = open(_temporario(caminho), "w", newline="", encoding="utf-8-sig")
+        self._arquivos.append((arquivo, caminho))
+        escritor = csv.writer(arquivo, delimiter=";")
+        escritor.writerow(colunas)
+        return escritor
+
+    def escrever(self, linha, itens):
+        self._os.writerow([_valor_csv(v) for v in linha])
+        if self._itens is not None:
+            self._itens.writerows([_valor_csv(v) for v in item] for item in itens)
+
+    def concluir(self):
+        for arquivo, caminho in self._arquivos:
+            arquivo.close()
+            substituir(arquivo.name, caminho)
+        return [caminho for _, caminho in self._arquivos]
+
+    def descartar(self):
+        for arquivo, _ in self._arquivos:
+            arquivo.close()
+            _remover(arquivo.name)
+
+
+class _DestinoJSONL:
+    def __init__(self, caminho, colunas, itens):
+        self.caminho = caminho
+        self.colunas = colunas
+        self.itens = itens
+        self._arquivo = open(_temporario(caminho), "w", encoding="utf-8")
+
+    def escrever(self, linha, itens):
+        registro = dict(zip(self.colunas, linha))
+        if self.itens:
+            registro[CHAVE_ITENS] = [dict(zip(CAMPOS_ITEM, item[2:])) for item in itens]
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def concluir(self):
+        self._arquivo.close()
+        substituir(self._arquivo.name, self.caminho)
+        return [self.caminho]
+
+    def descartar(self):
+        self._arquivo.close()
+        _remover(self._arquivo.name)
+
+
+class _DestinoXLSX:
+    def __init__(self, caminho, colunas, itens):
+        from openpyxl import Workbook
+
+        self.caminho = caminho
+        # write-only: cada linha vai para um arquivo temporário do openpyxl, nada fica em memória
+        self._livro = Workbook(write_only=True)
+        self._os = self._livro.create_sheet("OS")
+        self._os.append(list(colunas))
+        self._itens = self._livro.create_sheet("Itens") if itens else None
+        if self._itens is not None:
+            self._itens.append(list(COLUNAS_ITENS))
+
+    def escrever(self, linha, itens):
+        self._os.append(linha)
+        if self._itens is not None:
+            for item in itens:
+                self._itens.append(item)
+
+    def concluir(self):
+        self._livro.save(_temporario(self.caminho))
+        substituir(_temporario(self.caminho), self.caminho)
+        return [self.caminho]
+
+    def descartar(self):
+        # Fecha cada aba e apaga o temporário dela; sem isso ficariam no disco até o programa fechar
+        for folha in self._livro.worksheets:
+            folha.close()
+            folha._writer.cleanup()
+        _remover(_temporario(self.caminho))
+
+
+_DESTINOS = {"csv": _DestinoCSV, "jsonl": _DestinoJSONL, "xlsx": _DestinoXLSX}
+
+
+def exportar_os(armazenamento, caminho, colunas=None, itens=False, progresso=None, cancelado=None, **filtro):
+    """Exporta as OSs do ``filtro`` (ver ``ArmazenamentoOS.filtrar``) para ``caminho`` (.csv, .jsonl ou .xlsx).
+
+    ``colunas`` escolhe e ordena as colunas da OS (padrão: todas); com
+    ``itens`` os itens de cada OS também são exportados.
+    ``progresso(exportadas, total)`` é chamado a cada ``INTERVALO_PROGRESSO``
+    OSs; se ``cancelado()`` retornar True a exportação para e o destino fica
+    como estava. Retorna ``(total de OSs, arquivos gravados)``, ou None se foi
+    cancelada.
+    """
+    colunas = tuple(colunas or COLUNAS_OS)
+    desconhecidas = [col for col in colunas if col not in COLUNAS_OS]
+    if desconhecidas:
+        raise ValueError(f"Colunas inexistentes na OS: {', '.join(desconhecidas)}")
+    formato = formato_do_arquivo(caminho)
+    total = armazenamento.contar(**filtro) if progresso else None
+    registros = armazenamento.filtrar(**filtro) if filtro else armazenamento.registros()
+
+    destino = _DESTINOS[formato](caminho, colunas, itens)
+    exportadas = 0
+    try:
+        with medir(f"exportacao.{formato}"):
+            for registro in registros:
+                if "Detalhes_Itens" in colunas:
+                    registro["Detalhes_Itens"] = formatar_detalhes_itens(registro[CHAVE_ITENS])
+                linhas_itens = ([[registro["Numero_OS"], registro["Data_OS"]] + [item[campo] for campo in CAMPOS_ITEM]
+                                 for item in registro[CHAVE_ITENS]] if itens else ())
+                destino.escrever([registro[col] for col in colunas], linhas_itens)
+                exportadas += 1
+                if exportadas % INTERVALO_PROGRESSO == 0:
+                    if cancelado and cancelado():
+                        destino.descartar()
+                        return None
+                    if progresso:
+                        progresso(exportadas, total)
+            arquivos = destino.concluir()
+    except BaseException:
+        destino.descartar()
+        raise
+    if progresso:
+        progresso(exportadas, total)
+    return exportadas, arquivos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta as OSs filtradas para CSV, JSON Lines ou Excel.")
+    parser.add_argument("destino", help="arquivo .csv, .jsonl ou .xlsx")
+    parser.add_argument("--banco", default=ARQUIVO_BANCO_OS, help="arquivo SQLite das OSs")
+    parser.add_argument("--de", dest="data_inicio", help="data inicial (dd/MM/yyyy)")
+    parser.add_argument("--ate", dest="data_fim", help="data final (dd/MM/yyyy)")
+    parser.add_argument("--situacao", help="Situação Atual, ex.: Finalizado")
+    parser.add_argument("--pagamento", dest="condicoes_pagamento", help="Condições de Pagamento, ex.: Pix")
+    parser.add_argument("--colunas", help="colunas da OS separadas por vírgula (padrão: todas)")
+    parser.add_argument("--itens", action="store_true", help="exporta também os itens (peças e serviços)")
+    args = parser.parse_args(argv)
+
+    colunas = [c.strip() for c in args.colunas.split(",") if c.strip()] if args.colunas else None
+    filtro = {campo: valor for campo, valor in (("data_inicio", args.data_inicio), ("data_fim", args.data_fim),
+                                               ("situacao", args.situacao),
+                                               ("condicoes_pagamento", args.condicoes_pagamento)) if valor}
+
+    def mostrar_progresso(exportadas, total):
+        print(f"\r{exportadas}/{total} OS exportadas", end="", file=sys.stderr, flush=True)
+
+    armazenamento = ArmazenamentoSQLite(args.banco)
+    try:
+        total, arquivos = exportar_os(armazenamento, args.destino, colunas, args.itens, mostrar_progresso, **filtro)
+    except (ValueError, OSError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    finally:
+        armazenamento.fechar()
+    print(file=sys.stderr)
+    print(f"{total} OS exportadas para {', '.join(arquivos)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Formatação de valores para exibição (filtros do template e formulário)."""
+
+from .esquema import valor_vazio
+
+
+def formatar_dinheiro(value):
+    """1234.5 -> '1.234,50'."""
+    try:
+        if valor_vazio(value):
+            value = 0.0
+        val = float(value)
+        return f"{val:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    except (ValueError, TypeError):
+        return f"{0.00:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def formatar_km(value):
+    """12345 -> '12.345'."""
+    try:
+        if valor_vazio(value):
+            value = ""
+        clean_text = ''.join(filter(str.isdigit, str(value)))
+        if clean_text:
+            return f"{int(clean_text):,}".replace(',', '.')
+        return ""
+    except (ValueError, TypeError):
+        return ""
+
+
+def padrao_se_vazio(value):
+    if valor_vazio(value):
+        return ""
+    return str(value)
+
+
+def mascara_telefone(texto):
+    """Dígitos de ``texto`` (até 11) como '(21) 98765-4321', conforme vão sendo digitados."""
+    digitos = ''.join(filter(str.isdigit, str(texto)))[:11]
+    if len(digitos) <= 2:
+        return digitos
+    if len(digitos) > 7:
+        return f"({digitos[:2]}) {digitos[2:7]}-{digitos[7:]}"
+    return f"({digitos[:2]}) {digitos[2:]}"
+
+
+def mascara_cpf_cnpj(texto):
+    """Dígitos de ``texto`` (até 14) como CPF '123.456.789-01' ou, acima de 11, CNPJ '12.345.678/0001-95'."""
+    d = ''.join(filter(str.isdigit, str(texto)))[:14]
+    if len(d) <= 11:  # CPF
+        if len(d) > 9:
+            return f"{d[:3]}.{d[3:6]}.{d[6:9]}-{d[9:]}"
+        if len(d) > 6:
+            return f"{d[:3]}.{d[3:6]}.{d[6:]}"
+        if len(d) > 3:
+            return f"{d[:3]}.{d[3:]}"
+        return d
+    # CNPJ
+    if len(d) > 12:
+        return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}"
+    return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:]}"
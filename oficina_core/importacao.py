@@ -0,0 +1,275 @@
+"""Importação em massa de OSs de planilhas (.xlsx) e arquivos CSV para o banco.
+
+Uso:
+    python -m oficina_core.importacao OSs_antigas.xlsx
+    python -m oficina_core.importacao outro_sistema.csv --mapa "Cliente=Nome_Cliente,Placa=Placa_Veiculo"
+
+O arquivo é lido linha a linha (openpyxl em modo somente leitura, módulo csv)
+e gravado em lotes, cada lote numa transação, então a memória usada não
+depende do tamanho do arquivo. Cada linha passa pelas regras do formulário
+(``validar_registro``); as recusadas vão para um CSV com o número da linha e
+o motivo, que pode ser corrigido e importado de novo.
+"""
+
+import argparse
+import csv
+import datetime
+import logging
+import os
+import sys
+import unicodedata
+
+from .armazenamento import ArmazenamentoSQLite
+from .configuracao import ARQUIVO_BANCO_OS
+from .diagnostico import medir
+from .esquema import CAMPOS_OBRIGATORIOS, COLUNAS_OS, validar_registro
+from .itens import para_decimal, parse_detalhes_itens
+
+log = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 1000
+EXTENSOES_PLANILHA = (".xlsx", ".xlsm")
+EXTENSOES_CSV = (".csv", ".txt")
+
+
+def _chave_coluna(nome):
+    sem_acento = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode("ascii")
+    return "".join(c for c in sem_acento.lower() if c.isalnum())
+
+
+_COLUNAS_POR_CHAVE = {_chave_coluna(col): col for col in COLUNAS_OS}
+
+
+def mapear_colunas(cabecalho, mapa=None):
+    """Coluna da OS correspondente a cada coluna do arquivo (None nas que não forem reconhecidas).
+
+    Os nomes são comparados sem acentos, maiúsculas, espaços e "_" ("Número OS"
+    equivale a Numero_OS); ``mapa`` ({nome no arquivo: coluna da OS}) cobre os
+    nomes usados por outros sistemas.
+    """
+    mapa = {_chave_coluna(nome): coluna for nome, coluna in (mapa or {}).items()}
+    invalidas = sorted(coluna for coluna in mapa.values() if coluna not in COLUNAS_OS)
+    if invalidas:
+        raise ValueError(f"Colunas inexistentes na OS: {', '.join(invalidas)}")
+    colunas = []
+    for nome in cabecalho:
+        chave = _chave_coluna(nome) if nome is not None else ""
+        coluna = mapa.get(chave) or _COLUNAS_POR_CHAVE.get(chave)
+        if coluna in colunas:
+            log.warning("Coluna '%s' repetida no arquivo; só a primeira é importada.", nome)
+            coluna = None
+        colunas.append(coluna)
+    return colunas
+
+
+def _ler_mapa(texto):
+    """"Cliente=Nome_Cliente,Placa=Placa_Veiculo" -> dict."""
+    mapa = {}
+    for par in filter(None, (p.strip() for p in (texto or "").split(","))):
+        nome, sep, coluna = par.partition("=")
+        if not sep:
+            raise ValueError(f"Item do mapa sem '=': {par}")
+        mapa[nome.strip()] = coluna.strip()
+    return mapa
+
+
+def _linhas_planilha(caminho, aba=None):
+    from openpyxl import load_workbook
+
+    # read_only lê a planilha sob demanda, sem montar todas as células em memória
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        folha = livro[aba] if aba else livro.worksheets[0]
+        for numero, valores in enumerate(folha.iter_rows(values_only=True), 1):
+            yield numero, valores
+    finally:
+        livro.close()
+
+
+def _linhas_csv(caminho, delimitador=None, codificacao="utf-8-sig"):
+    with open(caminho, newline="", encoding=codificacao) as f:
+        if delimitador is None:
+            amostra = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                delimitador = csv.Sniffer().sniff(amostra, delimiters=";,\t|").delimiter
+            except csv.Error:
+                delimitador = ";"  # Padrão do Excel em português
+        for numero, valores in enumerate(csv.reader(f, delimiter=delimitador), 1):
+            yield numero, valores
+
+
+def _texto_celula(coluna, valor):
+    """Valor da célula como o formulário o teria (datas em dd/MM/yyyy, inteiros sem ".0")."""
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime.datetime):
+        return valor.strftime("%H:%M:%S" if coluna == "Hora_OS" else "%d/%m/%Y")
+    if isinstance(valor, datetime.date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, datetime.time):
+        return valor.strftime("%H:%M:%S")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _completar_totais(dados):
+    """Calcula os totais ausentes do arquivo a partir dos itens, como o formulário faz."""
+    if "Total_Itens" not in dados:
+        dados["Total_Itens"] = str(sum((para_decimal(item["valor_total"])
+                                        for item in parse_detalhes_itens(dados.get("Detalhes_Itens"))),
+                                       para_decimal(0)))
+    if "Valor_Total_Final" not in dados:
+        try:
+            dados["Valor_Total_Final"] = str(para_decimal(dados["Total_Itens"])
+                                             + para_decimal(dados.get("Deslocamento"))
+                                             - para_decimal(dados.get("Desconto_Geral")))
+        except ValueError:
+            pass  # Total inválido: a validação aponta o campo
+    return dados
+
+
+class RelatorioRecusadas:
+    """CSV com as linhas recusadas (número da linha, motivo e os valores originais), aberto na primeira."""
+
+    def __init__(self, caminho, cabecalho):
+        self.caminho = caminho
+        self.cabecalho = ["" if nome is None else str(nome) for nome in cabecalho]
+        self.total = 0
+        self._arquivo = None
+        self._escritor = None
+
+    def registrar(self, numero_linha, motivo, valores):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "w", newline="", encoding="utf-8-sig")
+            self._escritor = csv.writer(self._arquivo, delimiter=";")
+            self._escritor.writerow(["Linha", "Motivo"] + self.cabecalho)
+        self._escritor.writerow([numero_linha, motivo] + ["" if v is None else v for v in valores])
+        self.total += 1
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+
+def importar_arquivo(caminho, armazenamento, lote=TAMANHO_LOTE, substituir=False, mapa=None, rejeitados=None,
+                     progresso=None, delimitador=None, codificacao="utf-8-sig", aba=None, simular=False):
+    """Importa as OSs de ``caminho`` (.xlsx ou .csv), gravando ``lote`` linhas por transação.
+
+    Linhas inválidas e OSs com número já existente (sem ``substituir``) são
+    recusadas e vão para o CSV ``rejeitados`` (padrão: o nome do arquivo com
+    ``.rejeitados.csv``). Linhas sem Numero_OS recebem o próximo número.
+    ``progresso(lidas, gravadas, recusadas)`` é chamado a cada lote. Com
+    ``simular`` as linhas só são validadas. Retorna um dict com as contagens e
+    o caminho do relatório (None se nada foi recusado).
+    """
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(caminho)
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext in EXTENSOES_PLANILHA:
+        linhas = _linhas_planilha(caminho, aba)
+    elif ext in EXTENSOES_CSV:
+        linhas = _linhas_csv(caminho, delimitador, codificacao)
+    else:
+        raise ValueError(f"Formato de arquivo não suportado: {caminho}")
+
+    try:
+        _, cabecalho = next(linhas)
+    except StopIteration:
+        raise ValueError(f"Arquivo vazio: {caminho}")
+    try:
+        colunas = mapear_colunas(cabecalho, mapa)
+    except ValueError:
+        linhas.close()
+        raise
+    ausentes = [campo for campo in CAMPOS_OBRIGATORIOS if campo not in colunas]
+    if ausentes:
+        linhas.close()
+        raise ValueError(f"Colunas obrigatórias não encontradas no cabeçalho: {', '.join(ausentes)} "
+                         f"(use o mapa de colunas para indicar os nomes usados no arquivo)")
+    ignoradas = [str(nome) for nome, coluna in zip(cabecalho, colunas) if coluna is None and nome is not None]
+    if ignoradas:
+        log.warning("Colunas ignoradas (sem correspondente na OS): %s", ", ".join(ignoradas))
+
+    relatorio = RelatorioRecusadas(rejeitados or f"{os.path.splitext(caminho)[0]}.rejeitados.csv", cabecalho)
+    lidas = gravadas = 0
+    pendentes = []  # (número da linha, valores originais, registro)
+
+    def gravar_pendentes():
+        nonlocal gravadas
+        if simular:
+            gravadas += len(pendentes)
+        else:
+            with medir("importacao.lote"):
+                numeros = armazenamento.importar_lote([registro for _, _, registro in pendentes], substituir)
+            for (numero_linha, valores, registro), numero in zip(pendentes, numeros):
+                if numero is None:
+                    relatorio.registrar(numero_linha, f"OS {registro['Numero_OS']} já existe", valores)
+                else:
+                    gravadas += 1
+        del pendentes[:]
+        if progresso:
+            progresso(lidas, gravadas, relatorio.total)
+
+    try:
+        for numero_linha, valores in linhas:
+            if all(v is None or str(v).strip() == "" for v in valores):
+                continue  # Linhas em branco (comuns no fim das planilhas) não contam
+            lidas += 1
+            dados = {coluna: _texto_celula(coluna, valor) for coluna, valor in zip(colunas, valores) if coluna}
+            registro, problemas = validar_registro(_completar_totais(dados))
+            if problemas:
+                relatorio.registrar(numero_linha, "; ".join(problemas), valores)
+                continue
+            pendentes.append((numero_linha, valores, registro))
+            if len(pendentes) >= lote:
+                gravar_pendentes()
+        gravar_pendentes()
+    finally:
+        linhas.close()
+        relatorio.fechar()
+    return {"lidas": lidas, "gravadas": gravadas, "recusadas": relatorio.total,
+            "rejeitados": relatorio.caminho if relatorio.total else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa OSs de uma planilha .xlsx ou arquivo CSV para o banco.")
+    parser.add_argument("origem", help="arquivo .xlsx ou .csv com uma OS por linha e os nomes das colunas na 1ª")
+    parser.add_argument("--banco", default=ARQUIVO_BANCO_OS, help="arquivo SQLite de destino")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="linhas gravadas por transação")
+    parser.add_argument("--substituir", action="store_true", help="sobrescreve as OSs com número já existente")
+    parser.add_argument("--mapa", help='nomes de outro sistema, ex.: "Cliente=Nome_Cliente,Placa=Placa_Veiculo"')
+    parser.add_argument("--rejeitados", help="CSV das linhas recusadas (padrão: ORIGEM.rejeitados.csv)")
+    parser.add_argument("--delimitador", help="separador do CSV (padrão: detectado)")
+    parser.add_argument("--codificacao", default="utf-8-sig", help="codificação do CSV, ex.: cp1252")
+    parser.add_argument("--aba", help="aba da planilha (padrão: a primeira)")
+    parser.add_argument("--simular", action="store_true", help="só valida as linhas, sem gravar")
+    args = parser.parse_args(argv)
+
+    def mostrar_progresso(lidas, gravadas, recusadas):
+        print(f"\r{lidas} linhas lidas, {gravadas} OS gravadas, {recusadas} recusadas", end="", file=sys.stderr,
+              flush=True)
+
+    armazenamento = None if args.simular else ArmazenamentoSQLite(args.banco)
+    try:
+        resultado = importar_arquivo(args.origem, armazenamento, lote=args.lote, substituir=args.substituir,
+                                     mapa=_ler_mapa(args.mapa), rejeitados=args.rejeitados,
+                                     progresso=mostrar_progresso, delimitador=args.delimitador,
+                                     codificacao=args.codificacao, aba=args.aba, simular=args.simular)
+    except (ValueError, OSError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if armazenamento is not None:
+            armazenamento.fechar()
+    print(file=sys.stderr)
+    acao = "válidas" if args.simular else f"importadas para {args.banco}"
+    print(f"{resultado['gravadas']} de {resultado['lidas']} OS {acao}")
+    if resultado["rejeitados"]:
+        print(f"{resultado['recusadas']} linhas recusadas; veja o motivo de cada uma em {resultado['rejeitados']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Itens (peças e serviços) das Ordens de Serviço."""
+
+import logging
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from .esquema import valor_vazio
+
+log = logging.getLogger(__name__)
+
+CHAVE_ITENS = "Itens_Pecas_Servicos"
+
+CAMPOS_ITEM = ("tipo", "referencia", "descricao", "uni", "valor", "quantia", "desc", "valor_total")
+
+CENTAVO = Decimal("0.01")
+
+
+def _texto(valor, padrao=""):
+    return padrao if valor_vazio(valor) else str(valor)
+
+
+def _numero(valor, tipo=float):
+    if valor_vazio(valor) or valor == "":
+        return tipo(0)
+    return tipo(valor)
+
+
+def normalizar_item(item):
+    """Garante os campos e tipos de um item (valores numéricos como int/float)."""
+    return {
+        "tipo": _texto(item.get("tipo")),
+        "referencia": _texto(item.get("referencia")),
+        "descricao": _texto(item.get("descricao")),
+        "uni": _texto(item.get("uni"), "un") or "un",
+        "valor": _numero(item.get("valor")),
+        "quantia": _numero(item.get("quantia"), int),
+        "desc": _numero(item.get("desc")),
+        "valor_total": _numero(item.get("valor_total")),
+    }
+
+
+def para_decimal(valor):
+    """Número (int, float, Decimal ou texto como "1.234,56") como Decimal exato; vazio vale zero.
+
+    Levanta ValueError se o texto não for um número.
+    """
+    if isinstance(valor, Decimal):
+        return valor
+    if valor_vazio(valor):
+        return Decimal(0)
+    # str() do float dá a representação curta (0.1 e não 0.1000000000000000055...)
+    texto = str(valor).strip()
+    if not texto:
+        return Decimal(0)
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {valor}")
+
+
+def arredondar_centavos(valor):
+    return para_decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def calcular_total_item(valor, quantia, desc=0):
+    """Valor unitário x quantidade menos o desconto percentual, arredondado ao centavo (Decimal)."""
+    bruto = para_decimal(valor) * int(quantia)
+    return arredondar_centavos(bruto * (100 - para_decimal(desc)) / 100)
+
+
+def formatar_detalhes_itens(itens):
+    """Texto da coluna Detalhes_Itens, mantido apenas na planilha exportada."""
+    return "; ".join([
+        f"Tipo: {item['tipo']} | Ref: {item['referencia']} | Desc: {item['descricao']} | Qtd: {item['quantia']} | Val: {item['valor']:.2f} | Desc(%): {item['desc']:.0f} | Total: {item['valor_total']:.2f}"
+        for item in itens])
+
+
+def parse_detalhes_itens(itens_str):
+    """Lê o texto de Detalhes_Itens das planilhas antigas (usado só na migração)."""
+    itens = []
+    if valor_vazio(itens_str) or not str(itens_str).strip():
+        return itens
+    for item_entry_str in str(itens_str).split('; '):
+        if not item_entry_str.strip():
+            continue
+        try:
+            # Exemplo de parse: "Tipo: Peça | Ref: 1 | Desc: Pastilhas | Qtd: 2 | Val: 50.00 | Desc(%): 0 | Total: 100.00"
+            parts = {k.strip(): v.strip() for k, v in
+                     (item.split(': ', 1) for item in item_entry_str.split(' | '))}
+
+            itens.append({
+                "tipo": parts.get("Tipo", "N/A"),
+                "referencia": parts.get("Ref", "N/A"),
+                "descricao": parts.get("Desc", "N/A"),
+                "uni": "un",  # Assumindo unidade padrão ao carregar
+                "valor": float(parts["Val"].replace('R$', '').replace(',', '').strip()) if "Val" in parts else 0.0,
+                "quantia": int(parts["Qtd"].strip()) if "Qtd" in parts else 0,
+                "desc": float(parts["Desc(%)"].replace('%', '').strip()) if "Desc(%)" in parts else 0.0,
+                "valor_total": float(
+                    parts["Total"].replace('R$', '').replace(',', '').strip()) if "Total" in parts else 0.0,
+            })
+        except Exception as e:
+            log.error("Erro ao parsear item do Excel durante a migração: '%s' - %s", item_entry_str, e)
+            # Mantém o texto bruto como descrição para não perder o item
+            itens.append(normalizar_item({"tipo": "N/A", "descricao": item_entry_str.strip()}))
+    return itens
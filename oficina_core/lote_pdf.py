@@ -0,0 +1,157 @@
+"""Exportação de várias OSs para PDF em paralelo (um processo WeasyPrint por núcleo).
+
+Uso:
+    python -m oficina_core.lote_pdf --de 01/10/2025 --ate 31/10/2025 --situacao Finalizado
+    python -m oficina_core.lote_pdf --numeros 000010,000011 --mesclar OS_outubro.pdf
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from .armazenamento import ArmazenamentoSQLite
+from .configuracao import (
+    ARQUIVO_BANCO_OS, ARQUIVO_LOGO, HTML_TEMPLATE_FILE, INFO_OFICINA, PASTA_OS_CLIENTES, URL_SERVIDOR_OS
+)
+from .itens import CHAVE_ITENS, formatar_detalhes_itens
+from .diagnostico import metricas
+from .pdf import PoolRenderizacao, aquecer, gerar_pdf_os_medido
+from .remoto import ArmazenamentoRemoto
+
+REQUISICOES_REMOTAS = 4  # PDFs pedidos ao servidor ao mesmo tempo; quem limita os processos é ele
+EM_ANDAMENTO_POR_PROCESSO = 4  # OSs enviadas ao pool e ainda não concluídas, por processo
+
+
+def nome_arquivo_pdf(numero_os):
+    # Elimina caracteres inválidos no Windows
+    safe_os_number = "".join(c for c in str(numero_os) if c.isalnum() or c == '_')
+    return f"OS_{safe_os_number}.pdf"
+
+
+def _classe_pdf_writer():
+    try:
+        from pypdf import PdfWriter
+    except ImportError as e:
+        raise RuntimeError("Para gerar um PDF único instale o pacote pypdf (pip install pypdf).") from e
+    return PdfWriter
+
+
+def mesclar_pdfs(caminhos, destino):
+    """Junta os PDFs, na ordem recebida, em um único arquivo (requer o pacote opcional pypdf)."""
+    writer = _classe_pdf_writer()()
+    for caminho in caminhos:
+        writer.append(caminho)
+    with open(destino, "wb") as f:
+        writer.write(f)
+    return destino
+
+
+def exportar_lote_pdf(armazenamento, pasta_saida=PASTA_OS_CLIENTES, arquivo_mesclado=None, processos=None,
+                      info_oficina=INFO_OFICINA, caminho_logo=ARQUIVO_LOGO, template_file=HTML_TEMPLATE_FILE,
+                      pasta_base=".", progresso=None, **filtro):
+    """Gera um PDF por OS selecionada pelo ``filtro`` (ver ``ArmazenamentoOS.filtrar``).
+
+    Com ``arquivo_mesclado`` os PDFs individuais são juntados nesse arquivo e
+    descartados. ``progresso(concluidos, total)`` é chamado a cada PDF pronto.
+    Com um ``ArmazenamentoRemoto`` os PDFs são gerados pelo servidor, no pool
+    de processos dele, e nenhum processo é iniciado aqui.
+    Retorna a lista de arquivos gerados, na ordem das OSs.
+    """
+    if arquivo_mesclado:
+        _classe_pdf_writer()  # Falha antes de renderizar tudo se o pypdf não estiver instalado
+    total = armazenamento.contar(**filtro)
+    if progresso:
+        progresso(0, total)
+    if not total:
+        return []
+
+    pasta_destino = tempfile.mkdtemp(prefix="lote_os_") if arquivo_mesclado else pasta_saida
+    os.makedirs(pasta_destino, exist_ok=True)
+    caminho_logo = os.path.abspath(caminho_logo) if caminho_logo and os.path.exists(caminho_logo) else None
+    pasta_base = os.path.abspath(pasta_base)
+
+    remoto = isinstance(armazenamento, ArmazenamentoRemoto)
+    if remoto:
+        executor = ThreadPoolExecutor(max_workers=processos or REQUISICOES_REMOTAS, thread_name_prefix="LotePDF")
+    else:
+        executor = PoolRenderizacao(max_workers=processos, initializer=aquecer,
+                                    initargs=(pasta_base, template_file, caminho_logo))
+    # As OSs saem do filtro aos poucos e só EM_ANDAMENTO_POR_PROCESSO por processo esperam na fila do pool:
+    # a memória não cresce com o tamanho do lote (só a lista de caminhos gerados)
+    em_andamento = (processos or (REQUISICOES_REMOTAS if remoto else os.cpu_count() or 1)) * EM_ANDAMENTO_POR_PROCESSO
+    caminhos, pendentes = [], set()
+    concluidos = 0
+
+    def conferir(futures):
+        nonlocal concluidos
+        for future in futures:
+            resultado = future.result()
+            if not remoto:
+                metricas.registrar_varios(resultado[1])
+            concluidos += 1
+            if progresso:
+                progresso(concluidos, max(total, concluidos))
+
+    try:
+        with executor:
+            for registro in armazenamento.filtrar(**filtro):
+                caminho = os.path.abspath(os.path.join(pasta_destino, nome_arquivo_pdf(registro["Numero_OS"])))
+                caminhos.append(caminho)
+                if len(pendentes) >= em_andamento:
+                    prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                    conferir(prontos)
+                if remoto:
+                    pendentes.add(executor.submit(armazenamento.gerar_pdf, registro["Numero_OS"], caminho))
+                    continue
+                # Os dados chegam ao template no mesmo formato usado pelo formulário
+                registro["Detalhes_Itens"] = formatar_detalhes_itens(registro[CHAVE_ITENS])
+                pendentes.add(executor.submit(gerar_pdf_os_medido, registro, caminho, info_oficina, caminho_logo,
+                                              template_file, pasta_base))
+            conferir(as_completed(pendentes))
+
+        if arquivo_mesclado:
+            return [mesclar_pdfs(caminhos, arquivo_mesclado)]
+        return caminhos
+    finally:
+        if arquivo_mesclado:
+            shutil.rmtree(pasta_destino, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os PDFs de várias Ordens de Serviço em paralelo.")
+    parser.add_argument("--banco", default=ARQUIVO_BANCO_OS, help="arquivo SQLite das OSs")
+    parser.add_argument("--servidor", default=URL_SERVIDOR_OS,
+                        help="endereço do servidor de OSs, que gera os PDFs no lugar deste computador")
+    parser.add_argument("--de", dest="data_inicio", help="data inicial (dd/MM/yyyy)")
+    parser.add_argument("--ate", dest="data_fim", help="data final (dd/MM/yyyy)")
+    parser.add_argument("--situacao", help="Situação Atual, ex.: Finalizado")
+    parser.add_argument("--numeros", help="lista de Numero_OS separados por vírgula")
+    parser.add_argument("--saida", default=PASTA_OS_CLIENTES, help="pasta dos PDFs individuais")
+    parser.add_argument("--mesclar", metavar="ARQUIVO", help="gera um único PDF com todas as OSs")
+    parser.add_argument("--processos", type=int, help="processos em paralelo (padrão: núcleos da máquina)")
+    args = parser.parse_args(argv)
+
+    numeros = [n.strip() for n in args.numeros.split(",") if n.strip()] if args.numeros else None
+
+    def mostrar_progresso(concluidos, total):
+        print(f"\r{concluidos}/{total} PDFs gerados", end="", file=sys.stderr, flush=True)
+
+    armazenamento = ArmazenamentoRemoto(args.servidor) if args.servidor else ArmazenamentoSQLite(args.banco)
+    try:
+        arquivos = exportar_lote_pdf(armazenamento, args.saida, args.mesclar, args.processos,
+                                     progresso=mostrar_progresso, data_inicio=args.data_inicio,
+                                     data_fim=args.data_fim, situacao=args.situacao, numeros=numeros)
+    finally:
+        armazenamento.fechar()
+    print(file=sys.stderr)
+    if not arquivos:
+        print("Nenhuma OS corresponde ao filtro.")
+        return 1
+    print(f"{len(arquivos)} arquivo(s) gerado(s) em {os.path.dirname(arquivos[0])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
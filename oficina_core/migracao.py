@@ -0,0 +1,48 @@
+"""Migração única dos dados antigos (planilha ou journal) para o SQLite.
+
+Uso:
+    python -m oficina_core.migracao Ordens_de_Servico.xlsx Ordens_de_Servico.db
+"""
+
+import argparse
+import os
+import sys
+
+from .armazenamento import ArmazenamentoJournal, ArmazenamentoSQLite
+
+
+def migrar(origem, armazenamento):
+    """Copia todas as OSs de ``origem`` (.xlsx ou .jsonl) para o armazenamento. Retorna o total."""
+    if not os.path.exists(origem):
+        raise FileNotFoundError(origem)
+    ext = os.path.splitext(origem)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        from .planilha import ler_excel_os
+        df = ler_excel_os(origem)
+        return armazenamento.importar(df.to_dict("records"))
+    if ext == ".jsonl":
+        journal = ArmazenamentoJournal(origem)
+        try:
+            return armazenamento.importar(journal.registros())
+        finally:
+            journal.fechar()
+    raise ValueError(f"Formato de origem não suportado: {origem}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migra as OSs de uma planilha ou journal para o banco SQLite.")
+    parser.add_argument("origem", help="Ordens_de_Servico.xlsx ou Ordens_de_Servico.jsonl")
+    parser.add_argument("destino", nargs="?", default="Ordens_de_Servico.db", help="arquivo SQLite de destino")
+    args = parser.parse_args(argv)
+
+    armazenamento = ArmazenamentoSQLite(args.destino)
+    try:
+        total = migrar(args.origem, armazenamento)
+    finally:
+        armazenamento.fechar()
+    print(f"{total} OS migradas de {args.origem} para {args.destino}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
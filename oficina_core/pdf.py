@@ -0,0 +1,252 @@
+"""Geração do PDF da OS (Jinja2 + WeasyPrint) fora da thread da interface.
+
+``gerar_pdf_os`` é uma função de módulo para poder rodar num processo do
+``PoolRenderizacao``; ``FilaRenderizacao`` devolve um Future por PDF.
+Logo e template compilado ficam em cache no processo, então só o primeiro
+PDF de cada worker paga por eles. Jinja2, PIL e WeasyPrint são importados no
+primeiro uso, para não pesar na abertura da interface. As medições de
+template e WeasyPrint feitas no worker voltam com o resultado e são somadas
+às do processo principal (ver ``oficina_core.diagnostico``).
+
+Os workers (``PoolRenderizacao``) são processos "spawn" que importam este
+pacote; com o programa iniciado pelo main.py, o PyQt5 não é carregado neles.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .diagnostico import medir, metricas
+from .esquema import COLUNAS_OS
+from .formatacao import formatar_dinheiro, formatar_km, padrao_se_vazio
+from .itens import CHAVE_ITENS
+
+log = logging.getLogger(__name__)
+
+
+def criar_ambiente_jinja(pasta_templates="."):
+    from jinja2 import Environment, FileSystemLoader
+
+    env = Environment(loader=FileSystemLoader(pasta_templates))
+    env.filters['format_money'] = formatar_dinheiro
+    env.filters['km_format'] = formatar_km
+    env.filters['default_if_nan'] = padrao_se_vazio
+    return env
+
+
+def logo_base64(caminho_logo, largura_px=100):
+    """Lê o logo, redimensiona para ``largura_px`` mantendo a proporção e devolve o PNG em Base64."""
+    from PIL import Image
+
+    # 25mm a 96 DPI (pixels por polegada) é 25 / 25.4 * 96 = ~94.5 pixels. Vamos usar 100 pixels de largura.
+    img = Image.open(caminho_logo)
+    original_width, original_height = img.size
+    new_height_px = int((largura_px / original_width) * original_height)
+    img_resized = img.resize((largura_px, new_height_px), Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img_resized.save(buf, format="PNG")  # PNG para manter qualidade e transparência
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+class CacheRecursosPDF:
+    """Guarda o logo já redimensionado em Base64 e os templates compilados.
+
+    O logo é refeito só quando o arquivo muda (mtime/tamanho e, se mudarem,
+    o hash do conteúdo); o template, quando seu mtime muda.
+    """
+
+    def __init__(self):
+        self._logos = {}  # caminho -> (mtime_ns, tamanho, sha1, largura_px, base64)
+        self._ambientes = {}  # pasta_base -> Environment
+        self._templates = {}  # (pasta_base, nome) -> (mtime_ns, Template)
+
+    def logo_base64(self, caminho_logo, largura_px=100):
+        st = os.stat(caminho_logo)
+        atual = self._logos.get(caminho_logo)
+        if atual and atual[0] == st.st_mtime_ns and atual[1] == st.st_size and atual[3] == largura_px:
+            return atual[4]
+        with open(caminho_logo, "rb") as f:
+            sha1 = hashlib.sha1(f.read()).hexdigest()
+        if atual and atual[2] == sha1 and atual[3] == largura_px:
+            dados = atual[4]  # Arquivo regravado com o mesmo conteúdo
+        else:
+            dados = logo_base64(caminho_logo, largura_px)
+        self._logos[caminho_logo] = (st.st_mtime_ns, st.st_size, sha1, largura_px, dados)
+        return dados
+
+    def template(self, pasta_base, template_file):
+        mtime = os.stat(os.path.join(pasta_base, template_file)).st_mtime_ns
+        chave = (pasta_base, template_file)
+        atual = self._templates.get(chave)
+        if atual and atual[0] == mtime:
+            return atual[1]
+        env = self._ambientes.get(pasta_base)
+        if env is None:
+            env = self._ambientes[pasta_base] = criar_ambiente_jinja(pasta_base)
+        template = env.get_template(template_file)
+        self._templates[chave] = (mtime, template)
+        return template
+
+
+# Um cache por processo: os workers do pool reaproveitam entre um PDF e outro
+_recursos = CacheRecursosPDF()
+
+
+def renderizar_html(dados, info_oficina, caminho_logo=None, template_file="os_template.html", pasta_base="."):
+    logo_base64_data = None
+    if caminho_logo and os.path.exists(caminho_logo):
+        try:
+            logo_base64_data = _recursos.logo_base64(caminho_logo)
+        except Exception as e:
+            log.error("Não foi possível redimensionar o logo e convertê-lo em Base64: %s", e)
+    else:
+        log.warning("Arquivo do logo não encontrado em: %s", caminho_logo)
+
+    with medir("pdf.template"):
+        template = _recursos.template(pasta_base, template_file)
+        return template.render({
+            'dados': dados,
+            'info_oficina': info_oficina,
+            'logo_base64': logo_base64_data,
+        })
+
+
+def gerar_pdf_os(dados, caminho_saida, info_oficina, caminho_logo=None, template_file="os_template.html",
+                 pasta_base="."):
+    """Renderiza a OS e grava o PDF em ``caminho_saida``. Retorna o caminho."""
+    from weasyprint import HTML
+
+    html_content = renderizar_html(dados, info_oficina, caminho_logo, template_file, pasta_base)
+    with medir("pdf.weasyprint"):
+        HTML(string=html_content, base_url=pasta_base).write_pdf(caminho_saida)
+    return caminho_saida
+
+
+def gerar_pdf_os_medido(*args):
+    """``gerar_pdf_os`` para rodar no pool: retorna ``(caminho, medições)`` para o processo principal somar."""
+    with metricas.capturar() as medicoes:
+        caminho = gerar_pdf_os(*args)
+    return caminho, medicoes
+
+
+def aquecer(pasta_base=".", template_file="os_template.html", caminho_logo=None):
+    """Antecipa o custo do primeiro PDF: logo, template compilado, fontes e CSS do WeasyPrint.
+
+    Usada como inicializador dos processos do pool, então nunca levanta exceção.
+    """
+    dados = {col: "" for col in COLUNAS_OS}
+    dados[CHAVE_ITENS] = []
+    try:
+        if caminho_logo and os.path.exists(caminho_logo):
+            _recursos.logo_base64(caminho_logo)
+        html_content = _recursos.template(pasta_base, template_file).render(
+            {'dados': dados, 'info_oficina': {}, 'logo_base64': None})
+    except Exception as e:
+        log.warning("Não foi possível pré-carregar o template do PDF: %s", e)
+        html_content = "<p>OS</p>"
+    try:
+        from weasyprint import HTML
+
+        # Renderizar em memória carrega fontconfig/Pango e a folha de estilos padrão
+        HTML(string=html_content, base_url=pasta_base).write_pdf()
+    except Exception as e:
+        log.warning("Não foi possível pré-carregar o WeasyPrint: %s", e)
+
+
+def _tarefa_vazia():
+    return None
+
+
+class PoolRenderizacao(ProcessPoolExecutor):
+    """``ProcessPoolExecutor`` de processos "spawn", que começam vazios em vez de copiar a interface.
+
+    Com "fork" (padrão no Linux) os workers herdariam a memória e as threads
+    do Qt. Com "spawn" cada worker importa o módulo da tarefa (este pacote,
+    sem Qt) e reexecuta o script principal como ``__mp_main__``; o programa
+    começa pelo main.py, que só importa a interface sob ``__main__``.
+    """
+
+    def __init__(self, max_workers=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                         initializer=initializer, initargs=initargs)
+
+
+class FilaRenderizacao:
+    """Fila de PDFs renderizados num pool de processos (criado no primeiro uso).
+
+    Cada processo do pool executa ``aquecer`` ao iniciar.
+    """
+
+    def __init__(self, max_workers=None, pasta_base=".", template_file="os_template.html", caminho_logo=None):
+        self.max_workers = max_workers
+        self.pasta_base = os.path.abspath(pasta_base)
+        self.template_file = template_file
+        self.caminho_logo = caminho_logo
+        self._executor = None
+
+    def _obter_executor(self):
+        if self._executor is None:
+            self._executor = PoolRenderizacao(max_workers=self.max_workers, initializer=aquecer,
+                                              initargs=(self.pasta_base, self.template_file, self.caminho_logo))
+        return self._executor
+
+    def _submeter(self, funcao, *args):
+        try:
+            return self._obter_executor().submit(funcao, *args)
+        except BrokenProcessPool:
+            # Um worker morreu (falta de memória, falha no WeasyPrint): os próximos PDFs vão para um pool novo
+            log.warning("Pool de renderização interrompido; iniciando outro")
+            self.encerrar(aguardar=False)
+            return self._obter_executor().submit(funcao, *args)
+
+    def aquecer(self):
+        """Inicia o pool já na abertura do programa, para o primeiro PDF não esperar o aquecimento."""
+        return self._submeter(_tarefa_vazia)
+
+    def enviar(self, dados, caminho_saida, info_oficina, caminho_logo=None, template_file="os_template.html",
+               pasta_base="."):
+        """Agenda a geração do PDF e retorna um ``concurrent.futures.Future`` com o caminho gerado."""
+        inicio = time.perf_counter()
+        resultado = Future()
+        resultado.set_running_or_notify_cancel()
+
+        def repassar(future):
+            # Roda numa thread do executor: soma as medições do worker e o tempo total, com a espera na fila
+            try:
+                caminho, medicoes = future.result()
+            except BaseException as e:
+                metricas.registrar("pdf.total", time.perf_counter() - inicio, erro=True)
+                resultado.set_exception(e)
+                return
+            metricas.registrar_varios(medicoes)
+            metricas.registrar("pdf.total", time.perf_counter() - inicio)
+            resultado.set_result(caminho)
+
+        self._submeter(gerar_pdf_os_medido, dados, caminho_saida, info_oficina, caminho_logo, template_file,
+                       os.path.abspath(pasta_base)).add_done_callback(repassar)
+        return resultado
+
+    def encerrar(self, aguardar=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=aguardar)
+            self._executor = None
+
+
+def abrir_arquivo(caminho):
+    """Abre o arquivo no visualizador padrão sem esperar o programa terminar."""
+    if platform.system() == "Windows":
+        os.startfile(caminho)
+    elif platform.system() == "Darwin":
+        subprocess.Popen(["open", caminho], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+    else:
+        subprocess.Popen(["xdg-open", caminho], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
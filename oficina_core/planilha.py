@@ -0,0 +1,116 @@
+"""Leitura e exportação da planilha Excel das OSs.
+
+O pandas é importado dentro das funções: a interface só precisa dele ao
+migrar, e importá-lo atrasaria a abertura do programa.
+"""
+
+import logging
+
+from .esquema import COLUNAS_OS
+
+log = logging.getLogger(__name__)
+
+
+# Tipos das colunas ao ler a planilha antiga: categorias para os campos de poucos valores, Int64 (inteiro
+# com NA) para a quilometragem e float para os valores em reais
+COLUNAS_CATEGORIA = ("Situacao_Atual", "Condicoes_Pagamento", "Combustivel_Veiculo")
+COLUNAS_INTEIRAS = ("KM_Atual_Veiculo",)
+COLUNAS_VALOR = ("Total_Itens", "Valor_Total_Final", "Deslocamento", "Desconto_Geral")
+# O read_excel converte sozinho textos com cara de número ("12.340" vira 12.34 e perde o zero); como
+# object as células chegam como o openpyxl as leu e o texto é tratado em normalizar_planilha
+TIPOS_LEITURA = dict({"Numero_OS": str}, **{col: object for col in COLUNAS_INTEIRAS + COLUNAS_VALOR})
+
+
+def _km_de_texto(valor):
+    texto = str(valor).strip()
+    if texto.endswith(".0"):
+        texto = texto[:-2]
+    texto = texto.replace(".", "").replace(",", "")
+    return int(texto) if texto.isdigit() else None
+
+
+def _valor_de_texto(valor):
+    texto = str(valor).strip()
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        return float("nan")
+
+
+def _separar_numeros(serie):
+    """Valores numéricos da coluna (NaN no resto) e a máscara das células de texto a converter à parte."""
+    import numpy as np
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        return serie.astype("float64"), pd.Series(False, index=serie.index)
+    texto = serie.map(type).eq(str)
+    # Fora do texto só há int, float e NaN, que o numpy converte de uma vez sem o to_numeric
+    numeros = np.where(texto.to_numpy(), np.nan, serie.to_numpy()).astype("float64")
+    return pd.Series(numeros, index=serie.index), texto
+
+
+def _para_inteiro(serie):
+    """Quilometragem: células numéricas inteiras passam direto; "12.345" e 12.345 viram 12345."""
+    import pandas as pd
+
+    numeros, texto = _separar_numeros(serie)
+    # Um número fracionário na coluna de KM é um milhar digitado com ponto ("12.345" lido como 12,345)
+    inteiros = numeros.where(numeros == numeros.round())
+    resultado = inteiros.astype("Int64")
+    restantes = texto | (numeros.notna() & inteiros.isna())
+    if restantes.any():
+        resultado[restantes] = pd.array([_km_de_texto(v) for v in serie[restantes]], dtype="Int64")
+    return resultado
+
+
+def _para_valor(serie):
+    """Valor em reais: células numéricas passam direto; "1.234,56" (formato brasileiro) vira 1234.56."""
+    numeros, texto = _separar_numeros(serie)
+    if texto.any():
+        numeros[texto] = [_valor_de_texto(v) for v in serie[texto]]
+    return numeros.astype("float64")
+
+
+def normalizar_planilha(df):
+    """Converte as colunas para os tipos da OS.
+
+    As células que o leitor já entregou como número são convertidas de uma vez
+    na coluna inteira; só as de texto (digitadas à mão, como "1.234,56")
+    passam pela conversão célula a célula.
+    """
+    for col in COLUNAS_OS:
+        if col not in df.columns:
+            df[col] = None
+    df["Numero_OS"] = df["Numero_OS"].fillna("").astype(str).str.strip()
+    for col in COLUNAS_INTEIRAS:
+        df[col] = _para_inteiro(df[col])
+    for col in COLUNAS_VALOR:
+        df[col] = _para_valor(df[col])
+    for col in COLUNAS_CATEGORIA:
+        df[col] = df[col].astype("category")
+    return df
+
+
+def ler_excel_os(caminho):
+    """Lê a planilha no formato das versões anteriores (fonte da migração)."""
+    import pandas as pd
+
+    return normalizar_planilha(pd.read_excel(caminho, dtype=TIPOS_LEITURA))
+
+
+def exportar_excel(armazenamento, caminho):
+    """Gera a planilha completa a partir do armazenamento. Retorna o total de OSs.
+
+    As linhas vão direto para o arquivo, sem montar um DataFrame com todas as
+    OSs (ver ``oficina_core.exportacao``). A escrita vai para um arquivo
+    temporário que substitui o destino no final, para que uma planilha aberta
+    por outro programa (ou uma queda no meio da exportação) nunca deixe o
+    arquivo pela metade.
+    """
+    from .exportacao import exportar_os
+
+    return exportar_os(armazenamento, caminho)[0]
+
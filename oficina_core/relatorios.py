@@ -0,0 +1,130 @@
+"""Relatórios gerenciais: faturamento, peças mais usadas e tempo em cada situação.
+
+Os relatórios não varrem o histórico de OSs. Eles leem os resumos que o
+armazenamento mantém atualizados a cada gravação (``resumo_faturamento``,
+``resumo_pecas`` e ``resumo_situacoes``, ver ``ArmazenamentoSQLite``). Esses
+resumos já vêm somados por dia e por situação, pagamento e responsável,
+então um relatório de vários anos agrupa poucos milhares de linhas.
+
+Os valores em dinheiro são somados em centavos (inteiros), para que somar e
+subtrair a mesma OS muitas vezes não acumule erro de arredondamento.
+"""
+
+from .esquema import data_iso
+from .itens import CHAVE_ITENS
+
+# Quantos caracteres da data ISO (aaaa-mm-dd) formam cada período
+PERIODOS = {"dia": 10, "mes": 7, "ano": 4}
+# Agrupamentos do faturamento além do período e a coluna correspondente no resumo
+DIMENSOES = {
+    "pagamento": "condicoes_pagamento",
+    "responsavel": "responsavel",
+    "situacao": "situacao",
+}
+CHAVES_FATURAMENTO = ("dia", "situacao", "condicoes_pagamento", "responsavel")
+CHAVES_PECAS = ("tipo", "referencia")
+
+
+def centavos(valor):
+    """Valor em reais para centavos inteiros (vazio conta como zero)."""
+    try:
+        return int(round(float(valor) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _texto(valor):
+    return valor if isinstance(valor, str) else ""
+
+
+def chave_faturamento(registro):
+    """Linha do resumo de faturamento à qual a OS pertence (campos vazios viram "")."""
+    return (data_iso(registro.get("Data_OS")) or "", _texto(registro.get("Situacao_Atual")),
+            _texto(registro.get("Condicoes_Pagamento")), _texto(registro.get("Responsavel")))
+
+
+def agregar_faturamento(registros):
+    """Resumo de faturamento calculado direto das OSs (backends sem resumo mantido)."""
+    totais = {}
+    for registro in registros:
+        linha = totais.setdefault(chave_faturamento(registro), [0, 0])
+        linha[0] += 1
+        linha[1] += centavos(registro.get("Valor_Total_Final"))
+    return [dict(zip(CHAVES_FATURAMENTO, chave), ordens=ordens, centavos=total)
+            for chave, (ordens, total) in totais.items()]
+
+
+def agregar_pecas(registros, tipo=None):
+    """Resumo de peças e serviços por referência calculado direto das OSs."""
+    totais, descricoes = {}, {}
+    for registro in registros:
+        da_os = {}
+        for item in registro.get(CHAVE_ITENS) or []:
+            chave = (_texto(item.get("tipo")), _texto(item.get("referencia")))
+            if tipo and chave[0] != tipo:
+                continue
+            linha = da_os.setdefault(chave, [0, 0.0])
+            linha[0] += item.get("quantia") or 0
+            linha[1] += item.get("valor_total") or 0
+            descricoes.setdefault(chave, item.get("descricao"))
+        for chave, (quantidade, total) in da_os.items():
+            linha = totais.setdefault(chave, [0, 0, 0])
+            linha[0] += quantidade
+            linha[1] += centavos(total)
+            linha[2] += 1
+    return [dict(zip(CHAVES_PECAS, chave), descricao=descricoes.get(chave), quantidade=quantidade, centavos=total,
+                 ordens=ordens)
+            for chave, (quantidade, total, ordens) in totais.items()]
+
+
+def faturamento(armazenamento, periodo="mes", por=None, data_inicio=None, data_fim=None, situacao=None):
+    """Número de OSs e soma de Valor_Total_Final por período (dia, mes ou ano).
+
+    ``por`` acrescenta um agrupamento (pagamento, responsavel ou situacao);
+    as datas (dd/MM/yyyy, inclusivas) e ``situacao`` filtram as OSs. Retorna
+    dicts com ``periodo``, a coluna de ``por`` (se houver), ``ordens`` e
+    ``valor``, em ordem de período.
+    """
+    if periodo not in PERIODOS:
+        raise ValueError(f"Período não suportado: {periodo}")
+    if por is not None and por not in DIMENSOES:
+        raise ValueError(f"Agrupamento não suportado: {por}")
+    tamanho = PERIODOS[periodo]
+    totais = {}
+    for linha in armazenamento.resumo_faturamento(data_inicio, data_fim):
+        if situacao and linha["situacao"] != situacao:
+            continue
+        chave = (linha["dia"][:tamanho], linha[DIMENSOES[por]] if por else None)
+        soma = totais.setdefault(chave, [0, 0])
+        soma[0] += linha["ordens"]
+        soma[1] += linha["centavos"]
+    resultado = []
+    for (chave_periodo, grupo), (ordens, total) in sorted(totais.items()):
+        linha = {"periodo": chave_periodo}
+        if por:
+            linha[por] = grupo
+        linha.update(ordens=ordens, valor=total / 100)
+        resultado.append(linha)
+    return resultado
+
+
+def pecas_mais_usadas(armazenamento, limite=20, tipo="Peça"):
+    """Referências mais usadas (por quantidade) com descrição, quantidade, valor e número de OSs."""
+    return [{"referencia": linha["referencia"], "descricao": linha["descricao"], "quantidade": linha["quantidade"],
+             "valor": linha["centavos"] / 100, "ordens": linha["ordens"]}
+            for linha in armazenamento.resumo_pecas(tipo, limite)]
+
+
+def tempo_por_situacao(armazenamento):
+    """Para cada situação: OSs nela agora, mudanças registradas e tempo médio (em horas) até a OS sair dela.
+
+    O tempo só é conhecido para as OSs que mudaram de situação depois que o
+    histórico passou a ser registrado; ``media_horas`` é None sem nenhuma.
+    Os períodos de OSs apagadas depois continuam na média.
+    """
+    resultado = []
+    for linha in armazenamento.resumo_situacoes():
+        media = linha["segundos"] / linha["intervalos"] / 3600 if linha["intervalos"] else None
+        resultado.append({"situacao": linha["situacao"], "ordens": linha["ordens"], "mudancas": linha["intervalos"],
+                          "media_horas": media})
+    return resultado
@@ -0,0 +1,210 @@
+"""Cliente do servidor local (``oficina_core.servidor``) com a mesma interface dos armazenamentos.
+
+Cada thread mantém sua própria conexão HTTP aberta (keep-alive), como o
+``ArmazenamentoSQLite`` faz com as conexões do banco.
+"""
+
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlsplit
+
+from .armazenamento import ArmazenamentoOS, ConflitoVersao
+
+
+class ErroServidor(Exception):
+    """O servidor respondeu com erro ou não pôde ser contatado."""
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _query(filtro):
+    parametros = {}
+    for campo, valor in filtro.items():
+        if valor is None:
+            continue
+        parametros[campo] = ",".join(valor) if campo == "numeros" else valor
+    return parametros
+
+
+class ArmazenamentoRemoto(ArmazenamentoOS):
+    """Armazenamento que repassa cada operação ao servidor de OSs."""
+
+    novo = False
+    TAMANHO_LOTE = 500  # OSs por requisição ao percorrer um filtro (exportação, lote de PDFs)
+
+    def __init__(self, url, timeout=30):
+        partes = urlsplit(url if "//" in url else f"http://{url}")
+        self.url = url
+        self._host = partes.hostname
+        self._porta = partes.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conexoes = []
+        self._lock_conexoes = threading.Lock()
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self._host, self._porta, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock_conexoes:
+                self._conexoes.append(conn)
+        return conn
+
+    def _requisitar(self, metodo, caminho, parametros=None, corpo=None):
+        if parametros:
+            caminho = f"{caminho}?{urlencode(parametros)}"
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8") if corpo is not None else None
+        cabecalhos = {"Content-Type": "application/json"} if dados is not None else {}
+        for tentativa in range(2):
+            conn = self._conexao()
+            try:
+                conn.request(metodo, caminho, body=dados, headers=cabecalhos)
+                resposta = conn.getresponse()
+                conteudo = resposta.read()
+                break
+            except (http.client.HTTPException, ConnectionError) as e:
+                # A conexão guardada pode ter caído (servidor reiniciado): reabre e tenta uma vez mais, só no GET.
+                # POST, PUT e DELETE podem ter sido aplicados antes da queda, e repeti-los criaria a OS duas
+                # vezes, daria ConflitoVersao na versão que a própria tentativa anterior já gravou, ou 404
+                conn.close()
+                if tentativa or metodo != "GET":
+                    raise ErroServidor(f"Falha ao contatar o servidor {self.url}: {e}") from e
+            except OSError as e:
+                conn.close()
+                raise ErroServidor(f"Falha ao contatar o servidor {self.url}: {e}") from e
+        if resposta.getheader("Content-Type", "").startswith("application/pdf"):
+            return resposta.status, conteudo
+        valor = json.loads(conteudo.decode("utf-8")) if conteudo else None
+        if resposta.status == 409 and valor and "conflito" in valor:
+            conflito = valor["conflito"]
+            raise ConflitoVersao(conflito["numero_os"], conflito["versao_esperada"], conflito["versao_atual"])
+        if resposta.status >= 400 and resposta.status != 404:
+            raise ErroServidor((valor or {}).get("erro") or f"Erro {resposta.status} do servidor", resposta.status)
+        return resposta.status, valor
+
+    @staticmethod
+    def _caminho_os(numero_os, sufixo=""):
+        return f"/os/{quote(str(numero_os).strip(), safe='')}{sufixo}"
+
+    def obter(self, numero_os):
+        status, registro = self._requisitar("GET", self._caminho_os(numero_os))
+        return registro if status != 404 else None
+
+    def salvar(self, registro, versao_esperada=None):
+        status, _ = self._requisitar("PUT", self._caminho_os(registro["Numero_OS"]),
+                                     corpo={"registro": registro, "versao_esperada": versao_esperada})
+        return status == 201
+
+    def proximo_numero_os(self):
+        return self._requisitar("GET", "/consultas/proximo-numero")[1]["Numero_OS"]
+
+    def criar(self, registro):
+        return self._requisitar("POST", "/os", corpo=registro)[1]["Numero_OS"]
+
+    def deletar(self, numero_os, versao_esperada=None):
+        parametros = {"versao_esperada": versao_esperada} if versao_esperada is not None else None
+        status, _ = self._requisitar("DELETE", self._caminho_os(numero_os), parametros)
+        return status != 404
+
+    def registros(self):
+        return iter(self.filtrar())
+
+    def filtrar(self, **filtro):
+        # Aos trechos (filtrar_lote no servidor): nem lá nem aqui a lista inteira fica em memória
+        apos = None
+        while True:
+            registros, apos = self.filtrar_lote(apos, self.TAMANHO_LOTE, **filtro)
+            yield from registros
+            if apos is None:
+                return
+
+    def filtrar_lote(self, apos=None, limite=500, **filtro):
+        resposta = self._requisitar("GET", "/consultas/filtro", _query(dict(filtro, apos=apos, limite=limite)))[1]
+        return resposta["registros"], resposta["apos"]
+
+    def contar(self, consulta=None, **filtro):
+        parametros = _query(dict(filtro, consulta=consulta or None))
+        return self._requisitar("GET", "/consultas/contagem", parametros)[1]["total"]
+
+    def listar_pagina(self, ordem="Data_OS", decrescente=True, limite=200, deslocamento=0, consulta=None, **filtro):
+        parametros = _query(dict(filtro, ordem=ordem, decrescente=int(decrescente), limite=limite,
+                                 deslocamento=deslocamento, consulta=consulta or None))
+        return self._requisitar("GET", "/consultas/lista", parametros)[1]
+
+    def buscar(self, consulta, limite=50, deslocamento=0):
+        resposta = self._requisitar("GET", "/os", {"consulta": consulta, "limite": limite,
+                                                   "deslocamento": deslocamento})[1]
+        return resposta["registros"], resposta["total"]
+
+    def clientes(self):
+        return self._requisitar("GET", "/clientes")[1]
+
+    def veiculos(self):
+        return self._requisitar("GET", "/veiculos")[1]
+
+    def resumo_faturamento(self, data_inicio=None, data_fim=None):
+        return self._requisitar("GET", "/resumos/faturamento",
+                                _query({"data_inicio": data_inicio, "data_fim": data_fim}))[1]
+
+    def resumo_pecas(self, tipo=None, limite=None):
+        return self._requisitar("GET", "/resumos/pecas", _query({"tipo": tipo, "limite": limite}))[1]
+
+    def resumo_situacoes(self):
+        return self._requisitar("GET", "/resumos/situacoes")[1]
+
+    def diagnostico_servidor(self):
+        """Tempos medidos no servidor (ver ``oficina_core.diagnostico``), por rota e operação."""
+        return self._requisitar("GET", "/diagnostico")[1]
+
+    def revisao_atual(self):
+        return self._requisitar("GET", "/revisao")[1]["revisao"]
+
+    def alteracoes_desde(self, revisao):
+        resposta = self._requisitar("GET", "/alteracoes", {"desde": revisao})[1]
+        return resposta["revisao"], resposta["registros"], resposta["removidos"]
+
+    def gerar_pdf(self, numero_os, caminho_saida):
+        """Pede o PDF da OS ao servidor e grava em ``caminho_saida``. Retorna o caminho."""
+        status, conteudo = self._requisitar("POST", self._caminho_os(numero_os, "/pdf"))
+        if status == 404:
+            raise ErroServidor(f"OS {numero_os} não encontrada", status)
+        with open(caminho_saida, "wb") as f:
+            f.write(conteudo)
+        return caminho_saida
+
+    def __len__(self):
+        return self._requisitar("GET", "/saude")[1]["total"]
+
+    def fechar(self):
+        with self._lock_conexoes:
+            for conn in self._conexoes:
+                conn.close()
+            self._conexoes = []
+        self._local = threading.local()
+
+
+class FilaRenderizacaoRemota:
+    """Mesma interface da ``pdf.FilaRenderizacao``, mas quem gera o PDF é o servidor (POST /os/<numero>/pdf).
+
+    O servidor renderiza a OS gravada no banco, no pool de processos que ele
+    mantém aquecido; aqui as threads só esperam a resposta e gravam o arquivo.
+    """
+
+    def __init__(self, armazenamento, max_workers=2):
+        self.armazenamento = armazenamento
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PDFRemoto")
+
+    def aquecer(self):
+        return None
+
+    def enviar(self, dados, caminho_saida, *args, **kwargs):
+        """Pede o PDF da OS ``dados["Numero_OS"]``; retorna um ``concurrent.futures.Future`` com o caminho."""
+        return self._executor.submit(self.armazenamento.gerar_pdf, dados["Numero_OS"], caminho_saida)
+
+    def encerrar(self, aguardar=True):
+        self._executor.shutdown(wait=aguardar)
@@ -0,0 +1,123 @@
+"""Repositório em memória das OSs com índices mantidos a cada alteração.
+
+Usado pelo ``ArmazenamentoJournal``, que guarda o estado atual em memória:
+obter uma OS é uma consulta ao hash Numero_OS -> posição, e as buscas por
+placa, CPF/CNPJ e texto usam índices secundários, sem percorrer todos os
+registros.
+"""
+
+from .busca import IndiceTexto
+from .cadastros import chave_cliente, chave_veiculo
+
+
+def _ordem_numero(numero_os):
+    # Números só com dígitos ordenam pelo valor e ficam à frente dos demais na ordem decrescente
+    return (1, int(numero_os), "") if numero_os.isdigit() else (0, 0, numero_os)
+
+
+class RepositorioOS:
+    """Registros numa lista, com índice primário por Numero_OS e secundários por placa, documento e texto.
+
+    Ao remover, a posição vira um buraco (None) para não deslocar as demais;
+    a lista é compactada quando os buracos passam da metade, o que mantém a
+    remoção O(1) amortizada e preserva a ordem de inserção.
+    """
+
+    def __init__(self, registros=()):
+        self._linhas = []
+        self._posicao = {}  # Numero_OS -> índice em _linhas
+        self._por_placa = {}  # chave_veiculo -> {Numero_OS}
+        self._por_documento = {}  # chave_cliente -> {Numero_OS}
+        self.indice_texto = IndiceTexto()
+        self._buracos = 0
+        for registro in registros:
+            self.gravar(registro)
+
+    @staticmethod
+    def _indexar(indice, chave, numero_os):
+        if chave:
+            indice.setdefault(chave, set()).add(numero_os)
+
+    @staticmethod
+    def _desindexar(indice, chave, numero_os):
+        numeros = indice.get(chave)
+        if numeros is not None:
+            numeros.discard(numero_os)
+            if not numeros:
+                del indice[chave]
+
+    def _atualizar_secundarios(self, antigo, novo):
+        numero_os = novo["Numero_OS"] if novo is not None else antigo["Numero_OS"]
+        for indice, campo, chave in ((self._por_placa, "Placa_Veiculo", chave_veiculo),
+                                     (self._por_documento, "CPF_CNPJ_Cliente", chave_cliente)):
+            chave_antiga = chave(antigo.get(campo)) if antigo is not None else None
+            chave_nova = chave(novo.get(campo)) if novo is not None else None
+            if chave_antiga == chave_nova:
+                continue
+            if antigo is not None:
+                self._desindexar(indice, chave_antiga, numero_os)
+            if novo is not None:
+                self._indexar(indice, chave_nova, numero_os)
+
+    def obter(self, numero_os):
+        """Registro armazenado (sem cópia) ou None."""
+        posicao = self._posicao.get(numero_os)
+        return self._linhas[posicao] if posicao is not None else None
+
+    def gravar(self, registro):
+        """Insere ou substitui o registro. Retorna True se ele é novo."""
+        numero_os = registro["Numero_OS"]
+        posicao = self._posicao.get(numero_os)
+        if posicao is None:
+            self._posicao[numero_os] = len(self._linhas)
+            self._linhas.append(registro)
+            self._atualizar_secundarios(None, registro)
+            self.indice_texto.indexar(registro)
+            return True
+        antigo = self._linhas[posicao]
+        self._linhas[posicao] = registro
+        self._atualizar_secundarios(antigo, registro)
+        self.indice_texto.indexar(registro)
+        return False
+
+    def remover(self, numero_os):
+        """Remove o registro. Retorna o registro removido ou None se não existia."""
+        posicao = self._posicao.pop(numero_os, None)
+        if posicao is None:
+            return None
+        antigo = self._linhas[posicao]
+        self._linhas[posicao] = None
+        self._buracos += 1
+        self._atualizar_secundarios(antigo, None)
+        self.indice_texto.remover(numero_os)
+        if self._buracos > len(self._linhas) // 2:
+            self._compactar()
+        return antigo
+
+    def _compactar(self):
+        self._linhas = [r for r in self._linhas if r is not None]
+        self._posicao = {r["Numero_OS"]: i for i, r in enumerate(self._linhas)}
+        self._buracos = 0
+
+    def por_placa(self, placa):
+        return [self._linhas[self._posicao[n]] for n in sorted(self._por_placa.get(chave_veiculo(placa), ()))]
+
+    def por_documento(self, cpf_cnpj):
+        return [self._linhas[self._posicao[n]]
+                for n in sorted(self._por_documento.get(chave_cliente(cpf_cnpj), ()))]
+
+    def buscar(self, consulta):
+        """Numero_OS que atendem a busca textual, do mais recente para o mais antigo."""
+        return sorted(self.indice_texto.numeros(consulta), key=_ordem_numero, reverse=True)
+
+    def numeros(self):
+        return [r["Numero_OS"] for r in self._linhas if r is not None]
+
+    def __iter__(self):
+        return (r for r in self._linhas if r is not None)
+
+    def __contains__(self, numero_os):
+        return numero_os in self._posicao
+
+    def __len__(self):
+        return len(self._posicao)
@@ -0,0 +1,406 @@
+"""Servidor local das OSs: uma API JSON sobre HTTP compartilhada pelos terminais.
+
+Um único processo mantém o banco aberto (uma conexão SQLite por thread do
+pool), a exportação da planilha, os snapshots e o pool de processos que
+gera os PDFs. As telas e os scripts usam ``remoto.ArmazenamentoRemoto``
+apontando para ele em vez de abrir o banco cada um.
+
+Uso:
+    python -m oficina_core.servidor --host 0.0.0.0 --porta 8765
+    OFICINA_SERVIDOR=http://192.168.0.10:8765 python main.py   (nos terminais)
+
+Rotas (corpo e respostas em JSON, exceto o PDF):
+    GET    /saude
+    GET    /os?consulta=&limite=&deslocamento=     busca textual
+    GET    /consultas/lista?ordem=&decrescente=&limite=&deslocamento=&consulta=&<filtro>
+    GET    /consultas/contagem?consulta=&<filtro>
+    GET    /consultas/filtro?apos=&limite=&<filtro> um trecho das OSs do filtro e a posição do seguinte
+    GET    /consultas/proximo-numero
+    GET    /os/<numero>
+    POST   /os                                      cria (o servidor atribui o número)
+    PUT    /os/<numero>        {"registro": ..., "versao_esperada": ...}
+    DELETE /os/<numero>?versao_esperada=
+    POST   /os/<numero>/pdf                         application/pdf
+    GET    /alteracoes?desde=<revisao>
+    GET    /revisao
+    GET    /clientes, /veiculos
+    GET    /resumos/faturamento?data_inicio=&data_fim=
+    GET    /resumos/pecas?tipo=&limite=
+    GET    /resumos/situacoes
+    GET    /diagnostico                             tempos por rota e operação (oficina_core.diagnostico)
+O <filtro> são os parâmetros de ``ArmazenamentoOS.filtrar`` (data_inicio,
+data_fim, situacao, condicoes_pagamento e numeros separados por vírgula).
+Sob /os/ só ficam as OSs, para qualquer número (mesmo "lista") ser uma OS.
+Conflitos de versão respondem 409 com os dados de ``ConflitoVersao``.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .armazenamento import ArmazenamentoSQLite, ConflitoVersao
+from .configuracao import (
+    ARQUIVO_BANCO_OS, ARQUIVO_LOGO, HTML_TEMPLATE_FILE, INFO_OFICINA, PORTA_SERVIDOR
+)
+from .diagnostico import configurar_log, medir, metricas
+from .itens import CHAVE_ITENS, formatar_detalhes_itens
+from .pdf import FilaRenderizacao
+from .snapshots import agendar_snapshot
+
+log = logging.getLogger(__name__)
+
+TAMANHO_MAXIMO_CORPO = 16 * 1024 * 1024
+CAMPOS_FILTRO = ("data_inicio", "data_fim", "situacao", "condicoes_pagamento")
+
+_MOTIVOS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+            500: "Internal Server Error"}
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _parametro(query, nome, padrao=None):
+    valores = query.get(nome)
+    return valores[0] if valores else padrao
+
+
+def _inteiro(query, nome, padrao=None):
+    valor = _parametro(query, nome)
+    if valor in (None, ""):
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErroHTTP(400, f"Parâmetro {nome} deve ser um número inteiro")
+
+
+def filtro_da_query(query):
+    """Parâmetros de ``ArmazenamentoOS.filtrar`` a partir da query string."""
+    filtro = {campo: _parametro(query, campo) or None for campo in CAMPOS_FILTRO}
+    numeros = _parametro(query, "numeros")
+    filtro["numeros"] = [n for n in numeros.split(",") if n] if numeros is not None else None
+    return filtro
+
+
+class ServidorOS:
+    """Atende a API sobre um ``ArmazenamentoSQLite``.
+
+    As chamadas ao banco rodam num pool de threads (cada uma com sua conexão)
+    para não bloquear o laço asyncio; os PDFs vão para a ``FilaRenderizacao``.
+    """
+
+    def __init__(self, armazenamento, fila_pdf=None, threads=8, info_oficina=INFO_OFICINA,
+                 caminho_logo=None, template_file=HTML_TEMPLATE_FILE, pasta_base="."):
+        self.armazenamento = armazenamento
+        self.fila_pdf = fila_pdf
+        self.info_oficina = info_oficina
+        self.caminho_logo = caminho_logo
+        self.template_file = template_file
+        self.pasta_base = os.path.abspath(pasta_base)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ServidorOS")
+        self._rotas = [
+            ("GET", r"/saude", self._saude),
+            ("GET", r"/revisao", self._revisao),
+            ("GET", r"/alteracoes", self._alteracoes),
+            ("GET", r"/clientes", self._clientes),
+            ("GET", r"/veiculos", self._veiculos),
+            ("GET", r"/resumos/faturamento", self._resumo_faturamento),
+            ("GET", r"/resumos/pecas", self._resumo_pecas),
+            ("GET", r"/resumos/situacoes", self._resumo_situacoes),
+            ("GET", r"/diagnostico", self._diagnostico),
+            ("GET", r"/os", self._buscar),
+            ("POST", r"/os", self._criar),
+            ("GET", r"/consultas/lista", self._listar),
+            ("GET", r"/consultas/contagem", self._contar),
+            ("GET", r"/consultas/filtro", self._filtrar),
+            ("GET", r"/consultas/proximo-numero", self._proximo_numero),
+            ("GET", r"/os/([^/]+)", self._obter),
+            ("PUT", r"/os/([^/]+)", self._salvar),
+            ("DELETE", r"/os/([^/]+)", self._deletar),
+            ("POST", r"/os/([^/]+)/pdf", self._pdf),
+        ]
+        self._rotas = [(metodo, re.compile(padrao + "$"), funcao) for metodo, padrao, funcao in self._rotas]
+
+    async def _no_pool(self, funcao, *args, **kwargs):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, lambda: funcao(*args, **kwargs))
+
+    # --- Rotas ---
+    async def _saude(self, query, corpo):
+        return 200, {"ok": True, "total": await self._no_pool(len, self.armazenamento)}
+
+    async def _revisao(self, query, corpo):
+        return 200, {"revisao": await self._no_pool(self.armazenamento.revisao_atual)}
+
+    async def _alteracoes(self, query, corpo):
+        revisao, registros, removidos = await self._no_pool(self.armazenamento.alteracoes_desde,
+                                                            _inteiro(query, "desde", 0))
+        return 200, {"revisao": revisao, "registros": registros, "removidos": removidos}
+
+    async def _clientes(self, query, corpo):
+        return 200, await self._no_pool(self.armazenamento.clientes)
+
+    async def _veiculos(self, query, corpo):
+        return 200, await self._no_pool(self.armazenamento.veiculos)
+
+    async def _resumo_faturamento(self, query, corpo):
+        return 200, await self._no_pool(self.armazenamento.resumo_faturamento, _parametro(query, "data_inicio"),
+                                        _parametro(query, "data_fim"))
+
+    async def _resumo_pecas(self, query, corpo):
+        return 200, await self._no_pool(self.armazenamento.resumo_pecas, _parametro(query, "tipo"),
+                                        _inteiro(query, "limite"))
+
+    async def _resumo_situacoes(self, query, corpo):
+        return 200, await self._no_pool(self.armazenamento.resumo_situacoes)
+
+    async def _diagnostico(self, query, corpo):
+        return 200, metricas.instantaneo()
+
+    async def _buscar(self, query, corpo):
+        registros, total = await self._no_pool(self.armazenamento.buscar, _parametro(query, "consulta", ""),
+                                               _inteiro(query, "limite", 50), _inteiro(query, "deslocamento", 0))
+        return 200, {"registros": registros, "total": total}
+
+    async def _listar(self, query, corpo):
+        try:
+            pagina = await self._no_pool(
+                self.armazenamento.listar_pagina, ordem=_parametro(query, "ordem", "Data_OS"),
+                decrescente=_parametro(query, "decrescente", "1") not in ("0", "false"),
+                limite=_inteiro(query, "limite", 200), deslocamento=_inteiro(query, "deslocamento", 0),
+                consulta=_parametro(query, "consulta") or None, **filtro_da_query(query))
+        except ValueError as e:
+            raise ErroHTTP(400, str(e))
+        return 200, pagina
+
+    async def _contar(self, query, corpo):
+        total = await self._no_pool(self.armazenamento.contar, _parametro(query, "consulta") or None,
+                                    **filtro_da_query(query))
+        return 200, {"total": total}
+
+    async def _filtrar(self, query, corpo):
+        try:
+            limite = max(1, min(_inteiro(query, "limite", 500), 5000))
+            registros, apos = await self._no_pool(self.armazenamento.filtrar_lote, _parametro(query, "apos"), limite,
+                                                  **filtro_da_query(query))
+        except (ValueError, TypeError) as e:
+            raise ErroHTTP(400, f"Posição inválida: {e}")
+        return 200, {"registros": registros, "apos": apos}
+
+    async def _proximo_numero(self, query, corpo):
+        return 200, {"Numero_OS": await self._no_pool(self.armazenamento.proximo_numero_os)}
+
+    async def _obter(self, query, corpo, numero_os):
+        registro = await self._no_pool(self.armazenamento.obter, numero_os)
+        if registro is None:
+            raise ErroHTTP(404, f"OS {numero_os} não encontrada")
+        return 200, registro
+
+    async def _criar(self, query, corpo):
+        numero_os = await self._no_pool(self.armazenamento.criar, self._json(corpo))
+        return 201, {"Numero_OS": numero_os}
+
+    async def _salvar(self, query, corpo, numero_os):
+        dados = self._json(corpo)
+        if not isinstance(dados.get("registro"), dict):
+            raise ErroHTTP(400, "O campo registro deve ser um objeto JSON")
+        registro = dict(dados["registro"], Numero_OS=numero_os)
+        criada = await self._no_pool(self.armazenamento.salvar, registro,
+                                     versao_esperada=dados.get("versao_esperada"))
+        return (201 if criada else 200), {"criada": criada}
+
+    async def _deletar(self, query, corpo, numero_os):
+        deletada = await self._no_pool(self.armazenamento.deletar, numero_os,
+                                       versao_esperada=_inteiro(query, "versao_esperada"))
+        if not deletada:
+            raise ErroHTTP(404, f"OS {numero_os} não encontrada")
+        return 200, {"deletada": True}
+
+    async def _pdf(self, query, corpo, numero_os):
+        if self.fila_pdf is None:
+            raise ErroHTTP(405, "Este servidor não gera PDFs")
+        registro = await self._no_pool(self.armazenamento.obter, numero_os)
+        if registro is None:
+            raise ErroHTTP(404, f"OS {numero_os} não encontrada")
+        registro["Detalhes_Itens"] = formatar_detalhes_itens(registro[CHAVE_ITENS])
+        descritor, caminho = tempfile.mkstemp(suffix=".pdf")
+        os.close(descritor)
+        try:
+            future = self.fila_pdf.enviar(registro, caminho, self.info_oficina, self.caminho_logo,
+                                          self.template_file, self.pasta_base)
+            await asyncio.wrap_future(future)
+            with open(caminho, "rb") as f:
+                return 200, f.read()
+        finally:
+            os.remove(caminho)
+
+    @staticmethod
+    def _json(corpo):
+        try:
+            dados = json.loads(corpo.decode("utf-8")) if corpo else {}
+        except ValueError as e:
+            raise ErroHTTP(400, f"JSON inválido: {e}")
+        if not isinstance(dados, dict):
+            raise ErroHTTP(400, "O corpo deve ser um objeto JSON")
+        return dados
+
+    # --- HTTP ---
+    async def despachar(self, metodo, alvo, corpo):
+        """Executa a rota e retorna ``(status, resposta)``; a resposta é bytes (PDF) ou um valor JSON."""
+        partes = urlsplit(alvo)
+        # As rotas casam com o caminho ainda codificado e cada trecho é decodificado depois,
+        # para que um Numero_OS com "/" (%2F) continue sendo um trecho só
+        caminho = partes.path.rstrip("/") or "/"
+        query = parse_qs(partes.query)
+        metodo_invalido = False
+        for metodo_rota, padrao, funcao in self._rotas:
+            encontrado = padrao.match(caminho)
+            if encontrado is None:
+                continue
+            if metodo_rota != metodo:
+                metodo_invalido = True
+                continue
+            try:
+                with medir(f"servidor.{funcao.__name__.lstrip('_')}"):
+                    return await funcao(query, corpo, *(unquote(trecho) for trecho in encontrado.groups()))
+            except ErroHTTP as e:
+                return e.status, {"erro": str(e)}
+            except ConflitoVersao as e:
+                conflito = {"numero_os": e.numero_os, "versao_esperada": e.versao_esperada,
+                            "versao_atual": e.versao_atual}
+                return 409, {"erro": str(e), "conflito": conflito}
+            except Exception as e:
+                log.exception("Erro ao atender %s %s: %s", metodo, alvo, e)
+                return 500, {"erro": str(e)}
+        if metodo_invalido:
+            return 405, {"erro": f"Método {metodo} não permitido em {unquote(caminho)}"}
+        return 404, {"erro": f"Rota {unquote(caminho)} não encontrada"}
+
+    async def atender(self, reader, writer):
+        """Uma conexão HTTP/1.1, mantida aberta entre requisições (keep-alive)."""
+        try:
+            while True:
+                try:
+                    linha = await reader.readline()
+                except ValueError:
+                    # Linha maior que o limite do StreamReader (64 KiB): responde e fecha, sem procurar o fim dela
+                    writer.write(self._resposta(400, {"erro": "Linha de requisição grande demais"}, True))
+                    await writer.drain()
+                    break
+                if not linha.strip():
+                    break
+                try:
+                    metodo, alvo, _ = linha.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                cabecalhos = {}
+                try:
+                    while True:
+                        linha = await reader.readline()
+                        if linha in (b"\r\n", b"\n", b""):
+                            break
+                        nome, _, valor = linha.decode("latin-1").partition(":")
+                        cabecalhos[nome.strip().lower()] = valor.strip()
+                except ValueError:
+                    writer.write(self._resposta(431, {"erro": "Cabeçalho grande demais"}, True))
+                    await writer.drain()
+                    break
+                try:
+                    tamanho = int(cabecalhos.get("content-length") or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    # Sem saber onde o corpo termina, a conexão não pode ser reaproveitada
+                    status, resposta = 400, {"erro": "Cabeçalho Content-Length inválido"}
+                    cabecalhos["connection"] = "close"
+                elif tamanho > TAMANHO_MAXIMO_CORPO:
+                    status, resposta = 413, {"erro": "Corpo da requisição grande demais"}
+                    cabecalhos["connection"] = "close"
+                else:
+                    corpo = await reader.readexactly(tamanho) if tamanho else b""
+                    status, resposta = await self.despachar(metodo.upper(), alvo, corpo)
+                fechar = cabecalhos.get("connection", "").lower() == "close"
+                writer.write(self._resposta(status, resposta, fechar))
+                await writer.drain()
+                if fechar:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _resposta(status, resposta, fechar):
+        if isinstance(resposta, bytes):
+            tipo, corpo = "application/pdf", resposta
+        else:
+            tipo, corpo = "application/json; charset=utf-8", json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+        cabecalho = (f"HTTP/1.1 {status} {_MOTIVOS.get(status, '')}\r\n"
+                     f"Content-Type: {tipo}\r\n"
+                     f"Content-Length: {len(corpo)}\r\n"
+                     f"Connection: {'close' if fechar else 'keep-alive'}\r\n\r\n")
+        return cabecalho.encode("latin-1") + corpo
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+        if self.fila_pdf is not None:
+            self.fila_pdf.encerrar()
+        self.armazenamento.fechar()
+
+
+async def _snapshots_periodicos(caminho_banco):
+    # O servidor fica dias no ar: confere de hora em hora se o snapshot diário venceu
+    while True:
+        agendar_snapshot(caminho_banco)
+        await asyncio.sleep(3600)
+
+
+async def _servir(servidor, host, porta, caminho_banco):
+    tcp = await asyncio.start_server(servidor.atender, host, porta)
+    enderecos = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in tcp.sockets)
+    print(f"Servidor de OSs atendendo em {enderecos}")
+    snapshots = asyncio.ensure_future(_snapshots_periodicos(caminho_banco))
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        snapshots.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local das Ordens de Serviço (API JSON/HTTP).")
+    parser.add_argument("--banco", default=ARQUIVO_BANCO_OS, help="arquivo SQLite das OSs")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço de escuta (0.0.0.0 para a rede local)")
+    parser.add_argument("--porta", type=int, default=PORTA_SERVIDOR)
+    parser.add_argument("--threads", type=int, default=8, help="conexões simultâneas ao banco")
+    parser.add_argument("--processos-pdf", type=int, default=2, help="processos que geram PDFs")
+    args = parser.parse_args(argv)
+
+    configurar_log()
+    armazenamento = ArmazenamentoSQLite(args.banco)
+    caminho_logo = os.path.abspath(ARQUIVO_LOGO) if os.path.exists(ARQUIVO_LOGO) else None
+    fila_pdf = FilaRenderizacao(max_workers=args.processos_pdf, pasta_base=".", template_file=HTML_TEMPLATE_FILE,
+                                caminho_logo=caminho_logo)
+    fila_pdf.aquecer()
+    servidor = ServidorOS(armazenamento, fila_pdf, threads=args.threads, caminho_logo=caminho_logo)
+    try:
+        asyncio.run(_servir(servidor, args.host, args.porta, args.banco))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.encerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
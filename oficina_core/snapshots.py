@@ -0,0 +1,179 @@
+"""Cópias do banco num ponto no tempo (snapshots), com rodízio das mais antigas.
+
+A cópia usa a API de backup do SQLite, que lê uma imagem consistente do
+banco mesmo com outros terminais gravando. Os snapshots ficam na pasta
+``Snapshots`` com a data e hora no nome; só os ``SNAPSHOTS_MANTIDOS`` mais
+recentes são mantidos.
+
+Uso:
+    python -m oficina_core.snapshots                  # cria um snapshot agora
+    python -m oficina_core.snapshots --listar
+    python -m oficina_core.snapshots --restaurar Snapshots/Ordens_de_Servico_20251031_180000.db
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from .arquivos import substituir
+from .configuracao import ARQUIVO_BANCO_OS, INTERVALO_SNAPSHOT_HORAS, PASTA_SNAPSHOTS, SNAPSHOTS_MANTIDOS
+
+log = logging.getLogger(__name__)
+
+_FORMATO_DATA = "%Y%m%d_%H%M%S"
+# Uma cópia temporária mais velha que isso foi interrompida (nenhum backup do banco leva tanto tempo)
+_IDADE_TMP_ABANDONADO = 6 * 3600
+# Arquivos auxiliares do SQLite que pertencem ao banco e não podem sobreviver a uma restauração
+_SUFIXOS_AUXILIARES = ("-wal", "-shm", "-journal")
+
+
+def _prefixo(caminho_banco):
+    return os.path.splitext(os.path.basename(caminho_banco))[0] + "_"
+
+
+def listar_snapshots(caminho_banco=ARQUIVO_BANCO_OS, pasta=PASTA_SNAPSHOTS):
+    """Caminhos dos snapshots do banco, do mais recente para o mais antigo."""
+    if not os.path.isdir(pasta):
+        return []
+    prefixo = _prefixo(caminho_banco)
+    nomes = [n for n in os.listdir(pasta) if n.startswith(prefixo) and n.endswith(".db")]
+    # A data no nome (AAAAmmdd_HHMMSS) ordena como texto
+    return [os.path.join(pasta, n) for n in sorted(nomes, reverse=True)]
+
+
+def _apagar_tmp_abandonados(caminho_banco, pasta):
+    # A pasta é compartilhada: o .tmp recente pode ser a cópia em andamento de outro terminal
+    limite = time.time() - _IDADE_TMP_ABANDONADO
+    for nome in os.listdir(pasta):
+        if not (nome.startswith(_prefixo(caminho_banco)) and nome.endswith(".tmp")):
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except FileNotFoundError:
+            pass  # Outro terminal apagou primeiro
+        except OSError as e:
+            log.warning("Não foi possível apagar a cópia interrompida %s: %s", caminho, e)
+
+
+def criar_snapshot(caminho_banco=ARQUIVO_BANCO_OS, pasta=PASTA_SNAPSHOTS, manter=SNAPSHOTS_MANTIDOS):
+    """Copia o banco para um novo snapshot e apaga os excedentes. Retorna o caminho criado."""
+    os.makedirs(pasta, exist_ok=True)
+    _apagar_tmp_abandonados(caminho_banco, pasta)
+    destino = os.path.join(pasta, f"{_prefixo(caminho_banco)}{datetime.datetime.now().strftime(_FORMATO_DATA)}.db")
+    # Nome único: dois terminais copiando no mesmo segundo não escrevem no mesmo arquivo
+    caminho_tmp = f"{destino}.{os.getpid()}_{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        origem = sqlite3.connect(caminho_banco)
+        try:
+            copia = sqlite3.connect(caminho_tmp)
+            try:
+                origem.backup(copia)
+            finally:
+                copia.close()
+        finally:
+            origem.close()
+        substituir(caminho_tmp, destino)
+    except BaseException:
+        try:
+            os.remove(caminho_tmp)
+        except OSError:
+            pass
+        raise
+
+    for antigo in listar_snapshots(caminho_banco, pasta)[max(manter, 1):]:
+        try:
+            os.remove(antigo)
+        except FileNotFoundError:
+            pass  # Outro terminal fez o mesmo rodízio
+        except OSError as e:
+            log.warning("Não foi possível apagar o snapshot antigo %s: %s", antigo, e)
+    return destino
+
+
+def snapshot_vencido(caminho_banco=ARQUIVO_BANCO_OS, pasta=PASTA_SNAPSHOTS, intervalo_horas=INTERVALO_SNAPSHOT_HORAS):
+    """True se não há snapshot ou o mais recente tem mais de ``intervalo_horas``."""
+    snapshots = listar_snapshots(caminho_banco, pasta)
+    if not snapshots:
+        return True
+    return time.time() - os.path.getmtime(snapshots[0]) > intervalo_horas * 3600
+
+
+def agendar_snapshot(caminho_banco=ARQUIVO_BANCO_OS, pasta=PASTA_SNAPSHOTS, manter=SNAPSHOTS_MANTIDOS,
+                     intervalo_horas=INTERVALO_SNAPSHOT_HORAS):
+    """Cria um snapshot em segundo plano se o último estiver vencido. Retorna a thread ou None."""
+    if not os.path.exists(caminho_banco) or not snapshot_vencido(caminho_banco, pasta, intervalo_horas):
+        return None
+
+    def executar():
+        try:
+            log.info("Snapshot %s criado.", criar_snapshot(caminho_banco, pasta, manter))
+        except (OSError, sqlite3.Error) as e:
+            log.error("Erro ao criar snapshot de %s: %s", caminho_banco, e)
+
+    thread = threading.Thread(target=executar, name="Snapshot", daemon=True)
+    thread.start()
+    return thread
+
+
+def restaurar_snapshot(snapshot, caminho_banco=ARQUIVO_BANCO_OS):
+    """Substitui o banco pelo snapshot. O programa deve estar fechado em todos os terminais.
+
+    O banco atual não é apagado: fica ao lado, com a extensão ``.anterior``.
+    """
+    verificacao = sqlite3.connect(snapshot)
+    try:
+        resultado = verificacao.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        verificacao.close()
+    if resultado != "ok":
+        raise sqlite3.DatabaseError(f"Snapshot {snapshot} danificado: {resultado}")
+
+    caminho_tmp = caminho_banco + ".restaurando"
+    with open(snapshot, "rb") as origem, open(caminho_tmp, "wb") as destino:
+        while True:
+            bloco = origem.read(1 << 20)
+            if not bloco:
+                break
+            destino.write(bloco)
+    if os.path.exists(caminho_banco):
+        os.replace(caminho_banco, caminho_banco + ".anterior")
+    for sufixo in _SUFIXOS_AUXILIARES:
+        auxiliar = caminho_banco + sufixo
+        if os.path.exists(auxiliar):
+            os.replace(auxiliar, caminho_banco + ".anterior" + sufixo)
+    substituir(caminho_tmp, caminho_banco)
+    return caminho_banco
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cria, lista ou restaura snapshots do banco das OSs.")
+    parser.add_argument("--banco", default=ARQUIVO_BANCO_OS, help="arquivo SQLite das OSs")
+    parser.add_argument("--pasta", default=PASTA_SNAPSHOTS, help="pasta dos snapshots")
+    parser.add_argument("--manter", type=int, default=SNAPSHOTS_MANTIDOS, help="quantos snapshots manter")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--listar", action="store_true", help="lista os snapshots existentes")
+    grupo.add_argument("--restaurar", metavar="SNAPSHOT", help="substitui o banco pelo snapshot indicado")
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        for caminho in listar_snapshots(args.banco, args.pasta):
+            print(caminho)
+        return 0
+    if args.restaurar:
+        restaurar_snapshot(args.restaurar, args.banco)
+        print(f"{args.banco} restaurado a partir de {args.restaurar} (o anterior ficou em {args.banco}.anterior)")
+        return 0
+    print(f"Snapshot criado: {criar_snapshot(args.banco, args.pasta, args.manter)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Fixtures comuns: armazenamentos em pastas temporárias e OSs de exemplo."""
+
+import pytest
+
+from oficina_core import CHAVE_ITENS, COLUNAS_OS, ArmazenamentoJournal, ArmazenamentoSQLite
+
+
+def item(tipo="Peça", referencia="PF-1020", descricao="Pastilha de freio", valor=100.0, quantia=1, desc=0):
+    return {"tipo": tipo, "referencia": referencia, "descricao": descricao, "uni": "un", "valor": valor,
+            "quantia": quantia, "desc": desc, "valor_total": round(valor * quantia * (100 - desc) / 100, 2)}
+
+
+@pytest.fixture
+def nova_os():
+    """Fábrica de OSs com os campos obrigatórios preenchidos; os argumentos sobrepõem os campos."""
+    def fabricar(**campos):
+        registro = {col: None for col in COLUNAS_OS}
+        registro.update(Nome_Cliente="Maria Silva", Placa_Veiculo="ABC1D23", CPF_CNPJ_Cliente="123.456.789-00",
+                        Data_OS="10/10/2025", Situacao_Atual="Orçamento", Condicoes_Pagamento="Pix",
+                        Responsavel="Carlos")
+        registro[CHAVE_ITENS] = [item()]
+        registro.update(campos)
+        if "Valor_Total_Final" not in campos:
+            registro["Valor_Total_Final"] = round(sum(i["valor_total"] for i in registro[CHAVE_ITENS]), 2)
+        return registro
+    return fabricar
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    armazenamento = ArmazenamentoSQLite(str(tmp_path / "os.db"))
+    yield armazenamento
+    armazenamento.fechar()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    armazenamento = ArmazenamentoJournal(str(tmp_path / "os.jsonl"))
+    yield armazenamento
+    armazenamento.fechar()
+
+
+@pytest.fixture(params=["sqlite", "journal"])
+def armazenamento(request):
+    """Os testes que usam esta fixture rodam nos dois backends locais."""
+    return request.getfixturevalue(request.param)
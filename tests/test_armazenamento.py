@@ -0,0 +1,98 @@
+"""Comportamento comum aos backends locais (SQLite e journal)."""
+
+import pytest
+
+from oficina_core import CHAVE_ITENS, CHAVE_VERSAO, ConflitoVersao
+
+
+def test_salvar_e_obter(armazenamento, nova_os):
+    assert armazenamento.salvar(nova_os(Numero_OS="000010")) is True
+    assert armazenamento.salvar(nova_os(Numero_OS="000010", Nome_Cliente="Maria Souza")) is False
+    registro = armazenamento.obter(" 000010 ")
+    assert registro["Nome_Cliente"] == "Maria Souza"
+    assert registro[CHAVE_VERSAO] == 2
+    assert registro[CHAVE_ITENS][0]["referencia"] == "PF-1020"
+    assert armazenamento.obter("000011") is None
+
+
+def test_busca_por_placa_e_documento_normalizados(armazenamento, nova_os):
+    armazenamento.salvar(nova_os(Numero_OS="000001", Placa_Veiculo="abc-1d23", CPF_CNPJ_Cliente="123.456.789-00"))
+    armazenamento.salvar(nova_os(Numero_OS="000002", Placa_Veiculo="", CPF_CNPJ_Cliente=""))
+
+    assert [r["Numero_OS"] for r in armazenamento.buscar_por_placa("ABC1D23")] == ["000001"]
+    assert [r["Numero_OS"] for r in armazenamento.buscar_por_documento("12345678900")] == ["000001"]
+    assert armazenamento.buscar_por_placa("") == []
+    assert armazenamento.buscar_por_documento(None) == []
+
+
+def test_criar_segue_a_sequencia(armazenamento, nova_os):
+    assert armazenamento.criar(nova_os()) == "000001"
+    armazenamento.salvar(nova_os(Numero_OS="000041"))
+    assert armazenamento.criar(nova_os()) == "000042"
+    assert armazenamento.deletar("000042")
+    # O número de uma OS apagada não é reaproveitado
+    assert armazenamento.proximo_numero_os() == "000043"
+
+
+def test_filtrar(armazenamento, nova_os):
+    armazenamento.salvar(nova_os(Numero_OS="000001", Data_OS="30/09/2025"))
+    armazenamento.salvar(nova_os(Numero_OS="000002", Data_OS="01/10/2025", Situacao_Atual="Finalizado"))
+    armazenamento.salvar(nova_os(Numero_OS="000003", Data_OS="31/10/2025", Condicoes_Pagamento="Boleto"))
+
+    def numeros(**filtro):
+        return sorted(r["Numero_OS"] for r in armazenamento.filtrar(**filtro))
+
+    assert numeros(data_inicio="01/10/2025", data_fim="31/10/2025") == ["000002", "000003"]
+    assert numeros(situacao="Finalizado") == ["000002"]
+    assert numeros(condicoes_pagamento="Boleto") == ["000003"]
+    assert numeros(numeros=["1", "000003"]) == ["000001", "000003"]
+    assert armazenamento.contar(data_inicio="01/10/2025") == 2
+
+
+def test_conflito_ao_salvar_versao_antiga(armazenamento, nova_os):
+    numero = armazenamento.criar(nova_os())
+    tela_a = armazenamento.obter(numero)
+    tela_b = armazenamento.obter(numero)
+
+    tela_a["Situacao_Atual"] = "Finalizado"
+    armazenamento.salvar(tela_a, versao_esperada=tela_a[CHAVE_VERSAO])
+
+    tela_b["Situacao_Atual"] = "Entregue"
+    with pytest.raises(ConflitoVersao) as erro:
+        armazenamento.salvar(tela_b, versao_esperada=tela_b[CHAVE_VERSAO])
+    assert (erro.value.versao_esperada, erro.value.versao_atual) == (1, 2)
+    assert armazenamento.obter(numero)["Situacao_Atual"] == "Finalizado"
+
+
+def test_conflito_ao_deletar_e_apos_remocao(armazenamento, nova_os):
+    numero = armazenamento.criar(nova_os())
+    lida = armazenamento.obter(numero)
+    armazenamento.salvar(lida, versao_esperada=1)
+
+    with pytest.raises(ConflitoVersao):
+        armazenamento.deletar(numero, versao_esperada=1)
+    assert armazenamento.deletar(numero, versao_esperada=2)
+
+    with pytest.raises(ConflitoVersao) as erro:
+        armazenamento.salvar(lida, versao_esperada=2)
+    assert erro.value.versao_atual is None
+    assert armazenamento.obter(numero) is None
+
+
+def test_filtrar_lote_percorre_o_filtro_aos_trechos(armazenamento, nova_os):
+    for numero, data in enumerate(["", "02/10/2025", "01/10/2025", "", "02/10/2025", "03/10/2025", "01/10/2025"], 1):
+        armazenamento.salvar(nova_os(Numero_OS=str(numero).zfill(6), Data_OS=data))
+
+    def trechos(**filtro):
+        numeros, apos = [], None
+        while True:
+            registros, apos = armazenamento.filtrar_lote(apos, limite=2, **filtro)
+            numeros.append([r["Numero_OS"] for r in registros])
+            if apos is None:
+                return numeros
+
+    todos = trechos()
+    assert [len(trecho) for trecho in todos[:-1]] == [2, 2, 2]
+    assert sum(todos, []) == [r["Numero_OS"] for r in armazenamento.filtrar()]
+    assert sorted(sum(todos, [])) == sorted(armazenamento.numeros())
+    assert sum(trechos(data_inicio="02/10/2025"), []) == ["000002", "000005", "000006"]
@@ -0,0 +1,93 @@
+"""Importação em massa (oficina_core.importacao) e o relatório das linhas recusadas."""
+
+import csv
+import datetime
+
+import pytest
+
+from oficina_core import importar_arquivo
+
+CABECALHO = ["Número OS", "Data OS", "Nome Cliente", "Placa Veículo", "KM Atual Veículo", "Valor Total Final"]
+
+
+def _escrever_csv(caminho, linhas):
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(CABECALHO)
+        escritor.writerows(linhas)
+    return str(caminho)
+
+
+def _recusadas(caminho):
+    with open(caminho, newline="", encoding="utf-8-sig") as f:
+        return [(linha["Linha"], linha["Motivo"]) for linha in csv.DictReader(f, delimiter=";")]
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    return _escrever_csv(tmp_path / "antigas.csv", [
+        ["", "10/10/2025", "Ana Lima", "AAA1A11", "1.000", "150,50"],
+        ["000005", "10/10/2025", "", "BBB2B22", "", ""],
+        ["", "31/02/2025", "Carlos Souza", "CCC3C33", "", ""],
+        ["", "10/10/2025", "Davi Costa", "DDD4D44", "muito", ""],
+        ["000001", "12/10/2025", "Eva Reis", "EEE5E55", "", "10"],
+        ["", "", "", "", "", ""],
+    ])
+
+
+def test_recusa_linhas_invalidas_e_numeros_existentes(sqlite, nova_os, arquivo, tmp_path):
+    sqlite.salvar(nova_os(Numero_OS="000001"))
+
+    resultado = importar_arquivo(arquivo, sqlite, rejeitados=str(tmp_path / "recusadas.csv"))
+
+    assert resultado == {"lidas": 5, "gravadas": 1, "recusadas": 4, "rejeitados": str(tmp_path / "recusadas.csv")}
+    assert _recusadas(resultado["rejeitados"]) == [
+        ("3", "Nome_Cliente não preenchido"),
+        ("4", "Data_OS inválida: 31/02/2025"),
+        ("5", "KM_Atual_Veiculo inválido: muito"),
+        ("6", "OS 000001 já existe"),
+    ]
+    importada = sqlite.obter("000002")
+    assert (importada["Nome_Cliente"], importada["KM_Atual_Veiculo"], importada["Valor_Total_Final"]) == (
+        "Ana Lima", 1000, 150.5)
+    assert sqlite.obter("000001")["Nome_Cliente"] == "Maria Silva"
+    assert len(sqlite) == 2
+
+
+def test_substituir_sobrepoe_numeros_existentes(sqlite, nova_os, arquivo):
+    sqlite.salvar(nova_os(Numero_OS="000001"))
+
+    resultado = importar_arquivo(arquivo, sqlite, substituir=True, lote=1)
+
+    assert (resultado["gravadas"], resultado["recusadas"]) == (2, 3)
+    assert sqlite.obter("000001")["Nome_Cliente"] == "Eva Reis"
+
+
+def test_simular_nao_grava(sqlite, arquivo):
+    resultado = importar_arquivo(arquivo, sqlite, simular=True)
+    assert (resultado["gravadas"], resultado["recusadas"]) == (2, 3)
+    assert len(sqlite) == 0
+
+
+def test_cabecalho_sem_coluna_obrigatoria(sqlite, tmp_path):
+    caminho = tmp_path / "outros_nomes.csv"
+    caminho.write_text("Cliente;Placa do carro\nAna;AAA1A11\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Nome_Cliente, Placa_Veiculo"):
+        importar_arquivo(str(caminho), sqlite)
+    mapa = {"cliente": "Nome_Cliente", "Placa do Carro": "Placa_Veiculo"}
+    assert importar_arquivo(str(caminho), sqlite, mapa=mapa)["gravadas"] == 1
+    assert sqlite.obter("000001")["Placa_Veiculo"] == "AAA1A11"
+
+
+def test_planilha_xlsx(sqlite, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    livro = openpyxl.Workbook()
+    folha = livro.active
+    folha.append(["Numero_OS", "Data_OS", "Nome_Cliente", "Placa_Veiculo", "Ano_Veiculo"])
+    folha.append([12, datetime.datetime(2025, 10, 10), "Ana Lima", "AAA1A11", 2015.0])
+    caminho = str(tmp_path / "antigas.xlsx")
+    livro.save(caminho)
+
+    assert importar_arquivo(caminho, sqlite)["gravadas"] == 1
+    registro = sqlite.obter("000012")
+    assert (registro["Data_OS"], registro["Ano_Veiculo"]) == ("10/10/2025", 2015)
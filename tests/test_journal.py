@@ -0,0 +1,65 @@
+"""ArmazenamentoJournal: reprodução do journal e recuperação de uma escrita interrompida."""
+
+import os
+
+from oficina_core import CHAVE_VERSAO, ArmazenamentoJournal
+
+
+def _numeros(journal):
+    return sorted(journal.numeros())
+
+
+def test_reabrir_reproduz_o_journal(tmp_path, nova_os):
+    caminho = str(tmp_path / "os.jsonl")
+    journal = ArmazenamentoJournal(caminho)
+    journal.salvar(nova_os(Numero_OS="000001"))
+    journal.salvar(nova_os(Numero_OS="000002"))
+    journal.salvar(nova_os(Numero_OS="000001", Nome_Cliente="Maria Souza"))
+    journal.deletar("000002")
+    journal.fechar()
+
+    journal = ArmazenamentoJournal(caminho)
+    assert not journal.novo
+    assert _numeros(journal) == ["000001"]
+    registro = journal.obter("000001")
+    assert (registro["Nome_Cliente"], registro[CHAVE_VERSAO]) == ("Maria Souza", 2)
+    journal.fechar()
+
+
+def test_linha_incompleta_no_fim_e_descartada(tmp_path, nova_os):
+    caminho = str(tmp_path / "os.jsonl")
+    journal = ArmazenamentoJournal(caminho)
+    journal.salvar(nova_os(Numero_OS="000001"))
+    journal.salvar(nova_os(Numero_OS="000002"))
+    journal.fechar()
+    tamanho_valido = os.path.getsize(caminho)
+    # Queda de energia no meio da gravação da terceira OS
+    with open(caminho, "ab") as f:
+        f.write(b'{"op": "salvar", "registro": {"Numero_OS": "000003", "Nome_Cli')
+
+    journal = ArmazenamentoJournal(caminho)
+    assert _numeros(journal) == ["000001", "000002"]
+    assert os.path.getsize(caminho) == tamanho_valido
+    journal.salvar(nova_os(Numero_OS="000003"))
+    journal.fechar()
+
+    # Sem o corte, a OS 000003 emendaria no pedaço da linha perdida e também se perderia
+    journal = ArmazenamentoJournal(caminho)
+    assert _numeros(journal) == ["000001", "000002", "000003"]
+    journal.fechar()
+
+
+def test_linha_corrompida_no_meio_nao_invalida_as_demais(tmp_path, nova_os):
+    caminho = str(tmp_path / "os.jsonl")
+    journal = ArmazenamentoJournal(caminho)
+    journal.salvar(nova_os(Numero_OS="000001"))
+    journal.fechar()
+    with open(caminho, "ab") as f:
+        f.write(b"\x00\x00 lixo\n")
+    journal = ArmazenamentoJournal(caminho)
+    journal.salvar(nova_os(Numero_OS="000002"))
+    journal.fechar()
+
+    journal = ArmazenamentoJournal(caminho)
+    assert _numeros(journal) == ["000001", "000002"]
+    journal.fechar()
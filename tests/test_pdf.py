@@ -0,0 +1,36 @@
+"""PoolRenderizacao e FilaRenderizacao: processos "spawn" e recuperação de um worker que morre."""
+
+import functools
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from oficina_core import pdf
+from oficina_core.pdf import FilaRenderizacao, PoolRenderizacao
+
+
+def test_pool_executa_em_processo_novo():
+    with PoolRenderizacao(max_workers=2) as pool:
+        assert pool.submit(os.getpid).result() != os.getpid()
+        assert list(pool.map(abs, [-1, -2, -3])) == [1, 2, 3]
+        with pytest.raises(ValueError):
+            pool.submit(int, "x").result()
+
+
+def test_worker_que_morre_no_meio_da_tarefa():
+    with PoolRenderizacao(max_workers=1) as pool:
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(os._exit, 3).result()
+
+
+def test_fila_troca_o_pool_depois_de_um_worker_morrer(monkeypatch, tmp_path):
+    fila = FilaRenderizacao(max_workers=1, pasta_base=str(tmp_path))
+    try:
+        monkeypatch.setattr(pdf, "_tarefa_vazia", functools.partial(os._exit, 3))
+        with pytest.raises(BrokenProcessPool):
+            fila.aquecer().result()
+        monkeypatch.undo()
+        assert fila.aquecer().result() is None
+    finally:
+        fila.encerrar()
@@ -0,0 +1,69 @@
+"""ServidorOS e ArmazenamentoRemoto, com o servidor rodando numa thread deste processo."""
+
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from oficina_core import ArmazenamentoRemoto
+from oficina_core.remoto import ErroServidor
+from oficina_core.servidor import ServidorOS
+
+
+@pytest.fixture
+def servidor(sqlite):
+    """(host, porta) de um ``ServidorOS`` sobre o banco do fixture ``sqlite``."""
+    servico = ServidorOS(sqlite, threads=2)
+    loop = asyncio.new_event_loop()
+    tcp = loop.run_until_complete(asyncio.start_server(servico.atender, "127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield tcp.sockets[0].getsockname()[:2]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    tcp.close()
+    loop.run_until_complete(tcp.wait_closed())
+    loop.close()
+    servico._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def cliente(servidor):
+    host, porta = servidor
+    cliente = ArmazenamentoRemoto(f"http://{host}:{porta}")
+    yield cliente
+    cliente.fechar()
+
+
+def test_filtrar_remoto_vem_aos_trechos(cliente, nova_os):
+    cliente.TAMANHO_LOTE = 3
+    for numero in range(1, 9):
+        cliente.salvar(nova_os(Numero_OS=str(numero).zfill(6), Data_OS=f"{numero % 3 + 1:02d}/10/2025"))
+
+    registros, apos = cliente.filtrar_lote(limite=3)
+    assert (len(registros), apos is not None) == (3, True)
+    assert [r["Numero_OS"] for r in cliente.filtrar()] == [
+        "000003", "000006", "000001", "000004", "000007", "000002", "000005", "000008"]
+    assert sorted(r["Numero_OS"] for r in cliente.filtrar(data_inicio="03/10/2025")) == ["000002", "000005", "000008"]
+
+
+def test_numero_os_com_barra(cliente, nova_os):
+    assert cliente.salvar(nova_os(Numero_OS="12/A"))
+    assert cliente.obter("12/A")["Numero_OS"] == "12/A"
+    assert cliente.deletar("12/A")
+    assert cliente.obter("12/A") is None
+
+
+def test_registro_que_nao_e_objeto(cliente):
+    for corpo in ({"registro": ["000001"]}, {"registro": "000001"}, {}):
+        with pytest.raises(ErroServidor) as erro:
+            cliente._requisitar("PUT", "/os/000001", corpo=corpo)
+        assert erro.value.status == 400
+
+
+def test_cabecalho_grande_demais(servidor):
+    with socket.create_connection(servidor) as conn:
+        conn.sendall(b"GET /saude HTTP/1.1\r\nX-Grande: " + b"a" * 100000 + b"\r\n\r\n")
+        resposta = conn.makefile("rb").read()
+    assert resposta.startswith(b"HTTP/1.1 431 ")
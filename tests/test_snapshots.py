@@ -0,0 +1,24 @@
+"""Snapshots numa pasta compartilhada por vários terminais."""
+
+import os
+import time
+
+from oficina_core.snapshots import criar_snapshot, listar_snapshots
+
+
+def test_snapshot_preserva_copia_em_andamento_de_outro_terminal(sqlite, nova_os, tmp_path):
+    sqlite.salvar(nova_os(Numero_OS="000001"))
+    pasta = tmp_path / "Snapshots"
+    pasta.mkdir()
+    em_andamento = pasta / "os_20251010_120000.db.4321_abcd.tmp"
+    em_andamento.write_bytes(b"copia de outro terminal")
+    abandonada = pasta / "os_20251001_120000.db.tmp"
+    abandonada.write_bytes(b"copia interrompida")
+    dias_atras = time.time() - 3 * 86400
+    os.utime(str(abandonada), (dias_atras, dias_atras))
+
+    destino = criar_snapshot(sqlite.caminho, str(pasta), manter=3)
+
+    assert listar_snapshots(sqlite.caminho, str(pasta)) == [destino]
+    assert em_andamento.exists()
+    assert not abandonada.exists()
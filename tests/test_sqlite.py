@@ -0,0 +1,217 @@
+"""ArmazenamentoSQLite: migrações de esquema, vários terminais e resumos dos relatórios."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from oficina_core import CHAVE_ITENS, CHAVE_VERSAO, COLUNAS_OS, ArmazenamentoSQLite, ConflitoVersao
+from oficina_core.esquema import TIPOS_SQL, data_iso
+from oficina_core.itens import formatar_detalhes_itens
+from oficina_core.relatorios import (
+    CHAVES_FATURAMENTO, CHAVES_PECAS, agregar_faturamento, agregar_pecas, tempo_por_situacao
+)
+
+from .conftest import item
+
+
+def _criar_banco_v0(caminho, registros):
+    """Banco como a primeira versão do ArmazenamentoSQLite o gravava (user_version 0, itens em texto)."""
+    colunas = []
+    for col in COLUNAS_OS:
+        if col == "Numero_OS":
+            colunas.append("Numero_OS TEXT PRIMARY KEY")
+        else:
+            colunas.append(f"{col} {TIPOS_SQL.get(col, 'TEXT')}")
+    conn = sqlite3.connect(caminho)
+    conn.execute(f"CREATE TABLE ordens_servico ({', '.join(colunas)}, Data_ISO TEXT)")
+    for registro in registros:
+        valores = [registro.get(col) for col in COLUNAS_OS] + [data_iso(registro.get("Data_OS"))]
+        conn.execute(f"INSERT INTO ordens_servico VALUES ({', '.join('?' * len(valores))})", valores)
+    conn.commit()
+    conn.close()
+
+
+def _versao_do_esquema(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def banco_v0(tmp_path, nova_os):
+    """Caminho de um banco v0 com duas OSs, a 000007 com uma peça e um serviço em Detalhes_Itens."""
+    caminho = str(tmp_path / "antigo.db")
+    antiga = nova_os(Numero_OS="000007", Valor_Total_Final=220.0)
+    antiga["Detalhes_Itens"] = formatar_detalhes_itens([item(), item("Serviço", "ALN", "Alinhamento", 120.0)])
+    _criar_banco_v0(caminho, [antiga, nova_os(Numero_OS="000003", Placa_Veiculo="XYZ9A87", CPF_CNPJ_Cliente="")])
+    return caminho
+
+
+def test_migracao_converte_itens_em_texto(banco_v0):
+    banco = ArmazenamentoSQLite(banco_v0)
+    try:
+        registro = banco.obter("000007")
+        assert [(i["tipo"], i["referencia"], i["valor_total"]) for i in registro[CHAVE_ITENS]] == [
+            ("Peça", "PF-1020", 100.0), ("Serviço", "ALN", 120.0)]
+        assert registro["Detalhes_Itens"] is None
+    finally:
+        banco.fechar()
+    assert _versao_do_esquema(banco_v0) == len(ArmazenamentoSQLite.MIGRACOES)
+
+    # Reabrir não roda as migrações de novo
+    banco = ArmazenamentoSQLite(banco_v0)
+    assert len(banco) == 2
+    banco.fechar()
+
+
+def test_migracao_continua_a_numeracao(banco_v0, nova_os):
+    banco = ArmazenamentoSQLite(banco_v0)
+    try:
+        assert banco.proximo_numero_os() == "000008"
+        assert banco.criar(nova_os()) == "000008"
+    finally:
+        banco.fechar()
+
+
+def test_numeracao_concorrente_nao_repete(tmp_path, nova_os):
+    caminho = str(tmp_path / "os.db")
+    terminais = [ArmazenamentoSQLite(caminho), ArmazenamentoSQLite(caminho)]
+    numeros, erros = [], []
+
+    def criar_varias(terminal):
+        try:
+            for _ in range(15):
+                numeros.append(terminal.criar(nova_os()))
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=criar_varias, args=(terminal,)) for terminal in terminais for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for terminal in terminais:
+        terminal.fechar()
+    assert erros == []
+    assert sorted(numeros) == [str(n).zfill(6) for n in range(1, 61)]
+
+
+def test_migracao_indexa_a_busca(banco_v0):
+    banco = ArmazenamentoSQLite(banco_v0)
+    try:
+        registros, total = banco.buscar("alinhamento")
+        assert (total, [r["Numero_OS"] for r in registros]) == (1, ["000007"])
+    finally:
+        banco.fechar()
+
+
+def test_migracao_monta_os_cadastros(banco_v0):
+    banco = ArmazenamentoSQLite(banco_v0)
+    try:
+        assert [c["chave"] for c in banco.clientes()] == ["12345678900"]
+        assert sorted(v["chave"] for v in banco.veiculos()) == ["ABC1D23", "XYZ9A87"]
+        assert banco.obter_veiculo("xyz-9a87")["chave_cliente"] is None
+        assert [r["Numero_OS"] for r in banco.buscar_por_documento("123.456.789-00")] == ["000007"]
+    finally:
+        banco.fechar()
+
+
+def test_migracao_comeca_as_versoes_em_1(banco_v0):
+    banco = ArmazenamentoSQLite(banco_v0)
+    try:
+        assert [banco.obter(n)[CHAVE_VERSAO] for n in ("000003", "000007")] == [1, 1]
+    finally:
+        banco.fechar()
+
+
+def test_dois_terminais_no_mesmo_banco(tmp_path, nova_os):
+    caminho = str(tmp_path / "os.db")
+    terminal_a, terminal_b = ArmazenamentoSQLite(caminho), ArmazenamentoSQLite(caminho)
+    try:
+        numero = terminal_a.criar(nova_os())
+        revisao_b = terminal_b.revisao_atual()
+        lida_a, lida_b = terminal_a.obter(numero), terminal_b.obter(numero)
+
+        lida_a["KM_Atual_Veiculo"] = 50000
+        terminal_a.salvar(lida_a, versao_esperada=lida_a[CHAVE_VERSAO])
+        with pytest.raises(ConflitoVersao) as erro:
+            terminal_b.salvar(lida_b, versao_esperada=lida_b[CHAVE_VERSAO])
+        assert erro.value.versao_atual == 2
+
+        revisao, registros, removidos = terminal_b.alteracoes_desde(revisao_b)
+        assert revisao > revisao_b
+        assert [(r["Numero_OS"], r["KM_Atual_Veiculo"]) for r in registros] == [(numero, 50000)]
+        assert removidos == []
+        terminal_a.deletar(numero)
+        assert terminal_b.alteracoes_desde(revisao)[2] == [numero]
+    finally:
+        terminal_a.fechar()
+        terminal_b.fechar()
+
+
+def _faturamento(linhas):
+    return sorted(tuple(linha[col] for col in CHAVES_FATURAMENTO + ("ordens", "centavos")) for linha in linhas)
+
+
+def _pecas(linhas):
+    return sorted(tuple(linha[col] for col in CHAVES_PECAS + ("ordens", "quantidade", "centavos"))
+                  for linha in linhas)
+
+
+def _conferir_resumos(banco):
+    assert _faturamento(banco.resumo_faturamento()) == _faturamento(agregar_faturamento(banco.registros()))
+    assert _pecas(banco.resumo_pecas()) == _pecas(agregar_pecas(banco.registros()))
+    situacoes = {}
+    for registro in banco.registros():
+        situacao = registro["Situacao_Atual"] or ""
+        situacoes[situacao] = situacoes.get(situacao, 0) + 1
+    assert {linha["situacao"]: linha["ordens"] for linha in banco.resumo_situacoes() if linha["ordens"]} == situacoes
+
+
+def test_migracao_calcula_os_resumos(banco_v0):
+    banco = ArmazenamentoSQLite(banco_v0)
+    try:
+        _conferir_resumos(banco)
+    finally:
+        banco.fechar()
+
+
+def test_resumos_acompanham_salvar_editar_e_deletar(sqlite, nova_os):
+    sqlite.salvar(nova_os(Numero_OS="000001", Valor_Total_Final=0.1))
+    sqlite.salvar(nova_os(Numero_OS="000002", Data_OS="11/10/2025", Valor_Total_Final=0.2,
+                          **{CHAVE_ITENS: [item(quantia=2), item("Serviço", "ALN", "Alinhamento", 120.0)]}))
+    sqlite.salvar(nova_os(Numero_OS="000003", Data_OS="", Responsavel=None, Situacao_Atual=None))
+    _conferir_resumos(sqlite)
+
+    editada = sqlite.obter("000002")
+    editada.update(Situacao_Atual="Finalizado", Condicoes_Pagamento="Boleto", Valor_Total_Final=333.33)
+    editada[CHAVE_ITENS] = [item("Peça", "FO-77", "Filtro de óleo", 38.9, quantia=3, desc=10)]
+    sqlite.salvar(editada)
+    _conferir_resumos(sqlite)
+
+    sqlite.deletar("000001")
+    _conferir_resumos(sqlite)
+    sqlite.importar_lote([nova_os(Numero_OS="000001"), nova_os(Numero_OS="000002", Valor_Total_Final=1.0)],
+                         substituir=True)
+    _conferir_resumos(sqlite)
+
+
+def _tempos(banco):
+    return {linha["situacao"]: (linha["ordens"], linha["mudancas"]) for linha in tempo_por_situacao(banco)}
+
+
+def test_deletar_mantem_os_periodos_ja_fechados(sqlite, nova_os):
+    sqlite.salvar(nova_os(Numero_OS="000001"))
+    editada = sqlite.obter("000001")
+    editada["Situacao_Atual"] = "Finalizado"
+    sqlite.salvar(editada)
+
+    sqlite.deletar("000001")
+    assert _tempos(sqlite) == {"Orçamento": (0, 1)}
+
+    # O mesmo número importado de novo começa do zero, sem herdar o período aberto da OS apagada
+    sqlite.importar_lote([nova_os(Numero_OS="000001", Situacao_Atual="Finalizado")])
+    assert _tempos(sqlite) == {"Finalizado": (1, 0), "Orçamento": (0, 1)}